@@ -0,0 +1,283 @@
+"""Reproducible benchmark suite for the Excel merge pipeline.
+
+Generates synthetic primary/reference workbooks, times each phase of a merge
+(Excel read, key normalization, matching, .xlsx output) in a fresh process per
+run, and writes the results with peak memory to JSON. Pass --baseline to compare
+against an earlier results file; the exit status is 1 if any phase regressed.
+
+    python benchmark.py --sizes 1k,100k --repeat 3 -o results.json
+    python benchmark.py --baseline results.json --threshold 0.15
+"""
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from itertools import product
+from pathlib import Path
+import argparse
+import json
+import multiprocessing
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+from excelMerger import HashJoinMatcher, KeyNormalizer, MergeEngine, peak_rss_mb
+
+PHASES = ("read", "normalize", "match", "write")
+SIZE_SUFFIXES = {"k": 1000, "m": 1000000}
+PRIMARY_KEY = "Product Code"
+REFERENCE_KEY = "SKU"
+
+
+def parse_size(text):
+    """'1k' -> 1000, '1m' -> 1000000, '2500' -> 2500"""
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def parse_list(text, kind):
+    return [kind(item) for item in text.split(",") if item.strip()]
+
+
+def run_peak_rss_mb(engine):
+    """Peak resident set size of this run so far. Engine phases restart the peak tracking
+    (see excelMerger.reset_peak_rss), so the peaks they recorded are included."""
+    peaks = [record['peak_rss_mb'] for record in engine.phases] + [peak_rss_mb()]
+    return max((peak for peak in peaks if peak is not None), default=None)
+
+
+def case_id(case):
+    return (f"rows={case['rows']},cardinality={case['cardinality']:g},"
+            f"match_rate={case['match_rate']:g},width={case['width']}")
+
+
+def extra_columns(rng, rows, width, prefix):
+    """width filler columns cycling through text, float, int and date values"""
+    start = datetime(2020, 1, 1)
+    columns = {}
+    for j in range(width):
+        name = f"{prefix} {j + 1}"
+        kind = j % 4
+        if kind == 0:
+            columns[name] = [f"Item {v}" for v in rng.integers(0, 50000, rows)]
+        elif kind == 1:
+            columns[name] = np.round(rng.random(rows) * 1000, 2).tolist()
+        elif kind == 2:
+            columns[name] = rng.integers(0, 1000, rows).tolist()
+        else:
+            columns[name] = [start + timedelta(days=int(v)) for v in rng.integers(0, 2000, rows)]
+    return columns
+
+
+def write_workbook(path, columns):
+    """Write a dict of equal-length column lists with a write-only workbook"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(columns))
+    for row in zip(*columns.values()):
+        ws.append(row)
+    tmp_path = path.with_name(path.name + ".tmp")
+    wb.save(tmp_path)
+    tmp_path.replace(path)
+
+
+def generate_case(case, data_dir, seed):
+    """Create (or reuse) the primary and reference workbooks for a case"""
+    stem = f"r{case['rows']}-c{case['cardinality']:g}-m{case['match_rate']:g}-w{case['width']}-s{seed}"
+    primary_path = data_dir / f"primary-{stem}.xlsx"
+    ref_path = data_dir / f"reference-{stem}.xlsx"
+    if primary_path.exists() and ref_path.exists():
+        return primary_path, ref_path
+
+    rng = np.random.default_rng(seed)
+    rows = case['rows']
+    ref_rows = max(1, round(rows * case['cardinality']))
+
+    # Reference: unique SKUs in shuffled order
+    ref_keys = [f"SKU-{i:07d}" for i in rng.permutation(ref_rows)]
+    ref_columns = {REFERENCE_KEY: ref_keys}
+    ref_columns.update(extra_columns(rng, ref_rows, case['width'], "Ref Field"))
+
+    # Primary: matched rows reuse reference SKUs with casing/spacing noise, the rest miss
+    matched = rng.random(rows) < case['match_rate']
+    picks = rng.integers(0, ref_rows, rows)
+    noise = rng.integers(0, 3, rows)
+    keys = []
+    for i in range(rows):
+        if not matched[i]:
+            keys.append(f"MISS-{i:07d}")
+            continue
+        key = ref_keys[picks[i]]
+        keys.append(key.lower() if noise[i] == 1 else f" {key} " if noise[i] == 2 else key)
+    primary_columns = {"Order": list(range(1, rows + 1)), PRIMARY_KEY: keys}
+    primary_columns.update(extra_columns(rng, rows, case['width'], "Field"))
+
+    data_dir.mkdir(parents=True, exist_ok=True)
+    write_workbook(ref_path, ref_columns)
+    write_workbook(primary_path, primary_columns)
+    return primary_path, ref_path
+
+
+def run_case(primary_path, ref_path, output_path):
+    """Time one merge phase by phase; runs inside a fresh worker process"""
+    engine = MergeEngine()
+    timings = {}
+    rss_after = {}
+
+    start = time.perf_counter()
+    primary_df = engine.load(primary_path)
+    ref_df = engine.load(ref_path)
+    timings['read'] = time.perf_counter() - start
+    rss_after['read'] = run_peak_rss_mb(engine)
+
+    normalizers = [KeyNormalizer()]
+    matcher = HashJoinMatcher(ref_df, [REFERENCE_KEY], normalizers, index={})
+    start = time.perf_counter()
+    ref_keys = matcher.normalize_columns(ref_df, [REFERENCE_KEY])
+    primary_keys = matcher.normalize_columns(primary_df, [PRIMARY_KEY])
+    timings['normalize'] = time.perf_counter() - start
+    rss_after['normalize'] = run_peak_rss_mb(engine)
+
+    start = time.perf_counter()
+    matcher.index = matcher.build_index(ref_keys)
+    positions = matcher.lookup(primary_keys)
+    carry_cols = [col for col in ref_df.columns if col != REFERENCE_KEY]
+    result_df = matcher.gather(primary_df, positions, carry_cols)
+    timings['match'] = time.perf_counter() - start
+    rss_after['match'] = run_peak_rss_mb(engine)
+
+    start = time.perf_counter()
+    try:
+        engine.save(result_df, output_path)
+    finally:
+        Path(output_path).unlink(missing_ok=True)
+    timings['write'] = time.perf_counter() - start
+    rss_after['write'] = run_peak_rss_mb(engine)
+
+    return {
+        'phases': timings,
+        'peak_rss_mb_after': rss_after,
+        'peak_rss_mb': run_peak_rss_mb(engine),
+        'matched': int((positions >= 0).sum()),
+    }
+
+
+def run_isolated(primary_path, ref_path, output_path):
+    """Run a case in a new spawned process so peak memory is per run"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_case, str(primary_path), str(ref_path), str(output_path)).result()
+
+
+def summarize_runs(case, runs):
+    """Best-of-N time per phase, worst-of-N peak memory"""
+    phases = {name: min(run['phases'][name] for run in runs) for name in PHASES}
+    return {
+        'id': case_id(case),
+        **case,
+        'reference_rows': max(1, round(case['rows'] * case['cardinality'])),
+        'matched': runs[0]['matched'],
+        'phases': phases,
+        'total': sum(phases.values()),
+        'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+        'runs': runs,
+    }
+
+
+def compare(results, baseline, threshold, min_seconds):
+    """Return human-readable regressions of results against baseline"""
+    base_cases = {case['id']: case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        base = base_cases.get(case['id'])
+        if base is None:
+            continue
+        metrics = [(name, case['phases'][name], base['phases'].get(name), "s", min_seconds)
+                   for name in PHASES]
+        metrics.append(("total", case['total'], base.get('total'), "s", min_seconds))
+        metrics.append(("peak_rss_mb", case['peak_rss_mb'], base.get('peak_rss_mb'), " MB", 0))
+        for name, current, previous, unit, floor in metrics:
+            if previous and current > previous * (1 + threshold) and current - previous > floor:
+                regressions.append(f"{case['id']} {name}: {previous:.3f}{unit} -> {current:.3f}{unit} "
+                                   f"(+{(current / previous - 1) * 100:.1f}%)")
+    return regressions
+
+
+def print_table(results, out=sys.stderr):
+    header = f"{'case':<58}" + "".join(f"{name:>10}" for name in PHASES + ("total",)) + f"{'peak MB':>10}"
+    print(header, file=out)
+    for case in results['cases']:
+        cells = [case['phases'][name] for name in PHASES] + [case['total']]
+        print(f"{case['id']:<58}" + "".join(f"{value:>10.3f}" for value in cells)
+              + f"{case['peak_rss_mb']:>10.1f}", file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1k,100k,1m", help="primary row counts (default: 1k,100k,1m)")
+    parser.add_argument("--cardinality", default="0.1",
+                        help="reference rows (distinct keys) as a fraction of primary rows (comma list)")
+    parser.add_argument("--match-rate", default="0.8", help="fraction of primary rows with a match (comma list)")
+    parser.add_argument("--width", default="5", help="filler columns per file (comma list)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per case; the fastest run per phase is kept")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the synthetic data")
+    parser.add_argument("--data-dir", default="bench_data", help="where generated workbooks are kept and reused")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="results JSON file")
+    parser.add_argument("--baseline", help="earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative slowdown counted as a regression (default: 0.10)")
+    parser.add_argument("--min-seconds", type=float, default=0.05,
+                        help="ignore slowdowns smaller than this many seconds (timer noise)")
+    args = parser.parse_args(argv)
+
+    data_dir = Path(args.data_dir)
+    cases = [{'rows': rows, 'cardinality': cardinality, 'match_rate': match_rate, 'width': width}
+             for rows, cardinality, match_rate, width in product(
+                 parse_list(args.sizes, parse_size), parse_list(args.cardinality, float),
+                 parse_list(args.match_rate, float), parse_list(args.width, int))]
+
+    results = {
+        'created': datetime.now().isoformat(timespec="seconds"),
+        'environment': {
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': multiprocessing.cpu_count(),
+        },
+        'seed': args.seed,
+        'repeat': args.repeat,
+        'cases': [],
+    }
+
+    for case in cases:
+        print(f"Preparing {case_id(case)}", file=sys.stderr)
+        primary_path, ref_path = generate_case(case, data_dir, args.seed)
+        runs = []
+        for i in range(max(1, args.repeat)):
+            runs.append(run_isolated(primary_path, ref_path, data_dir / "merged-output.xlsx"))
+            print(f"  run {i + 1}: " + ", ".join(f"{name} {runs[-1]['phases'][name]:.3f}s" for name in PHASES)
+                  + f", peak {runs[-1]['peak_rss_mb']:.1f} MB", file=sys.stderr)
+        results['cases'].append(summarize_runs(case, runs))
+
+    Path(args.output).write_text(json.dumps(results, indent=2))
+    print_table(results)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.threshold, args.min_seconds)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"No regressions over {args.threshold * 100:.0f}% against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,83 +1,3147 @@
-import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import pandas as pd
+import time
+STARTUP_CLOCK = time.perf_counter()
+
 from pathlib import Path
+from collections import Counter, OrderedDict, deque
+from logging.handlers import RotatingFileHandler
 from datetime import datetime
+from decimal import Decimal
+from difflib import SequenceMatcher
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import copy
+import cProfile
+import glob
+import hashlib
+import hmac
+import http.client
+import importlib
+import io
+import json
+import logging
+import os
+import pickle
+import queue
 import re
+import secrets
+import socket
+import socketserver
+import sqlite3
+import sys
+import tempfile
+import threading
+import uuid
+import zipfile
+from xml.etree import ElementTree
+
+WHITESPACE_RE = re.compile(r'\s+')
+PUNCTUATION_RE = re.compile(r'[,.\-_]')
+LEADING_ZEROS_RE = re.compile(r'^0+(?=\d)')
+NUMERIC_RE = re.compile(r'[+-]?(?:0|[1-9]\d*)(?:\.\d+)?')
+DATE_FORMAT = '%Y-%m-%d'
+FUZZY_METRICS = ('trigram', 'ratio')
+MATCH_POLICIES = ('first', 'last', 'all', 'aggregate', 'error')
+SOURCE_SHEET_COLUMN = 'Source Sheet'
+REFERENCE_SHEET_COLUMN = 'Reference Sheet'
+
+class LazyModule:
+    """Stand-in for a heavy module that is imported on first attribute access
+
+    Loading rebinds the module-level name to the real module, so after the first
+    use lookups go straight to it with no proxy in between.
+    """
+    def __init__(self, name, alias):
+        self.name = name
+        self.alias = alias
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def load(self):
+        module = importlib.import_module(self.name)
+        globals()[self.alias] = module
+        return module
+
+np = LazyModule("numpy", "np")
+pd = LazyModule("pandas", "pd")
+openpyxl = LazyModule("openpyxl", "openpyxl")
+HEAVY_MODULES = ("np", "pd", "openpyxl")
+# Only the GUI needs Tk (see define_widgets)
+tk = LazyModule("tkinter", "tk")
+ttk = LazyModule("tkinter.ttk", "ttk")
+filedialog = LazyModule("tkinter.filedialog", "filedialog")
+messagebox = LazyModule("tkinter.messagebox", "messagebox")
+
+def preload_modules():
+    """Import every deferred heavy module now (the GUI runs this on a background thread)"""
+    for alias in HEAVY_MODULES:
+        module = globals()[alias]
+        if isinstance(module, LazyModule):
+            module.load()
+
+def canonical_number(value):
+    """Render a number or numeric string in one canonical form (1.0 -> "1", "12.50" -> "12.5")"""
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, (float, np.floating)) and float(value).is_integer() and abs(value) < 1e16:
+        return str(int(value))
+    number = Decimal(value if isinstance(value, str) else repr(float(value)))
+    if number.is_finite() and number == number.to_integral_value():
+        return str(int(number))
+    return format(number.normalize(), 'f')
+
+def ngrams(text, n=3):
+    """Padded character n-grams of a normalized key"""
+    padded = f"  {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+def popcount(values):
+    """Number of set bits per element of a uint64 array"""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    bits = np.unpackbits(np.ascontiguousarray(values, dtype=np.uint64).view(np.uint8))
+    return bits.reshape(len(values), 64).sum(axis=1)
+
+def define_widgets():
+    """Define the Tk widget classes. They subclass tkinter widgets, so they are only defined
+    when the GUI starts and the command line and merge server run without tkinter installed."""
+    global ModernButton
+    
+    class ModernButton(tk.Canvas):
+        """Custom gradient button with rounded corners"""
+        # Gradient images shared by every button, keyed by (width, height, top color, bottom color)
+        gradient_images = {}
+        
+        def __init__(self, parent, text, command, width=200, height=45, 
+                     gradient_colors=None, text_color="black", **kwargs):
+            super().__init__(parent, width=width, height=height, 
+                            highlightthickness=0, **kwargs)
+            
+            self.command = command
+            self.text = text
+            self.width = width
+            self.height = height
+            self.gradient_colors = gradient_colors or ["#60a5fa", "#3b82f6"]
+            self.hover_colors = [self.lighten_color(c) for c in self.gradient_colors]
+            self.text_color = text_color
+            self.background = None
+            
+            self.draw_button()
+            self.bind("<Button-1>", lambda e: self.on_click())
+            self.bind("<Enter>", lambda e: self.on_hover())
+            self.bind("<Leave>", lambda e: self.on_leave())
+            
+        def gradient_image(self, colors):
+            """Render the 20-band gradient into an image once per size and color pair"""
+            key = (self.width, self.height, *colors)
+            image = self.gradient_images.get(key)
+            if image is None:
+                image = tk.PhotoImage(master=self, width=self.width, height=self.height)
+                steps = 20
+                for i in range(steps):
+                    y1 = round(i * (self.height / steps))
+                    y2 = round((i + 1) * (self.height / steps))
+                    if y2 > y1:
+                        image.put(self.interpolate_color(colors[0], colors[1], i / steps),
+                                  to=(0, y1, self.width, y2))
+                self.gradient_images[key] = image
+            return image
+        
+        def draw_button(self, hover=False):
+            colors = self.hover_colors if hover else self.gradient_colors
+            if self.background is not None:
+                # Hover only swaps the background image and recolors the corners
+                self.itemconfigure(self.background, image=self.gradient_image(colors))
+                self.itemconfigure("top", fill=colors[0])
+                self.itemconfigure("bottom", fill=colors[1])
+                return
+            
+            # Draw gradient background
+            self.background = self.create_image(0, 0, anchor="nw", image=self.gradient_image(colors))
+            
+            # Draw rounded rectangle overlay for rounded effect
+            self.create_oval(0, 0, 20, 20, fill=colors[0], outline="", tags="top")
+            self.create_oval(self.width-20, 0, self.width, 20, fill=colors[0], outline="", tags="top")
+            self.create_oval(0, self.height-20, 20, self.height, fill=colors[1], outline="", tags="bottom")
+            self.create_oval(self.width-20, self.height-20, self.width, self.height, fill=colors[1], outline="", tags="bottom")
+            
+            # Draw text
+            self.create_text(self.width/2, self.height/2, text=self.text, 
+                            font=("Segoe UI", 11, "bold"), fill=self.text_color)
+        
+        def lighten_color(self, color):
+            """Lighten a hex color"""
+            color = color.lstrip('#')
+            r, g, b = int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16)
+            r = min(255, r + 20)
+            g = min(255, g + 20)
+            b = min(255, b + 20)
+            return f'#{r:02x}{g:02x}{b:02x}'
+        
+        def interpolate_color(self, color1, color2, ratio):
+            """Interpolate between two colors"""
+            c1 = color1.lstrip('#')
+            c2 = color2.lstrip('#')
+            r1, g1, b1 = int(c1[0:2], 16), int(c1[2:4], 16), int(c1[4:6], 16)
+            r2, g2, b2 = int(c2[0:2], 16), int(c2[2:4], 16), int(c2[4:6], 16)
+            
+            r = int(r1 + (r2 - r1) * ratio)
+            g = int(g1 + (g2 - g1) * ratio)
+            b = int(b1 + (b2 - b1) * ratio)
+            return f'#{r:02x}{g:02x}{b:02x}'
+        
+        def on_hover(self):
+            self.draw_button(hover=True)
+            self.config(cursor="hand2")
+        
+        def on_leave(self):
+            self.draw_button(hover=False)
+            self.config(cursor="")
+        
+        def on_click(self):
+            if self.command:
+                self.command()
+
+class KeyNormalizer:
+    """Column-level key normalization with a configurable, compiled rule set"""
+    cache_limit = 200000
+    rule_names = ('case_sensitive', 'keep_punctuation', 'strip_leading_zeros')
+    
+    def __init__(self, case_sensitive=False, keep_punctuation=False, strip_leading_zeros=False):
+        self.case_sensitive = case_sensitive
+        self.keep_punctuation = keep_punctuation
+        self.strip_leading_zeros = strip_leading_zeros
+        self.cache = {}
+    
+    def describe(self):
+        """Short human-readable summary of the non-default rules"""
+        rules = [name.replace('_', ' ') for name in self.rule_names if getattr(self, name)]
+        return ", ".join(rules) if rules else "default"
+    
+    def rules(self):
+        """The rule flags as a tuple, used to key cached indexes"""
+        return tuple(getattr(self, name) for name in self.rule_names)
+    
+    def normalize_text(self, text):
+        """Normalize a single string"""
+        text = WHITESPACE_RE.sub(' ', text.strip())
+        if not self.case_sensitive:
+            text = text.lower()
+        if self.strip_leading_zeros:
+            text = LEADING_ZEROS_RE.sub('', text)
+        if NUMERIC_RE.fullmatch(text):
+            return canonical_number(text)
+        if not self.keep_punctuation:
+            text = PUNCTUATION_RE.sub('', text)
+        return text
+    
+    def normalize_value(self, val):
+        """Normalize a single value of any type"""
+        if val is None or pd.isna(val):
+            return ""
+        if isinstance(val, (pd.Timestamp, datetime)):
+            return val.strftime(DATE_FORMAT)
+        if isinstance(val, (bool, np.bool_)):
+            return self.normalize_text(str(val))
+        if isinstance(val, (int, float, np.integer, np.floating)):
+            return canonical_number(val)
+        return self.normalize_text(str(val))
+    
+    def normalize_strings(self, series):
+        """Vectorized equivalent of normalize_text over an object Series of strings"""
+        series = series.str.strip().str.replace(WHITESPACE_RE, ' ', regex=True)
+        if not self.case_sensitive:
+            series = series.str.lower()
+        if self.strip_leading_zeros:
+            series = series.str.replace(LEADING_ZEROS_RE, '', regex=True)
+        numeric = series.str.fullmatch(NUMERIC_RE).fillna(False).astype(bool)
+        if not self.keep_punctuation:
+            series = series.where(numeric, series.str.replace(PUNCTUATION_RE, '', regex=True))
+        if numeric.any():
+            series[numeric] = [canonical_number(text) for text in series[numeric]]
+        return series
+    
+    def normalize_uniques(self, values):
+        """Normalize distinct raw values, reusing the memo cache where possible"""
+        result = np.empty(len(values), dtype=object)
+        misses = []
+        for i, value in enumerate(values):
+            cached = self.cache.get((type(value), value))
+            if cached is None:
+                misses.append(i)
+            else:
+                result[i] = cached
+        
+        if misses:
+            miss_values = values[misses]
+            is_text = np.fromiter((isinstance(v, str) for v in miss_values), dtype=bool, count=len(miss_values))
+            normalized = np.empty(len(miss_values), dtype=object)
+            if is_text.any():
+                normalized[is_text] = self.normalize_strings(
+                    pd.Series(miss_values[is_text], dtype=object)).to_numpy(dtype=object)
+            for i in np.flatnonzero(~is_text):
+                normalized[i] = self.normalize_value(miss_values[i])
+            result[misses] = normalized
+            
+            if len(self.cache) + len(misses) > self.cache_limit:
+                self.cache.clear()
+            self.cache.update(zip(((type(v), v) for v in miss_values), normalized))
+        
+        return result
+    
+    def normalize_series(self, series):
+        """Normalize a whole column at once; missing values become empty strings"""
+        if pd.api.types.is_datetime64_any_dtype(series.dtype):
+            return series.dt.strftime(DATE_FORMAT).fillna("").astype(object)
+        
+        codes, uniques = pd.factorize(series)
+        uniques = np.asarray(uniques, dtype=object)
+        if series.dtype == object and any(isinstance(v, (bool, np.bool_)) or v is not None and not isinstance(v, str)
+                                          and pd.api.types.is_number(v) and v in (0, 1) for v in uniques):
+            # factorize takes True for 1 and False for 0, so booleans mixed with numbers are coded apart
+            is_bool = np.fromiter((isinstance(v, (bool, np.bool_)) for v in series.to_numpy(dtype=object)),
+                                  dtype=bool, count=len(series))
+            if is_bool.any() and not is_bool.all():
+                result = np.empty(len(series), dtype=object)
+                result[is_bool] = self.normalize_series(series[is_bool]).to_numpy(dtype=object)
+                result[~is_bool] = self.normalize_series(series[~is_bool]).to_numpy(dtype=object)
+                return pd.Series(result, index=series.index, dtype=object)
+        normalized = self.normalize_uniques(uniques)
+        return pd.Series(np.append(normalized, "")[codes], index=series.index, dtype=object)
+
+def arrow_strings_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def compact_frame(df, category_ratio=0.5):
+    """Convert text columns in place to compact dtypes: categorical when at most category_ratio
+    of the values are distinct, Arrow-backed strings otherwise. Mixed-type columns stay object."""
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype) or not (
+                pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)):
+            continue
+        if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) != "string":
+            continue
+        if series.nunique(dropna=True) <= len(series) * category_ratio:
+            df[col] = series.astype("category")
+        elif series.dtype == object and arrow_strings_available():
+            df[col] = series.astype("string[pyarrow]")
+    return df
+
+def nullable_array(series):
+    """The values of series in a dtype that can hold missing values without becoming object"""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return series.astype("boolean").array
+    if pd.api.types.is_integer_dtype(dtype) and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        return series.astype(dtype.name.replace("uint", "UInt").replace("int", "Int")).array
+    return series.array
+
+class KeyIndex:
+    """Composite reference keys stored as compact integer codes.
+    Each normalized key column is coded against its reference vocabulary; the column codes
+    are folded left to right (code * width + next) and re-densified after every fold, so
+    codes stay below the reference row count and never overflow int64. row_codes keeps the
+    key code of every reference row, so duplicate keys can be grouped without re-normalizing."""
+    version = 2
+    
+    def __init__(self, columns):
+        self.vocabularies = []
+        self.folds = []
+        codes = None
+        for values in columns:
+            column_codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+            self.vocabularies.append(pd.Index(uniques, dtype=object))
+            if codes is None:
+                codes = column_codes.astype(np.int64)
+            else:
+                fold, codes = np.unique(codes * len(uniques) + column_codes, return_inverse=True)
+                self.folds.append(fold)
+        codes = codes if codes is not None else np.empty(0, dtype=np.int64)
+        # Codes are dense (0..n-1); keep the first reference row of each
+        self.row_codes = codes.ravel()
+        _, self.positions = np.unique(self.row_codes, return_index=True)
+        self.group_order = None
+        self.group_offsets = None
+    
+    def __len__(self):
+        return len(self.positions)
+    
+    def counts(self):
+        """Number of reference rows per key code"""
+        return np.bincount(self.row_codes, minlength=len(self.positions))
+    
+    def groups(self):
+        """(order, offsets): the reference rows of code c are order[offsets[c]:offsets[c + 1]], in file order"""
+        if self.group_order is None:
+            self.group_order = np.argsort(self.row_codes, kind="stable")
+            self.group_offsets = np.concatenate(([0], np.cumsum(self.counts())))
+        return self.group_order, self.group_offsets
+    
+    def lookup(self, columns):
+        """Return the first reference position for each row of normalized key columns, -1 if absent"""
+        codes = None
+        for i, values in enumerate(columns):
+            column_codes = self.vocabularies[i].get_indexer(np.asarray(values, dtype=object))
+            if codes is None:
+                codes = column_codes.astype(np.int64)
+                continue
+            fold = self.folds[i - 1]
+            if len(fold) == 0:
+                codes = np.full(len(codes), -1, dtype=np.int64)
+                continue
+            combined = codes * len(self.vocabularies[i]) + column_codes
+            slots = np.minimum(np.searchsorted(fold, combined), len(fold) - 1)
+            found = (codes >= 0) & (column_codes >= 0) & (fold[slots] == combined)
+            codes = np.where(found, slots, -1)
+        
+        positions = np.full(len(codes), -1, dtype=np.int64)
+        valid = codes >= 0
+        positions[valid] = self.positions[codes[valid]]
+        return positions
+
+def join_distinct(values):
+    """Distinct non-missing values as text, in order of appearance"""
+    return "; ".join(dict.fromkeys(str(value) for value in values if not pd.isna(value)))
+
+class HashJoinMatcher:
+    """Composite-key hash index over the reference frame.
+    policy decides what a key found on several reference rows yields: the 'first' or 'last'
+    row, 'all' rows (one output row each), an 'aggregate' (numbers summed, other values joined,
+    plus a match count) or an 'error'."""
+    score_column = "Match Score"
+    count_column = "Match Count"
+    policy = "first"
+    
+    def __init__(self, ref_df, ref_cols, normalizers, index=None):
+        self.ref_df = ref_df
+        self.ref_cols = list(ref_cols)
+        self.normalizers = list(normalizers)
+        self.index = index if index is not None else self.build_index()
+        self.all_keys = None
+        self.duplicate_hits = None
+        self.aggregates = {}
+    
+    def fork(self, ref_df=None):
+        """Copy sharing this matcher's (read-only) indexes, for another run over the same reference
+        rows: ref_df may carry other columns, and per-run state starts empty"""
+        clone = copy.copy(self)
+        clone.ref_df = self.ref_df if ref_df is None else ref_df
+        clone.duplicate_hits = None
+        clone.aggregates = {}
+        return clone
+    
+    def normalize_columns(self, df, cols):
+        """Normalize each key column once; returns one object array per key column"""
+        return [normalizer.normalize_series(df[col]).to_numpy(dtype=object)
+                for col, normalizer in zip(cols, self.normalizers)]
+    
+    def normalize_keys(self, df, cols):
+        """Normalize each key column once and zip them into composite keys"""
+        return list(zip(*(values.tolist() for values in self.normalize_columns(df, cols))))
+    
+    def build_index(self, columns=None):
+        """Code the composite reference keys; columns may hold the already normalized key columns"""
+        return KeyIndex(columns if columns is not None else self.normalize_columns(self.ref_df, self.ref_cols))
+    
+    def lookup(self, columns):
+        """Return the reference position of each row of normalized key columns, -1 if absent"""
+        return self.index.lookup(columns)
+    
+    def probe(self, primary_df, primary_cols):
+        """Return the matched reference position per primary row, -1 if unmatched"""
+        return self.lookup(self.normalize_columns(primary_df, primary_cols))
+    
+    def probe_scored(self, primary_df, primary_cols):
+        """Return (positions, scores); exact matching has no score column"""
+        return self.probe(primary_df, primary_cols), None
+    
+    @property
+    def has_duplicates(self):
+        return len(self.index) < len(self.ref_df)
+    
+    def key_index(self):
+        """KeyIndex over every reference row (a fuzzy index keeps only each key's first row)"""
+        if isinstance(self.index, KeyIndex):
+            return self.index
+        if self.all_keys is None:
+            self.all_keys = KeyIndex(self.normalize_columns(self.ref_df, self.ref_cols))
+        return self.all_keys
+    
+    def describe_key(self, position):
+        """Normalized key of a reference row, for messages"""
+        columns = self.normalize_columns(self.ref_df.iloc[[position]], self.ref_cols)
+        return " | ".join(str(values[0]) for values in columns)
+    
+    def resolve(self, positions, scores=None):
+        """Apply the duplicate-key policy to first-match positions; returns (rows, positions, scores).
+        rows repeats primary rows for 'all' and is None otherwise. Everything is computed per key
+        group over the index, never by filtering the reference per primary row."""
+        if not self.has_duplicates:
+            return None, positions, scores
+        index = self.key_index()
+        order, offsets = index.groups()
+        counts = np.diff(offsets)
+        matched = positions >= 0
+        codes = index.row_codes[positions[matched]]
+        hits = np.bincount(codes, minlength=len(counts))
+        self.duplicate_hits = hits if self.duplicate_hits is None else self.duplicate_hits + hits
+        
+        if self.policy == "error":
+            duplicated = codes[counts[codes] > 1]
+            if len(duplicated):
+                worst = duplicated[np.argmax(counts[duplicated])]
+                raise ValueError(f"{len(duplicated)} primary rows match reference keys that occur more than once "
+                                 f"(e.g. '{self.describe_key(order[offsets[worst]])}' on {counts[worst]} rows); "
+                                 f"choose another duplicate-key policy")
+        elif self.policy == "last":
+            positions = positions.copy()
+            positions[matched] = order[offsets[codes + 1] - 1]
+        elif self.policy == "all":
+            repeats = np.ones(len(positions), dtype=np.int64)
+            repeats[matched] = counts[codes]
+            rows = np.repeat(np.arange(len(positions)), repeats)
+            starts = np.zeros(len(positions), dtype=np.int64)
+            starts[matched] = offsets[codes]
+            within = np.arange(len(rows)) - np.repeat(np.cumsum(repeats) - repeats, repeats)
+            expanded = np.where(matched[rows], order[np.minimum(starts[rows] + within, len(order) - 1)], -1)
+            return rows, expanded, scores[rows] if scores is not None else None
+        return None, positions, scores
+    
+    def aggregated(self, carry_cols):
+        """One row per key code: numeric columns summed, other columns as their distinct values joined"""
+        key = tuple(carry_cols)
+        if key in self.aggregates:
+            return self.aggregates[key]
+        index = self.key_index()
+        order, offsets = index.groups()
+        counts = np.diff(offsets)
+        first = order[offsets[:-1]]
+        duplicated_rows = np.flatnonzero(counts[index.row_codes] > 1)
+        columns = {}
+        for col in carry_cols:
+            series = self.ref_df[col]
+            if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+                columns[col] = series.groupby(index.row_codes, sort=True).sum(min_count=1).array
+            else:
+                values = series.to_numpy(dtype=object)
+                aggregated = values[first]
+                if len(duplicated_rows):
+                    joined = pd.Series(values[duplicated_rows]).groupby(
+                        index.row_codes[duplicated_rows], sort=True).agg(join_distinct)
+                    aggregated[joined.index.to_numpy()] = joined.to_numpy()
+                columns[col] = aggregated
+        self.aggregates[key] = pd.DataFrame(columns)
+        return self.aggregates[key]
+    
+    def duplicate_report(self, top=10):
+        """The most ambiguous keys: reference rows sharing a key, and primary rows that hit it"""
+        if not self.has_duplicates:
+            return []
+        index = self.key_index()
+        order, offsets = index.groups()
+        counts = np.diff(offsets)
+        hits = self.duplicate_hits if self.duplicate_hits is not None else np.zeros(len(counts), dtype=np.int64)
+        duplicated = np.flatnonzero(counts > 1)
+        ranked = duplicated[np.lexsort((-hits[duplicated], -counts[duplicated]))][:top]
+        return [{'key': self.describe_key(order[offsets[code]]), 'reference_rows': int(counts[code]),
+                 'primary_rows': int(hits[code])} for code in ranked]
+    
+    def gather(self, primary_df, positions, carry_cols, scores=None):
+        """Build the merged frame by gathering reference columns at the matched positions"""
+        rows, positions, scores = self.resolve(positions, scores)
+        result_df = primary_df.copy() if rows is None else primary_df.iloc[rows]
+        return self.gather_into(result_df, positions, carry_cols, scores)
+    
+    def gather_into(self, result_df, positions, carry_cols, scores=None):
+        """Gather reference columns into result_df in place (other sources may already be merged in).
+        positions must already be resolved by the duplicate-key policy."""
+        ref_df = self.ref_df
+        match_counts = None
+        if self.policy == "aggregate":
+            matched = positions >= 0
+            match_counts = matched.astype(np.int64)
+            if self.has_duplicates:
+                index = self.key_index()
+                codes = np.full(len(positions), -1, dtype=np.int64)
+                codes[matched] = index.row_codes[positions[matched]]
+                match_counts[matched] = index.counts()[codes[matched]]
+                ref_df, positions = self.aggregated(carry_cols), codes
+        
+        matched = positions >= 0
+        matched_positions = positions[matched]
+        
+        for col in carry_cols:
+            if col in result_df.columns:
+                # Primary values survive on unmatched rows, so the column may hold mixed types
+                values = result_df[col].to_numpy(dtype=object, copy=True)
+                values[matched] = ref_df[col].to_numpy(dtype=object)[matched_positions]
+                result_df[col] = values
+            else:
+                # Keep the reference dtype; unmatched rows become missing values (NA/NaN/NaT)
+                values = nullable_array(ref_df[col]).take(positions, allow_fill=True)
+                result_df[col] = pd.Series(values, index=result_df.index)
+        
+        if scores is not None:
+            values = np.full(len(result_df), np.nan)
+            values[matched] = np.round(scores[matched], 4)
+            result_df[self.score_column] = values
+        
+        if match_counts is not None:
+            result_df[self.count_column] = match_counts
+        
+        return result_df
+
+class FuzzyMatcher(HashJoinMatcher):
+    """Approximate matching: exact hits first, then a trigram blocking index so only
+    reference keys sharing n-grams with a primary key are scored.
+    fuzzy holds one entry per key column: None for exact, or {'metric', 'threshold'}.
+    Unless a single trigram column is scored in bulk, only the max_candidates keys sharing the
+    most n-grams are rescored, so a better match ranked lower is missed; 0 rescores them all."""
+    max_candidates = 20
+    common_gram_ratio = 0.1
+    
+    def __init__(self, ref_df, ref_cols, normalizers, fuzzy):
+        self.fuzzy = list(fuzzy)
+        self.fuzzy_idx = [i for i, spec in enumerate(self.fuzzy) if spec]
+        self.exact_idx = [i for i, spec in enumerate(self.fuzzy) if not spec]
+        super().__init__(ref_df, ref_cols, normalizers)
+        self.build_blocking_index()
+    
+    def build_index(self, columns=None):
+        """Map each composite key tuple to the position of its first reference row"""
+        columns = columns if columns is not None else self.normalize_columns(self.ref_df, self.ref_cols)
+        index = {}
+        for pos, key in enumerate(zip(*(values.tolist() for values in columns))):
+            if key not in index:
+                index[key] = pos
+        return index
+    
+    def fuzzy_text(self, key):
+        return " ".join(key[i] for i in self.fuzzy_idx)
+    
+    def exact_part(self, key):
+        return tuple(key[i] for i in self.exact_idx)
+    
+    def build_blocking_index(self):
+        """Index every distinct reference key by its n-grams and by its exact columns"""
+        self.keys = list(self.index)
+        self.key_positions = np.fromiter(self.index.values(), dtype=np.int64, count=len(self.keys))
+        self.gram_counts = np.empty(len(self.keys), dtype=np.int64)
+        postings = {}
+        exact_groups = {}
+        
+        for key_id, key in enumerate(self.keys):
+            grams = ngrams(self.fuzzy_text(key))
+            self.gram_counts[key_id] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(key_id)
+            exact_groups.setdefault(self.exact_part(key), []).append(key_id)
+        
+        # Grams shared by a large share of the keys are poor discriminators: they are not used
+        # to generate candidates, but a per-key bitmask keeps their overlap counts exact
+        limit = max(1000, int(len(self.keys) * self.common_gram_ratio))
+        common = sorted((gram for gram, ids in postings.items() if len(ids) > limit),
+                        key=lambda gram: -len(postings[gram]))[:64]
+        self.postings = {gram: np.array(ids, dtype=np.int64) for gram, ids in postings.items()}
+        self.common_bits = {gram: bit for bit, gram in enumerate(common)}
+        self.common_masks = np.zeros(len(self.keys), dtype=np.uint64)
+        for gram, bit in self.common_bits.items():
+            self.common_masks[self.postings[gram]] |= np.uint64(1 << bit)
+        self.exact_groups = {part: np.array(ids, dtype=np.int64) for part, ids in exact_groups.items()}
+    
+    def best_match(self, key):
+        """Return (position, score) of the best-scoring reference row for a primary key"""
+        position = self.index.get(key)
+        if position is not None:
+            return position, 1.0
+        
+        text = self.fuzzy_text(key)
+        if not text.strip():
+            return -1, np.nan
+        grams = ngrams(text)
+        known = [gram for gram in grams if gram in self.postings]
+        selective = [gram for gram in known if gram not in self.common_bits]
+        lists = [self.postings[gram] for gram in (selective or known)]
+        if not lists:
+            return -1, np.nan
+        
+        candidates, shared = np.unique(np.concatenate(lists), return_counts=True)
+        if self.exact_idx:
+            allowed = self.exact_groups.get(self.exact_part(key))
+            if allowed is None:
+                return -1, np.nan
+            mask = np.isin(candidates, allowed)
+            candidates, shared = candidates[mask], shared[mask]
+        
+        single_trigram = len(self.fuzzy_idx) == 1 and self.fuzzy[self.fuzzy_idx[0]]['metric'] == 'trigram'
+        common = [self.common_bits[gram] for gram in known if gram in self.common_bits] if selective else []
+        if single_trigram:
+            # Drop candidates that cannot reach the threshold even if they share every common gram
+            threshold = self.fuzzy[self.fuzzy_idx[0]]['threshold']
+            mask = (shared + len(common)) * (1 + threshold) >= threshold * (len(grams) + self.gram_counts[candidates])
+            candidates, shared = candidates[mask], shared[mask]
+        if not len(candidates):
+            return -1, np.nan
+        if common:
+            query_mask = np.uint64(sum(1 << bit for bit in common))
+            shared = shared + popcount(self.common_masks[candidates] & query_mask)
+        
+        jaccard = shared / (len(grams) + self.gram_counts[candidates] - shared)
+        
+        # Single trigram column: the Jaccard above is the exact score, so pick the best in bulk
+        if single_trigram:
+            keep = jaccard >= threshold
+            if not keep.any():
+                return -1, np.nan
+            scores, positions = jaccard[keep], self.key_positions[candidates[keep]]
+            best = np.lexsort((positions, -scores))[0]
+            return int(positions[best]), float(scores[best])
+        
+        # Otherwise score the most promising candidates column by column; a SequenceMatcher per
+        # column caches the primary value, and its quick upper bounds skip hopeless candidates
+        scorers = {}
+        for i in self.fuzzy_idx:
+            if self.fuzzy[i]['metric'] == 'ratio':
+                scorers[i] = SequenceMatcher(None, b=key[i], autojunk=False)
+            else:
+                scorers[i] = ngrams(key[i])
+        
+        best_position, best_score = -1, np.nan
+        ranked = candidates[np.argsort(-jaccard, kind='stable')]
+        for key_id in ranked[:self.max_candidates] if self.max_candidates else ranked:
+            ref_key = self.keys[key_id]
+            scores = []
+            for i in self.fuzzy_idx:
+                threshold = self.fuzzy[i]['threshold']
+                scorer = scorers[i]
+                if isinstance(scorer, SequenceMatcher):
+                    scorer.set_seq1(ref_key[i])
+                    if scorer.real_quick_ratio() < threshold or scorer.quick_ratio() < threshold:
+                        break
+                    score = scorer.ratio()
+                else:
+                    ref_grams = ngrams(ref_key[i])
+                    score = len(scorer & ref_grams) / len(scorer | ref_grams)
+                if score < threshold:
+                    break
+                scores.append(score)
+            else:
+                score = sum(scores) / len(scores)
+                position = int(self.key_positions[key_id])
+                if best_position < 0 or score > best_score or (score == best_score and position < best_position):
+                    best_position, best_score = position, score
+        return best_position, best_score
+    
+    def probe_scored(self, primary_df, primary_cols):
+        """Return (positions, scores); each distinct primary key is scored once"""
+        keys = self.normalize_keys(primary_df, primary_cols)
+        positions = np.empty(len(keys), dtype=np.int64)
+        scores = np.empty(len(keys), dtype=float)
+        results = {}
+        for i, key in enumerate(keys):
+            if key not in results:
+                results[key] = self.best_match(key)
+            positions[i], scores[i] = results[key]
+        return positions, scores
+    
+    def probe(self, primary_df, primary_cols):
+        return self.probe_scored(primary_df, primary_cols)[0]
+
+class OutputWriter:
+    """Incremental output target; merged rows are written chunk by chunk"""
+    extension = None
+    description = None
+    
+    def __init__(self, path):
+        self.path = path
+        self.rows_written = 0
+        self.header_written = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        if exc_type is not None:
+            Path(self.path).unlink(missing_ok=True)
+        return False
+    
+    def write(self, df):
+        self.write_chunk(df, header=not self.header_written)
+        self.header_written = True
+        self.rows_written += len(df)
+    
+    def write_chunk(self, df, header):
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+
+class XlsxOutputWriter(OutputWriter):
+    """Constant-memory XLSX output through a write-only openpyxl workbook"""
+    extension = ".xlsx"
+    description = "Excel files"
+    
+    def __init__(self, path):
+        super().__init__(path)
+        self.wb = openpyxl.Workbook(write_only=True)
+        self.ws = self.wb.create_sheet()
+    
+    def write_chunk(self, df, header):
+        if header:
+            self.ws.append([str(col) for col in df.columns])
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False, name=None):
+            self.ws.append(row)
+    
+    def close(self):
+        self.wb.save(self.path)
+
+class CsvOutputWriter(OutputWriter):
+    """Plain CSV output (UTF-8 with BOM so Excel detects the encoding)"""
+    extension = ".csv"
+    description = "CSV files"
+    
+    def __init__(self, path):
+        super().__init__(path)
+        self.handle = open(path, "w", newline="", encoding="utf-8-sig")
+    
+    def write_chunk(self, df, header):
+        df.to_csv(self.handle, index=False, header=header)
+    
+    def close(self):
+        self.handle.close()
+
+class ParquetOutputWriter(OutputWriter):
+    """Parquet output, one row group per chunk (requires pyarrow).
+    The schema comes from the first chunk; when a later chunk needs a wider column type
+    (integers then fractions, or numbers then text), the row groups written so far are
+    rewritten under the wider schema, so a streamed merge never fails on type drift."""
+    extension = ".parquet"
+    description = "Parquet files"
+    
+    def __init__(self, path):
+        super().__init__(path)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+        self.pa = pyarrow
+        self.writer = None
+        self.schema = None
+        self.file = Path(path)  # where row groups go; a rewrite moves them to a temporary file
+    
+    def prepare(self, df):
+        """Turn object columns into Arrow-friendly columns: blanks become nulls, mixed types become text"""
+        df = df.copy()
+        for col in df.columns:
+            if not (pd.api.types.is_object_dtype(df[col]) or pd.api.types.is_string_dtype(df[col])):
+                continue
+            values = df[col].where(df[col].notna() & (df[col] != ""), None).infer_objects()
+            if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) in ("mixed", "mixed-integer"):
+                values = values.map(lambda v: v if v is None else str(v))
+            df[col] = values
+        return df
+    
+    def wider_type(self, current, new):
+        """A type holding values of both types: the same type, float64 for mixed numbers, else text"""
+        types = self.pa.types
+        if current == new or types.is_null(new):
+            return current
+        if types.is_integer(current) and types.is_integer(new):
+            return self.pa.int64()
+        if types.is_timestamp(current) and types.is_timestamp(new) and current.tz == new.tz:
+            return current
+        if all(types.is_string(t) or types.is_large_string(t) for t in (current, new)):
+            return current
+        if all(types.is_integer(t) or types.is_floating(t) for t in (current, new)):
+            return self.pa.float64()
+        return self.pa.string()
+    
+    def widen(self, types):
+        """Re-type the given columns ({name: type}) and rewrite the row groups written so far"""
+        self.schema = self.pa.schema([field.with_type(types.get(field.name, field.type)) for field in self.schema])
+        self.writer.close()
+        written = self.pa.parquet.ParquetFile(self.file)
+        target = Path(self.path).with_name(f"{Path(self.path).name}.{uuid.uuid4().hex[:8]}.tmp")
+        self.writer = self.pa.parquet.ParquetWriter(target, self.schema)
+        for i in range(written.num_row_groups):
+            self.writer.write_table(written.read_row_group(i).cast(self.schema))
+        written.close()
+        if self.file != Path(self.path):
+            self.file.unlink(missing_ok=True)
+        self.file = target
+    
+    def write_chunk(self, df, header):
+        table = self.pa.Table.from_pandas(self.prepare(df), preserve_index=False)
+        if self.writer is None:
+            self.schema = self.pa.schema([
+                field.with_type(self.pa.string()) if self.pa.types.is_null(field.type) else field
+                for field in table.schema
+            ]).remove_metadata()
+            self.writer = self.pa.parquet.ParquetWriter(self.file, self.schema)
+        widened = {}
+        for field in self.schema:
+            wider = self.wider_type(field.type, table.schema.field(field.name).type)
+            if wider != field.type:
+                widened[field.name] = wider
+        if widened:
+            self.widen(widened)
+        try:
+            table = table.cast(self.schema)
+        except (self.pa.ArrowInvalid, self.pa.ArrowNotImplementedError) as e:
+            raise ValueError(f"Cannot write this chunk to Parquet with the columns' earlier types: {e}") from e
+        self.writer.write_table(table)
+    
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            if self.file != Path(self.path):
+                os.replace(self.file, self.path)
+
+OUTPUT_WRITERS = {writer.extension: writer for writer in (XlsxOutputWriter, CsvOutputWriter, ParquetOutputWriter)}
+
+def open_output_writer(path):
+    """Pick the output writer from the file extension"""
+    suffix = Path(path).suffix.lower()
+    if suffix not in OUTPUT_WRITERS:
+        raise ValueError(f"Unsupported output format '{suffix}' (use {', '.join(OUTPUT_WRITERS)})")
+    return OUTPUT_WRITERS[suffix](path)
+
+class WorkbookCache:
+    """On-disk cache of parsed workbooks and reference key indexes, keyed by file content hash.
+    Frames are stored as Feather (memory-mapped on read) when pyarrow can represent them,
+    otherwise pickled; the least recently used entries are evicted past max_bytes."""
+    
+    def __init__(self, cache_dir=None, max_bytes=1024 ** 3):
+        self.cache_dir = Path(cache_dir or os.environ.get("EXCELMERGER_CACHE_DIR")
+                              or Path.home() / ".cache" / "excelmerger")
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+    
+    @staticmethod
+    def file_digest(path):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+    
+    def touch(self, path):
+        """Mark an entry as recently used"""
+        os.utime(path)
+        return path
+    
+    def store(self, path, write):
+        """Write an entry atomically, then enforce the size limit"""
+        tmp_path = path.with_name(path.name + ".tmp")
+        write(tmp_path)
+        os.replace(tmp_path, path)
+        self.evict()
+    
+    def evict(self):
+        entries = [(entry.stat(), entry) for entry in self.cache_dir.iterdir() if entry.is_file()]
+        total = sum(stat.st_size for stat, _ in entries)
+        for stat, entry in sorted(entries, key=lambda item: item[0].st_mtime):
+            if total <= self.max_bytes:
+                break
+            entry.unlink(missing_ok=True)
+            total -= stat.st_size
+    
+    @staticmethod
+    def qualify(digest, sheets=None):
+        """Content key of a workbook read as the given sheets (None: the first sheet)"""
+        if sheets is None:
+            return digest
+        return f"{digest}-{hashlib.blake2b(repr(list(sheets)).encode('utf-8'), digest_size=8).hexdigest()}"
+    
+    def load_frame(self, path, columns=None, reader=None, sheets=None):
+        """Return (df, hit) for a workbook, parsing it with reader only on a cache miss.
+        With columns, a cached full frame is reused; otherwise only those columns are parsed.
+        sheets names the sheets reader stacks into one table; it is part of the cache key."""
+        digest = self.qualify(self.file_digest(path), sheets)
+        keys = [digest]
+        if columns is not None:
+            columns = list(columns)
+            keys.append(f"{digest}-{hashlib.blake2b(repr(columns).encode('utf-8'), digest_size=8).hexdigest()}")
+        
+        for key in keys:
+            feather_path = self.cache_dir / f"{key}.feather"
+            pickle_path = self.cache_dir / f"{key}.pkl"
+            if feather_path.exists():
+                from pyarrow import feather
+                df = feather.read_table(self.touch(feather_path), columns=columns, memory_map=True).to_pandas()
+            elif pickle_path.exists():
+                df = pd.read_pickle(self.touch(pickle_path))
+                df = df[columns] if columns is not None else df
+            else:
+                continue
+            df.attrs['cache_key'] = digest
+            return df, True
+        
+        reader = reader or pd.read_excel
+        df = reader(path, usecols=columns) if columns is not None else reader(path)
+        feather_path = self.cache_dir / f"{keys[-1]}.feather"
+        pickle_path = self.cache_dir / f"{keys[-1]}.pkl"
+        try:
+            if not all(isinstance(col, str) for col in df.columns):
+                raise ValueError("non-string column names")
+            self.store(feather_path, lambda tmp: df.to_feather(tmp))
+        except Exception:
+            self.store(pickle_path, lambda tmp: df.to_pickle(tmp))
+        df.attrs['cache_key'] = digest
+        return df, False
+    
+    def index_path(self, ref_df, ref_cols, normalizers):
+        key = ref_df.attrs.get('cache_key')
+        if key is None:
+            return None
+        mapping = repr((KeyIndex.version, list(ref_cols), [normalizer.rules() for normalizer in normalizers]))
+        mapping_key = hashlib.blake2b(mapping.encode("utf-8"), digest_size=8).hexdigest()
+        return self.cache_dir / f"{key}-{mapping_key}.index.pkl"
+    
+    def load_index(self, ref_df, ref_cols, normalizers):
+        """Return the cached key index for this reference frame and mapping, or None"""
+        path = self.index_path(ref_df, ref_cols, normalizers)
+        if path is None or not path.exists():
+            return None
+        try:
+            with open(self.touch(path), "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, AttributeError, ImportError, pickle.UnpicklingError):
+            # Written by a run of the script as __main__, or torn; rebuilt and stored again
+            return None
+    
+    def store_index(self, ref_df, ref_cols, normalizers, index):
+        path = self.index_path(ref_df, ref_cols, normalizers)
+        if path is not None:
+            def write(tmp_path):
+                with open(tmp_path, "wb") as f:
+                    pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.store(path, write)
+
+class FingerprintStore:
+    """Fingerprints of the previous merge of a primary file against a reference: one hash per
+    distinct primary key plus the reference position (and fuzzy score) it matched. They are valid
+    only while the reference content and the mapping are unchanged (the signature)."""
+    version = 1
+    
+    def __init__(self, directory=None):
+        self.directory = Path(directory or Path(os.environ.get("EXCELMERGER_CACHE_DIR")
+                                                or Path.home() / ".cache" / "excelmerger") / "fingerprints")
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def path(self, primary_file, ref_file):
+        pair = repr((str(Path(primary_file).resolve()), str(Path(ref_file).resolve())))
+        return self.directory / f"{hashlib.blake2b(pair.encode('utf-8'), digest_size=16).hexdigest()}.npz"
+    
+    @classmethod
+    def signature(cls, ref_digest, match_pairs, normalizers, fuzzy=None, max_candidates=None):
+        """Everything besides the primary keys that decides which reference row a primary row matches"""
+        settings = repr((cls.version, KeyIndex.version, ref_digest, [tuple(pair) for pair in match_pairs],
+                         [normalizer.rules() for normalizer in normalizers], fuzzy, max_candidates))
+        return hashlib.blake2b(settings.encode("utf-8"), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def row_hashes(df, cols):
+        """One uint64 per row over the raw key values. Non-string values are hashed with their type
+        (5, 5.0 and '5' differ); a string hashes the same whatever else its column holds."""
+        combined = np.zeros(len(df), dtype=np.uint64)
+        for col in cols:
+            series = df[col]
+            kind = series
+            if isinstance(series.dtype, pd.CategoricalDtype) and not series.isna().any():
+                kind = series.cat.categories
+            if pd.api.types.infer_dtype(kind, skipna=False) in ("string", "empty"):
+                # Object, Arrow and categorical strings hash alike, so a dtype change costs nothing
+                hashed = pd.util.hash_pandas_object(series, index=False).to_numpy()
+            else:
+                hashed = pd.util.hash_array(np.array(
+                    [value if isinstance(value, str) else f"\x00{type(value).__name__}:{value!r}"
+                     for value in series.to_numpy(dtype=object)], dtype=object))
+            combined = combined * np.uint64(1000003) ^ hashed
+        return combined
+    
+    def load(self, primary_file, ref_file, signature):
+        """Return (hashes, positions, scores) of the previous run, or None if absent or stale"""
+        path = self.path(primary_file, ref_file)
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as stored:
+            if str(stored['signature']) != signature:
+                return None
+            return stored['hashes'], stored['positions'], stored['scores']
+    
+    def save(self, primary_file, ref_file, signature, hashes, positions, scores=None):
+        """Keep the first occurrence of each row hash"""
+        hashes, first = np.unique(hashes, return_index=True)
+        scores = scores[first] if scores is not None else np.full(len(first), np.nan)
+        path = self.path(primary_file, ref_file)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, signature=np.array(signature), hashes=hashes, positions=positions[first], scores=scores)
+        os.replace(tmp_path, path)
+
+class CheckpointStore:
+    """Probe results of merges that have not finished yet: the matched reference position (and
+    fuzzy score) of every primary row probed so far, saved under a signature of the primary keys,
+    the reference keys and the mapping. Rerunning the same merge resumes after the saved rows;
+    the files are deleted once the merged output is written, and abandoned ones age out.
+    Batch merges leave a small marker per finished file instead, so a rerun skips those files."""
+    version = 1
+    interval = 60.0  # seconds between saves while a probe runs
+    max_age_days = 7
+    
+    def __init__(self, directory=None):
+        self.directory = Path(directory or Path(os.environ.get("EXCELMERGER_CACHE_DIR")
+                                                or Path.home() / ".cache" / "excelmerger") / "checkpoints")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        cutoff = time.time() - self.max_age_days * 86400
+        for path in [*self.directory.glob("*.npz"), *self.directory.glob("*.json")]:
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                pass
+    
+    @classmethod
+    def signature(cls, *inputs):
+        settings = repr((cls.version, KeyIndex.version) + inputs)
+        return hashlib.blake2b(settings.encode("utf-8"), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def digest(df):
+        """Content hash of a frame's values and column names"""
+        hashed = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        return hashlib.blake2b(hashed.tobytes() + repr(list(df.columns)).encode("utf-8"), digest_size=16).hexdigest()
+    
+    def path(self, signature):
+        return self.directory / f"{signature}.npz"
+    
+    def open(self, signature):
+        """ProbeCheckpoint resuming from whatever was saved under signature"""
+        path = self.path(signature)
+        saved = None
+        if path.exists():
+            try:
+                with np.load(path, allow_pickle=False) as stored:
+                    saved = stored['positions'], stored['scores'] if bool(stored['scored']) else None
+            except (OSError, ValueError, KeyError):
+                saved = None  # a torn write; start over
+        return ProbeCheckpoint(self, path, saved)
+    
+    def save(self, path, positions, scores=None):
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, positions=positions, scores=scores if scores is not None else np.empty(0),
+                     scored=np.array(scores is not None))
+        os.replace(tmp_path, path)
+    
+    def marker(self, signature):
+        return self.directory / f"{signature}.json"
+    
+    def finished(self, signature):
+        """Result recorded by mark_finished under signature, or None"""
+        try:
+            return json.loads(self.marker(signature).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+    
+    def mark_finished(self, signature, result):
+        path = self.marker(signature)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(result), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+class ProbeCheckpoint:
+    """Results of one probe as it runs. Rows saved by an earlier, interrupted run are served from
+    the checkpoint; later rows are probed and saved every CheckpointStore.interval seconds."""
+    
+    def __init__(self, store, path, saved=None):
+        self.store = store
+        self.path = path
+        self.positions = [saved[0]] if saved else []
+        self.scores = [saved[1]] if saved and saved[1] is not None else []
+        self.resumed = len(saved[0]) if saved else 0  # rows restored from disk
+        self.rows = self.resumed  # rows probed or restored so far
+        self.saved_rows = self.resumed
+        self.offset = 0
+        self.saved_at = time.monotonic()
+    
+    def probe(self, matcher, df, primary_cols):
+        """matcher.probe_scored(df, primary_cols) for the next len(df) rows of the probe"""
+        start = self.offset
+        self.offset += len(df)
+        reused = min(max(self.resumed - start, 0), len(df))
+        positions = self.positions[0][start:start + reused] if reused else None
+        scores = self.scores[0][start:start + reused] if reused and self.scores else None
+        if reused == len(df):
+            return positions, scores
+        
+        fresh_positions, fresh_scores = matcher.probe_scored(df.iloc[reused:], primary_cols)
+        self.record(fresh_positions, fresh_scores)
+        if not reused:
+            return fresh_positions, fresh_scores
+        return (np.concatenate([positions, fresh_positions]),
+                np.concatenate([scores, fresh_scores]) if fresh_scores is not None else None)
+    
+    def record(self, positions, scores=None):
+        """Append the results of the rows after those recorded so far, saving once the interval has passed"""
+        self.positions.append(positions)
+        if scores is not None:
+            self.scores.append(scores)
+        self.rows += len(positions)
+        if time.monotonic() - self.saved_at >= self.store.interval:
+            self.save()
+    
+    def save(self):
+        """Write every row probed so far"""
+        if self.rows > self.saved_rows:
+            self.positions = [np.concatenate(self.positions)] if self.positions else [np.empty(0, dtype=np.int64)]
+            self.scores = [np.concatenate(self.scores)] if self.scores else []
+            self.store.save(self.path, self.positions[0], self.scores[0] if self.scores else None)
+            self.saved_rows = self.rows
+        self.saved_at = time.monotonic()
+    
+    def discard(self):
+        self.path.unlink(missing_ok=True)
+
+class HotIndexCache:
+    """Reference frames and their key indexes kept in memory across the jobs of a MergeServer,
+    least recently used reference evicted first. Entries are keyed by workbook content (and sheet
+    selection), so an edited reference is a new entry; evicting a reference drops its indexes."""
+    
+    def __init__(self, capacity=4):
+        self.capacity = max(1, capacity)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}  # content key -> lock held while that workbook is parsed
+        self.hits = 0
+        self.misses = 0
+    
+    def frame(self, engine, path):
+        """The whole workbook as a frame, parsed by engine only if it is not held already"""
+        key = engine.content_key(path)
+        with self.lock:
+            loading = self.loading.setdefault(key, threading.Lock())
+        with loading:  # jobs wanting the same workbook wait for one parse instead of repeating it
+            with self.lock:
+                entry = self.entries.get(key)
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+            if entry is not None:
+                engine.log(f"Hot reference: {entry['name']} ({len(entry['frame'])} rows already in memory)", "info")
+                return entry['frame']
+            
+            engine.log(f"Loading Reference file: {Path(path).name}", "info")
+            df = engine.load(path)
+            df.attrs['cache_key'] = key
+            with self.lock:
+                self.misses += 1
+                self.entries[key] = {'name': Path(path).name, 'frame': df, 'indexes': {}}
+                while len(self.entries) > self.capacity:
+                    evicted_key, evicted = self.entries.popitem(last=False)
+                    self.loading.pop(evicted_key, None)
+                    engine.log(f"Hot cache full: dropped {evicted['name']} and its indexes", "info")
+        return df
+    
+    def matcher(self, key, mapping):
+        """Matcher stored for a reference and mapping, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry['indexes'].get(mapping) if entry is not None else None
+    
+    def store(self, key, mapping, matcher):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry['indexes'][mapping] = matcher
+    
+    def stats(self):
+        """Held references, most recently used first, with hit and miss counts"""
+        with self.lock:
+            return {
+                'capacity': self.capacity,
+                'hits': self.hits,
+                'misses': self.misses,
+                'references': [{'file': entry['name'], 'rows': len(entry['frame']), 'indexes': len(entry['indexes'])}
+                               for entry in reversed(self.entries.values())],
+            }
+
+def sql_value(value):
+    """Make a worksheet value bindable by sqlite3: dates/times become ISO text"""
+    if value is None or isinstance(value, (str, int, float, bytes)):
+        return value
+    if value is pd.NaT:
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+def sql_tag(value):
+    """Tag stored beside a value whose type sqlite3 would lose (see SQL_DECODERS), else None"""
+    if isinstance(value, bool):
+        return 1
+    if sql_value(value) is not None and not isinstance(value, (str, int, float, bytes)) and hasattr(value, "isoformat"):
+        return 2
+    return None
+
+def decode_sql_datetime(text):
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+# Booleans come back from SQLite as 0/1 and dates as ISO text; their tags restore them
+SQL_DECODERS = {1: bool, 2: decode_sql_datetime}
+
+class SqliteReferenceStore:
+    """Out-of-core reference index in a temporary on-disk SQLite database.
+    Normalized keys and carry-over values are bulk-loaded chunk by chunk, each carried value
+    with a type tag (sql_tag) so booleans and dates read back as such in any row; a unique index on
+    the composite key with INSERT OR IGNORE keeps the first reference row per key, and primary
+    chunks are resolved with one indexed LEFT JOIN each to the matched rowids. Rowids follow the
+    load order, so the same reference gets the same ones on every run and they can be
+    checkpointed like matcher positions. Memory use does not grow with the reference size."""
+    cache_mb = 64
+    
+    def __init__(self, ref_cols, normalizers, carry_cols, directory=None):
+        self.ref_cols = list(ref_cols)
+        self.normalizers = list(normalizers)
+        self.carry_cols = list(carry_cols)
+        self.rows_loaded = 0
+        self.created = False
+        fd, self.path = tempfile.mkstemp(prefix="excelmerger-", suffix=".sqlite", dir=directory)
+        os.close(fd)
+        # Used from one worker thread at a time, but not the thread that may create it
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute(f"PRAGMA cache_size = -{self.cache_mb * 1024}")
+        self.key_names = [f"k{i}" for i in range(len(self.ref_cols))]
+        self.carry_names = [f"c{i}" for i in range(len(self.carry_cols))]
+        self.tag_names = [f"t{i}" for i in range(len(self.carry_cols))]
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+    
+    def __len__(self):
+        self.create()
+        return self.conn.execute("SELECT COUNT(*) FROM ref").fetchone()[0]
+    
+    def create(self):
+        if self.created:
+            return
+        columns = [f"{name} TEXT NOT NULL" for name in self.key_names]
+        columns += self.carry_names + [f"{name} INTEGER" for name in self.tag_names]
+        self.conn.execute(f"CREATE TABLE ref ({', '.join(columns)})")
+        self.conn.execute(f"CREATE UNIQUE INDEX ref_key ON ref ({', '.join(self.key_names)})")
+        self.conn.execute(f"CREATE TEMP TABLE probe (pos INTEGER PRIMARY KEY, "
+                          f"{', '.join(f'{name} TEXT' for name in self.key_names)})")
+        self.conn.execute("CREATE TEMP TABLE hit (pos INTEGER PRIMARY KEY, rid INTEGER NOT NULL)")
+        self.created = True
+    
+    def normalize_columns(self, df, cols):
+        return [normalizer.normalize_series(df[col]).tolist() for col, normalizer in zip(cols, self.normalizers)]
+    
+    def add(self, chunk):
+        """Bulk-load one reference chunk; rows whose key is already stored are skipped"""
+        self.create()
+        keys = self.normalize_columns(chunk, self.ref_cols)
+        values = [chunk[col].tolist() for col in self.carry_cols]
+        carried = [[sql_value(v) for v in column] for column in values]
+        carried += [[sql_tag(v) for v in column] for column in values]
+        placeholders = ", ".join("?" * (len(keys) + len(carried)))
+        self.conn.executemany(f"INSERT OR IGNORE INTO ref VALUES ({placeholders})", zip(*keys, *carried))
+        self.conn.commit()
+        self.rows_loaded += len(chunk)
+    
+    def probe_scored(self, chunk, primary_cols):
+        """Return (reference rowid of each primary row or -1, None) for one primary chunk;
+        the same contract as the matchers' probe_scored, so a ProbeCheckpoint can record it"""
+        self.create()
+        keys = self.normalize_columns(chunk, primary_cols)
+        self.conn.execute("DELETE FROM probe")
+        self.conn.executemany(f"INSERT INTO probe VALUES (?, {', '.join('?' * len(keys))})",
+                              zip(range(len(chunk)), *keys))
+        condition = " AND ".join(f"ref.{name} = probe.{name}" for name in self.key_names)
+        rows = self.conn.execute(f"SELECT ref.rowid FROM probe LEFT JOIN ref ON {condition} "
+                                 f"ORDER BY probe.pos").fetchall()
+        return np.fromiter((-1 if rowid is None else rowid for rowid, in rows), dtype=np.int64, count=len(rows)), None
+    
+    def carried(self, positions):
+        """Carry-over values of the rows at positions (rowids, -1 for none), one object array per column"""
+        columns = [np.full(len(positions), None, dtype=object) for _ in self.carry_cols]
+        hits = np.flatnonzero(positions >= 0)
+        if not len(hits) or not self.carry_cols:
+            return columns
+        self.conn.execute("DELETE FROM hit")
+        self.conn.executemany("INSERT INTO hit VALUES (?, ?)", zip(hits.tolist(), positions[hits].tolist()))
+        selected = ", ".join(f"ref.{name}" for name in self.carry_names + self.tag_names)
+        rows = self.conn.execute(f"SELECT {selected} FROM hit JOIN ref ON ref.rowid = hit.rid "
+                                 f"ORDER BY hit.pos").fetchall()
+        width = len(self.carry_names)
+        decoded = ([value if tag is None else SQL_DECODERS[tag](value)
+                    for value, tag in zip(row[:width], row[width:])] for row in rows)
+        for column, values in zip(columns, zip(*decoded)):
+            column[hits] = np.array(values, dtype=object)
+        return columns
+    
+    def gather(self, chunk, primary_cols, positions=None):
+        """Merge the carry-over columns into one primary chunk; returns (result_df, matched mask).
+        positions (from probe_scored, e.g. restored from a checkpoint) skip the probe."""
+        if positions is None:
+            positions, _ = self.probe_scored(chunk, primary_cols)
+        matched = positions >= 0
+        result_df = chunk.copy()
+        for col, values in zip(self.carry_cols, self.carried(positions)):
+            if col in result_df.columns:
+                merged = result_df[col].to_numpy(dtype=object, copy=True)
+                merged[matched] = values[matched]
+                values = merged
+            result_df[col] = values
+        return result_df, matched
+    
+    def close(self):
+        self.conn.close()
+        Path(self.path).unlink(missing_ok=True)
+
+# Per-process matcher for parallel probing; set once per worker by init_probe_worker
+probe_worker_state = {}
+
+def init_probe_worker(index, ref_cols, normalizers):
+    """Pool initializer: receive the reference index once per worker process, not once per task"""
+    probe_worker_state['matcher'] = HashJoinMatcher(None, ref_cols, normalizers, index=index)
+
+def probe_partition(start, key_df, primary_cols):
+    """Probe one primary-row partition inside a worker process"""
+    return start, probe_worker_state['matcher'].probe(key_df, primary_cols)
+
+# Per-process state for batch merges; set once per worker by init_batch_worker
+batch_worker_state = {}
+
+def init_batch_worker(matcher, primary_cols, carry_cols, cache=None, sheets=None, read_workers=1):
+    """Pool initializer: receive the reference matcher once per worker process"""
+    batch_worker_state.update(matcher=matcher, primary_cols=primary_cols, carry_cols=carry_cols, cache=cache,
+                              sheets=sheets or {}, read_workers=read_workers)
+
+def merge_batch_file(primary_file, output_file):
+    """Merge one primary workbook against the shared matcher; failures are reported, not raised"""
+    state = batch_worker_state
+    started = time.perf_counter()
+    result = {'file': primary_file, 'output': output_file, 'rows': 0, 'matched': 0, 'error': None}
+    try:
+        engine = MergeEngine(cache=state['cache'])
+        engine.sheets = state['sheets']
+        engine.read_workers = state['read_workers']
+        primary_df = engine.load(primary_file)
+        positions, scores = state['matcher'].probe_scored(primary_df, state['primary_cols'])
+        engine.save(state['matcher'].gather(primary_df, positions, state['carry_cols'], scores), output_file)
+        result['rows'] = len(primary_df)
+        result['matched'] = int((positions >= 0).sum())
+    except Exception as e:
+        result['error'] = str(e) or type(e).__name__
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+def list_sheets(path):
+    """Worksheet names of a workbook in workbook order. For .xlsx only the workbook part is read,
+    so listing is instant even for large files."""
+    if Path(path).suffix.lower() == ".xlsx":
+        try:
+            with zipfile.ZipFile(path) as archive:
+                root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+            return [sheet.get("name") for sheet in root.iter() if sheet.tag.rsplit("}", 1)[-1] == "sheet"]
+        except (KeyError, zipfile.BadZipFile, ElementTree.ParseError):
+            pass
+    with pd.ExcelFile(path) as book:
+        return list(book.sheet_names)
+
+def header_columns(header):
+    """Column names for a header row as pd.read_excel gives them: blank cells become 'Unnamed: i'
+    and repeated names get '.1', '.2', ... skipping names already taken (named columns first)"""
+    columns = [col if col is not None else f"Unnamed: {i}" for i, col in enumerate(header)]
+    counts = Counter()
+    order = [i for i, col in enumerate(header) if col is not None] + [i for i, col in enumerate(header) if col is None]
+    for i in order:
+        name = col = columns[i]
+        count = counts[col]
+        while count > 0:
+            counts[name] = count + 1
+            col = f"{name}.{count}"
+            count = count + 1 if col in columns else counts[col]
+        columns[i] = col
+        counts[col] = count + 1
+    return columns
+
+def sheet_sizes(path, sheets):
+    """Bytes each sheet takes in the file: its compressed part of an .xlsx, else an equal share.
+    Lets progress over several sheets be reported in bytes, like a single-sheet read."""
+    if Path(path).suffix.lower() == ".xlsx":
+        try:
+            with zipfile.ZipFile(path) as archive:
+                root = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+                rels = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+                targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+                parts = {}
+                for sheet in root.iter():
+                    if sheet.tag.rsplit("}", 1)[-1] != "sheet":
+                        continue
+                    rel_id = next(value for key, value in sheet.attrib.items() if key.rsplit("}", 1)[-1] == "id")
+                    target = targets[rel_id]
+                    part = target.lstrip("/") if target.startswith("/") else f"xl/{target}"
+                    parts[sheet.get("name")] = archive.getinfo(part).compress_size
+            return [parts[sheet] for sheet in sheets]
+        except (KeyError, StopIteration, zipfile.BadZipFile, ElementTree.ParseError):
+            pass
+    return [os.path.getsize(path) // len(sheets)] * len(sheets)
+
+def read_sheet(path, sheet, columns=None):
+    """Parse one sheet (in a worker process); columns absent from this sheet are skipped"""
+    usecols = None if columns is None else set(columns).__contains__
+    return pd.read_excel(path, sheet_name=sheet, usecols=usecols)
+
+def resolve_batch_inputs(pattern, exclude=()):
+    """Excel files in a directory, or matching a glob pattern, minus excluded paths and lock files"""
+    if Path(pattern).is_dir():
+        candidates = [str(path) for path in Path(pattern).iterdir()]
+    else:
+        candidates = glob.glob(pattern, recursive=True)
+    excluded = {Path(path).resolve() for path in exclude if path}
+    return sorted(path for path in candidates
+                  if Path(path).suffix.lower() in (".xlsx", ".xls") and not Path(path).name.startswith("~$")
+                  and Path(path).is_file() and Path(path).resolve() not in excluded)
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None where it can't be read"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1048576 if sys.platform == "darwin" else peak / 1024
 
-class ModernButton(tk.Canvas):
-    """Custom gradient button with rounded corners"""
-    def __init__(self, parent, text, command, width=200, height=45, 
-                 gradient_colors=None, text_color="black", **kwargs):
-        super().__init__(parent, width=width, height=height, 
-                        highlightthickness=0, **kwargs)
-        
-        self.command = command
-        self.text = text
-        self.width = width
-        self.height = height
-        self.gradient_colors = gradient_colors or ["#60a5fa", "#3b82f6"]
-        self.text_color = text_color
-        
-        self.draw_button()
-        self.bind("<Button-1>", lambda e: self.on_click())
-        self.bind("<Enter>", lambda e: self.on_hover())
-        self.bind("<Leave>", lambda e: self.on_leave())
-        
-    def draw_button(self, hover=False):
-        self.delete("all")
-        
-        # Draw gradient background
-        colors = self.gradient_colors if not hover else [self.lighten_color(c) for c in self.gradient_colors]
-        steps = 20
-        for i in range(steps):
-            y1 = i * (self.height / steps)
-            y2 = (i + 1) * (self.height / steps)
-            color = self.interpolate_color(colors[0], colors[1], i / steps)
-            self.create_rectangle(0, y1, self.width, y2, fill=color, outline="")
-        
-        # Draw rounded rectangle overlay for rounded effect
-        self.create_oval(0, 0, 20, 20, fill=colors[0], outline="")
-        self.create_oval(self.width-20, 0, self.width, 20, fill=colors[0], outline="")
-        self.create_oval(0, self.height-20, 20, self.height, fill=colors[1], outline="")
-        self.create_oval(self.width-20, self.height-20, self.width, self.height, fill=colors[1], outline="")
-        
-        # Draw text
-        self.create_text(self.width/2, self.height/2, text=self.text, 
-                        font=("Segoe UI", 11, "bold"), fill=self.text_color)
-    
-    def lighten_color(self, color):
-        """Lighten a hex color"""
-        color = color.lstrip('#')
-        r, g, b = int(color[0:2], 16), int(color[2:4], 16), int(color[4:6], 16)
-        r = min(255, r + 20)
-        g = min(255, g + 20)
-        b = min(255, b + 20)
-        return f'#{r:02x}{g:02x}{b:02x}'
-    
-    def interpolate_color(self, color1, color2, ratio):
-        """Interpolate between two colors"""
-        c1 = color1.lstrip('#')
-        c2 = color2.lstrip('#')
-        r1, g1, b1 = int(c1[0:2], 16), int(c1[2:4], 16), int(c1[4:6], 16)
-        r2, g2, b2 = int(c2[0:2], 16), int(c2[2:4], 16), int(c2[4:6], 16)
-        
-        r = int(r1 + (r2 - r1) * ratio)
-        g = int(g1 + (g2 - g1) * ratio)
-        b = int(b1 + (b2 - b1) * ratio)
-        return f'#{r:02x}{g:02x}{b:02x}'
-    
-    def on_hover(self):
-        self.draw_button(hover=True)
-        self.config(cursor="hand2")
-    
-    def on_leave(self):
-        self.draw_button(hover=False)
-        self.config(cursor="")
-    
-    def on_click(self):
-        if self.command:
-            self.command()
+def reset_peak_rss():
+    """Restart peak-RSS tracking (Linux only); elsewhere peaks are process-lifetime maxima"""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+def format_phase(record):
+    """One-line summary of a phase record for the log"""
+    text = f"{record['phase']}: {record['wall_s']:.2f}s wall, {record['cpu_s']:.2f}s CPU"
+    if record.get('rows_per_s'):
+        text += f", {record['rows']:,} rows ({record['rows_per_s']:,.0f}/s)"
+    if record.get('peak_rss_mb') is not None:
+        text += f", peak {record['peak_rss_mb']:.0f} MB"
+    return text
+
+def wilson_interval(successes, trials, population=None, z=1.96):
+    """95% Wilson score interval for a proportion estimated from a sample of trials.
+    With the population size, the finite population correction narrows it (to a point
+    when the sample is the whole population)."""
+    if not trials:
+        return 0.0, 1.0
+    rate = successes / trials
+    if population and population > 1:
+        z *= (max(population - trials, 0) / (population - 1)) ** 0.5
+    z2 = z * z
+    center = (rate + z2 / (2 * trials)) / (1 + z2 / trials)
+    half = z * (rate * (1 - rate) / trials + z2 / (4 * trials * trials)) ** 0.5 / (1 + z2 / trials)
+    return max(0.0, center - half), min(1.0, center + half)
+
+def format_preview(estimate):
+    """Human-readable lines for one source's preview estimate"""
+    lines = [f"{estimate['source']}: {estimate['sample_rows']:,} of {estimate['primary_rows']:,} primary rows sampled",
+             f"  Estimated match rate: {estimate['match_rate']:.1f}% (95% CI {estimate['match_rate_low']:.1f}%"
+             f"-{estimate['match_rate_high']:.1f}%), about {estimate['estimated_matches']:,} rows"]
+    for mapping in estimate['mappings']:
+        mode = " (fuzzy)" if mapping['fuzzy'] else ""
+        lines.append(f"  '{mapping['primary_column']}' ⟷ '{mapping['reference_column']}'{mode}: "
+                     f"{mapping['primary_distinct']:,} distinct in sample / {mapping['reference_distinct']:,} "
+                     f"in reference, blank {mapping['primary_null_rate']:.1f}% / {mapping['reference_null_rate']:.1f}%, "
+                     f"values found {mapping['value_match_rate']:.1f}%")
+    if estimate['unmatched_keys']:
+        lines.append("  Most common unmatched keys: " + ", ".join(
+            f"'{entry['key']}' ({entry['rows']})" for entry in estimate['unmatched_keys']))
+    return lines
+
+class ActivityLog:
+    """Thread-safe log sink shared by the GUI and the CLI. The most recent `capacity` entries
+    are kept in a ring buffer; a view takes the entries added since its last call with drain(),
+    so the widget is updated in batches. With log_file, every entry (including "debug"
+    diagnostics) is also appended to a size-rotated file."""
+    
+    def __init__(self, capacity=2000, log_file=None, max_bytes=5 * 1024 ** 2, backups=3, verbose=False):
+        self.entries = deque(maxlen=capacity)
+        self.pending = deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        # "debug" entries reach the buffer (and so the widget) only when verbose
+        self.verbose = verbose
+        self.handler = None
+        if log_file:
+            Path(log_file).parent.mkdir(parents=True, exist_ok=True)
+            self.handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups,
+                                               encoding="utf-8", delay=True)
+            self.handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s %(message)s"))
+    
+    def write(self, message, level="info"):
+        if self.handler is not None:
+            self.handler.handle(logging.makeLogRecord({'msg': message, 'levelname': level.upper()}))
+        if level == "debug" and not self.verbose:
+            return
+        entry = (datetime.now(), level, message)
+        with self.lock:
+            self.entries.append(entry)
+            self.pending.append(entry)
+    
+    def drain(self):
+        """Entries written since the last drain, oldest first (at most capacity of them)"""
+        if not self.pending:
+            return []
+        with self.lock:
+            entries = list(self.pending)
+            self.pending.clear()
+        return entries
+    
+    def close(self):
+        if self.handler is not None:
+            self.handler.close()
+
+class ReferenceSource:
+    """One reference workbook and its own column mappings; several sources are merged in one pass.
+    prefix is prepended to carried columns whose names collide with the primary file or another source."""
+    
+    def __init__(self, ref_file, match_pairs, normalizers=None, fuzzy=None, carry_cols=None, prefix=None,
+                 ref_df=None):
+        self.ref_file = ref_file
+        self.match_pairs = list(match_pairs)
+        self.normalizers = normalizers or [KeyNormalizer() for _ in self.match_pairs]
+        self.fuzzy = fuzzy
+        self.carry_cols = carry_cols
+        self.prefix = prefix if prefix is not None else (f"{Path(ref_file).stem}." if ref_file else "")
+        self.ref_df = ref_df
+    
+    @property
+    def primary_cols(self):
+        return [pair[0] for pair in self.match_pairs]
+    
+    @property
+    def name(self):
+        return Path(self.ref_file).name if self.ref_file else "reference"
+
+class MergeCancelled(Exception):
+    """Raised inside the engine when a running merge is cancelled"""
+
+class ProgressFile(io.FileIO):
+    """Read-only binary file that reports the bytes consumed so far to on_read(done, total)"""
+    
+    def __init__(self, path, on_read):
+        super().__init__(path, "rb")
+        self.on_read = on_read
+        self.size = os.fstat(self.fileno()).st_size
+        self.consumed = 0
+    
+    def consume(self, count):
+        self.consumed += count or 0
+        self.on_read(min(self.consumed, self.size), self.size)
+    
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consume(len(data))
+        return data
+    
+    def readinto(self, buffer):
+        count = super().readinto(buffer)
+        self.consume(count)
+        return count
+
+class MergeEngine:
+    """GUI-free load -> normalize -> match -> write pipeline"""
+    chunk_size = 5000
+    profile_match = False
+    run_report = True
+    backend = "auto"
+    sqlite_threshold_mb = 200
+    workers = 1
+    fingerprints = None  # a FingerprintStore turns in-memory merges into incremental re-merges
+    match_policy = "first"  # one of MATCH_POLICIES
+    preview_rows = 2000  # primary rows sampled by preview()
+    read_workers = 0  # processes parsing the sheets of a multi-sheet workbook; 0 = one per core
+    hot_indexes = None  # a HotIndexCache keeps parsed references and their indexes across runs
+    checkpoints = None  # a CheckpointStore lets a rerun of an interrupted merge skip rows already probed
+    max_candidates = FuzzyMatcher.max_candidates  # fuzzy candidates rescored per key; 0 = all
+    
+    def __init__(self, log=None, progress=None, write_progress=None, cancel_event=None,
+                 progress_interval=0.05, cache=None, read_progress=None):
+        self.log = log or (lambda message, level="info": None)
+        self.cache = cache
+        self.on_progress = progress or (lambda done, total, matched: None)
+        self.on_write_progress = write_progress or (lambda written, total: None)
+        self.on_read_progress = read_progress
+        self.cancel_event = cancel_event
+        self.progress_interval = progress_interval
+        self.last_emitted = {}
+        self.phases = []
+        self.duplicate_keys = []
+        self.probe_checkpoints = []  # discarded once the merged output is written
+        # Workbook path -> sheet names read (and stacked) as one table, or "all"; unlisted
+        # workbooks are read from their first sheet
+        self.sheets = {}
+    
+    def throttled(self, callback, done, total, *extra):
+        """Forward progress at most once per progress_interval (always on completion)"""
+        now = time.monotonic()
+        if done >= total or now - self.last_emitted.get(callback, 0.0) >= self.progress_interval:
+            self.last_emitted[callback] = now
+            callback(done, total, *extra)
+    
+    def progress(self, done, total, matched):
+        self.throttled(self.on_progress, done, total, matched)
+    
+    def write_progress(self, written, total):
+        self.throttled(self.on_write_progress, written, total)
+    
+    def read_progress(self, done, total):
+        self.check_cancelled()
+        if self.on_read_progress is not None:
+            self.throttled(self.on_read_progress, done, total)
+    
+    def check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise MergeCancelled()
+    
+    @contextmanager
+    def phase(self, name, rows=None, profile=False):
+        """Record wall time, CPU time, throughput and peak memory of the enclosed block.
+        CPU time and memory are process-wide. The block may set record['rows'] itself."""
+        record = {'phase': name, 'rows': rows}
+        profiler = cProfile.Profile() if profile else None
+        reset_peak_rss()
+        wall, cpu = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        record['wall_s'] = time.perf_counter() - wall
+        record['cpu_s'] = time.process_time() - cpu
+        record['rows_per_s'] = record['rows'] / record['wall_s'] if record['rows'] and record['wall_s'] > 0 else None
+        record['peak_rss_mb'] = peak_rss_mb()
+        if profiler is not None:
+            record['profile'] = profiler
+        self.phases.append(record)
+        self.log(f"⏱ {format_phase(record)}", "info")
+    
+    def select_sheets(self, path, sheets):
+        """Read path as the given sheet names stacked into one table ("all" for every sheet);
+        None restores the default (first sheet only)"""
+        key = os.path.abspath(path)
+        if sheets is None:
+            self.sheets.pop(key, None)
+        else:
+            self.sheets[key] = sheets if sheets == "all" else list(sheets)
+    
+    def selected_sheets(self, path):
+        """Sheet names to read from path, or None to read only its first sheet"""
+        sheets = self.sheets.get(os.path.abspath(path))
+        return list_sheets(path) if sheets == "all" else sheets
+    
+    def content_key(self, path):
+        """Content hash of a workbook, qualified by its sheet selection"""
+        return WorkbookCache.qualify(WorkbookCache.file_digest(path), self.selected_sheets(path))
+    
+    def read_columns(self, path):
+        """Read only the header row of a workbook (the union of the selected sheets' headers,
+        plus SOURCE_SHEET_COLUMN when several sheets are stacked)"""
+        sheets = self.selected_sheets(path)
+        if sheets is None:
+            return list(pd.read_excel(path, nrows=0).columns)
+        columns = {}
+        with pd.ExcelFile(path) as book:
+            for sheet in sheets:
+                columns.update(dict.fromkeys(book.parse(sheet, nrows=0).columns))
+        if len(sheets) > 1:
+            columns[SOURCE_SHEET_COLUMN] = None
+        return list(columns)
+    
+    def read_excel(self, path, **kwargs):
+        """pd.read_excel that reports bytes parsed and can be cancelled mid-read"""
+        if self.on_read_progress is None and self.cancel_event is None:
+            return pd.read_excel(path, **kwargs)
+        with ProgressFile(path, self.read_progress) as handle:
+            return pd.read_excel(handle, **kwargs)
+    
+    def read_sheets(self, path, sheets, usecols=None):
+        """Parse the given sheets concurrently in worker processes and stack them into one frame
+        with a single concat; SOURCE_SHEET_COLUMN (categorical) names each row's sheet"""
+        columns = None if usecols is None else [col for col in usecols if col != SOURCE_SHEET_COLUMN]
+        if len(sheets) == 1:
+            return self.read_excel(path, sheet_name=sheets[0],
+                                   usecols=None if columns is None else set(columns).__contains__)
+        
+        # Progress is in bytes, as for one sheet: the file size, advanced by each parsed sheet's part
+        total = os.path.getsize(path)
+        sizes = sheet_sizes(path, sheets)
+        parsed = 0
+        frames = [None] * len(sheets)
+        workers = min(len(sheets), self.read_workers or os.cpu_count() or 1)
+        if workers <= 1:
+            for i, sheet in enumerate(sheets):
+                frames[i] = read_sheet(path, sheet, columns)
+                parsed += sizes[i]
+                self.read_progress(min(parsed, total), total)
+        else:
+            self.log(f"Parsing {len(sheets)} sheets on {workers} worker processes", "info")
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(read_sheet, path, sheet, columns): i for i, sheet in enumerate(sheets)}
+                try:
+                    for future in as_completed(futures):
+                        frames[futures[future]] = future.result()
+                        parsed += sizes[futures[future]]
+                        self.read_progress(min(parsed, total), total)
+                except MergeCancelled:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+        self.read_progress(total, total)
+        
+        lengths = [len(frame) for frame in frames]
+        df = pd.concat(frames, ignore_index=True)
+        del frames
+        if usecols is None or SOURCE_SHEET_COLUMN in usecols:
+            codes = np.repeat(np.arange(len(sheets), dtype=np.int32), lengths)
+            df[SOURCE_SHEET_COLUMN] = pd.Categorical.from_codes(codes, categories=list(sheets))
+        return df
+    
+    def load(self, path, columns=None):
+        """Read an input workbook (optionally only some columns), through the workbook cache if enabled"""
+        with self.phase(f"read {Path(path).name}") as record:
+            sheets = self.selected_sheets(path)
+            reader = self.read_excel
+            if sheets is not None:
+                record['sheets'] = len(sheets)
+                
+                def reader(path, usecols=None):
+                    return self.read_sheets(path, sheets, usecols)
+            if self.cache is None:
+                df = reader(path, usecols=columns) if columns is not None else reader(path)
+            else:
+                df, hit = self.cache.load_frame(path, columns, reader=reader, sheets=sheets)
+                record['cache'] = "hit" if hit else "miss"
+                self.log(f"Cache {'hit' if hit else 'miss'}: {Path(path).name}", "info")
+            compact_frame(df)
+            record['rows'] = len(df)
+        return df
+    
+    def load_reference(self, ref_file, match_pairs, carry_cols=None, ref_columns=None, ref_df=None):
+        """Load only the reference key columns plus the carry-over columns.
+        An already loaded ref_df is pruned instead of reading the file again."""
+        if ref_df is None and self.hot_indexes is not None:
+            ref_df = self.hot_indexes.frame(self, ref_file)
+        if ref_df is not None:
+            ref_columns = list(ref_df.columns)
+        else:
+            self.log(f"Loading Reference file: {Path(ref_file).name}", "info")
+        if carry_cols is None:
+            return ref_df if ref_df is not None else self.load(ref_file)
+        
+        ref_columns = ref_columns if ref_columns is not None else self.read_columns(ref_file)
+        needed = self.select_reference_columns(ref_columns, match_pairs, carry_cols)
+        if ref_df is not None:
+            return ref_df[needed]
+        self.log(f"Reading {len(needed)} of {len(ref_columns)} reference columns", "info")
+        return self.load(ref_file, needed)
+    
+    @staticmethod
+    def select_reference_columns(ref_columns, match_pairs, carry_cols):
+        """Key plus carry-over columns in file order; raises if any of them is missing"""
+        wanted = {pair[1] for pair in match_pairs} | set(carry_cols)
+        missing = wanted.difference(ref_columns)
+        if missing:
+            raise ValueError(f"Reference file has no column(s): {', '.join(map(str, sorted(missing, key=str)))}")
+        return [col for col in ref_columns if col in wanted]
+    
+    def choose_backend(self, ref_file, primary_file=None, fuzzy=None):
+        """'sqlite' for .xlsx references of at least sqlite_threshold_mb on disk, else 'memory'.
+        An explicit backend setting other than 'auto' always wins."""
+        if self.backend != "auto":
+            return self.backend
+        if fuzzy and any(fuzzy) or self.match_policy != "first":
+            return "memory"
+        if any(Path(path).suffix.lower() != ".xlsx" for path in (ref_file, primary_file) if path is not None):
+            return "memory"
+        return "sqlite" if os.path.getsize(ref_file) >= self.sqlite_threshold_mb * 1048576 else "memory"
+    
+    def iter_chunks(self, path):
+        """Yield the first sheet (or the selected sheets, one after another) as DataFrames of
+        chunk_size rows using a read-only workbook. The first item yielded is the estimated row
+        count from the sheet dimensions. Stacked sheets share the union of their headers and
+        get SOURCE_SHEET_COLUMN."""
+        if Path(path).suffix.lower() != ".xlsx":
+            raise ValueError(f"Chunked reading requires an .xlsx file: {Path(path).name}")
+        
+        wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            sheets = self.selected_sheets(path)
+            worksheets = [wb[name] for name in sheets] if sheets is not None else wb.worksheets[:1]
+            headers = []
+            for ws in worksheets:
+                header = next(ws.iter_rows(max_row=1, values_only=True), None) or ()
+                headers.append(header_columns(header))
+            yield sum(max((ws.max_row or 1) - 1, 0) for ws in worksheets)
+            
+            stacked = len(worksheets) > 1
+            union = list(dict.fromkeys(col for columns in headers for col in columns))
+            titles = [ws.title for ws in worksheets]
+            
+            def frame(buffer, columns, sheet):
+                df = pd.DataFrame.from_records(buffer, columns=columns)
+                if stacked:
+                    df = df.reindex(columns=union)
+                    df[SOURCE_SHEET_COLUMN] = pd.Categorical.from_codes(
+                        np.full(len(df), sheet, dtype=np.int32), categories=titles)
+                return df
+            
+            for sheet, (ws, columns) in enumerate(zip(worksheets, headers)):
+                if not columns:
+                    continue
+                width = len(columns)
+                buffer = []
+                for row in ws.iter_rows(min_row=2, values_only=True):
+                    if all(value is None for value in row):
+                        continue
+                    buffer.append(row[:width] + (None,) * (width - len(row)))
+                    if len(buffer) == self.chunk_size:
+                        yield frame(buffer, columns, sheet)
+                        buffer = []
+                if buffer:
+                    yield frame(buffer, columns, sheet)
+        finally:
+            wb.close()
+    
+    def build_matcher(self, ref_df, match_pairs, normalizers=None, fuzzy=None, carry_cols=None):
+        """Index the reference frame; returns (matcher, carry-over columns).
+        carry_cols limits the merged reference columns (default: all non-key columns)."""
+        normalizers = normalizers or [KeyNormalizer() for _ in match_pairs]
+        matched_ref_cols = [pair[1] for pair in match_pairs]
+        carry_cols = ref_df.columns if carry_cols is None else carry_cols
+        ref_additional_cols = [col for col in carry_cols if col not in matched_ref_cols]
+        if SOURCE_SHEET_COLUMN in ref_additional_cols:
+            # A stacked reference's sheet names must not overwrite the primary file's own
+            ref_df = ref_df.rename(columns={SOURCE_SHEET_COLUMN: REFERENCE_SHEET_COLUMN})
+            ref_additional_cols = [REFERENCE_SHEET_COLUMN if col == SOURCE_SHEET_COLUMN else col
+                                   for col in ref_additional_cols]
+        
+        self.log(f"Additional columns to merge: {len(ref_additional_cols)}", "info")
+        
+        matcher = self.index_reference(ref_df, matched_ref_cols, normalizers, fuzzy)
+        if matcher.has_duplicates:
+            self.log(f"⚠ {len(ref_df) - len(matcher.index)} reference rows repeat an earlier key; "
+                     f"duplicate-key policy: {self.match_policy}", "warning")
+        return matcher, ref_additional_cols
+    
+    def index_reference(self, ref_df, ref_cols, normalizers, fuzzy=None):
+        """Matcher over the reference key columns, reusing a cached key index when there is one"""
+        hot_key = ref_df.attrs.get('cache_key') if self.hot_indexes is not None else None
+        if hot_key is not None:
+            mapping = (tuple(ref_cols), tuple(normalizer.rules() for normalizer in normalizers), repr(fuzzy))
+            matcher = self.hot_indexes.matcher(hot_key, mapping)
+            if matcher is not None:
+                matcher = matcher.fork(ref_df)
+                matcher.policy = self.match_policy
+                if isinstance(matcher, FuzzyMatcher):
+                    matcher.max_candidates = self.max_candidates
+                self.log(f"Hot index: reusing the in-memory index ({len(matcher.index)} unique keys)", "info")
+                return matcher
+        if fuzzy and any(fuzzy):
+            matcher = FuzzyMatcher(ref_df, ref_cols, normalizers, fuzzy)
+            self.log(f"Fuzzy index built: {len(matcher.keys)} unique keys, "
+                     f"{len(matcher.postings)} n-grams", "info")
+        else:
+            index = self.cache.load_index(ref_df, ref_cols, normalizers) if self.cache else None
+            matcher = HashJoinMatcher(ref_df, ref_cols, normalizers, index=index)
+            if index is not None:
+                self.log(f"Cache hit: reference index ({len(index)} unique keys)", "info")
+            else:
+                if self.cache is not None:
+                    self.cache.store_index(ref_df, ref_cols, normalizers, matcher.index)
+                self.log(f"Reference index built: {len(matcher.index)} unique keys", "info")
+        if hot_key is not None:
+            self.hot_indexes.store(hot_key, mapping, matcher.fork())
+        matcher.policy = self.match_policy
+        if isinstance(matcher, FuzzyMatcher):
+            matcher.max_candidates = self.max_candidates
+        return matcher
+    
+    def preview(self, primary_df, sources, sample_size=None, top=10, seed=0):
+        """Dry run: estimate each source's match rate from a random sample of primary rows,
+        without gathering or writing anything. Only the reference key columns are read.
+        Returns one estimate per source (rates in percent, see estimate_matches)."""
+        sample_size = sample_size or self.preview_rows
+        if len(primary_df) > sample_size:
+            sample = primary_df.sample(n=sample_size, random_state=seed)
+        else:
+            sample = primary_df
+        self.log(f"Preview: sampling {len(sample):,} of {len(primary_df):,} primary rows", "info")
+        
+        estimates = []
+        for source in sources:
+            self.check_cancelled()
+            ref_df = source.ref_df
+            if ref_df is None:
+                ref_df = self.load_reference(source.ref_file, source.match_pairs, carry_cols=[])
+            name = "preview" if len(sources) == 1 else f"preview {source.name}"
+            with self.phase(name, rows=len(sample)):
+                matcher = self.index_reference(ref_df, [pair[1] for pair in source.match_pairs],
+                                               source.normalizers, source.fuzzy)
+                estimates.append(self.estimate_matches(sample, len(primary_df), matcher, source, top, seed))
+        return estimates
+    
+    @staticmethod
+    def estimate_matches(sample, population, matcher, source, top=10, seed=0):
+        """Probe a sample of primary rows against an indexed source. Per mapping: distinct
+        normalized values (sample vs. whole reference), blank rates (the reference's from a
+        sample of its rows) and the share of sample values found in the reference column."""
+        primary_cols = source.primary_cols
+        positions, _ = matcher.probe_scored(sample, primary_cols)
+        matched = positions >= 0
+        trials = len(sample)
+        hits = int(matched.sum())
+        low, high = wilson_interval(hits, trials, population)
+        rate = hits / trials if trials else 0.0
+        
+        columns = matcher.normalize_columns(sample, primary_cols)
+        ref_index = matcher.key_index()
+        ref_df = matcher.ref_df
+        ref_sample = ref_df.sample(n=trials, random_state=seed) if len(ref_df) > trials > 0 else ref_df
+        ref_columns = matcher.normalize_columns(ref_sample, matcher.ref_cols)
+        
+        def percent(mask):
+            return float(mask.mean()) * 100 if len(mask) else 0.0
+        
+        mappings = []
+        for i, (values, ref_values) in enumerate(zip(columns, ref_columns)):
+            primary_col, ref_col = source.match_pairs[i]
+            vocabulary = ref_index.vocabularies[i]
+            mappings.append({
+                'primary_column': primary_col,
+                'reference_column': ref_col,
+                'fuzzy': bool(source.fuzzy and source.fuzzy[i]),
+                'primary_distinct': len(pd.unique(values)),
+                'reference_distinct': len(vocabulary),
+                'primary_null_rate': percent(values == ""),
+                'reference_null_rate': percent(ref_values == ""),
+                'value_match_rate': percent(vocabulary.get_indexer(values) >= 0),
+            })
+        
+        unmatched = Counter(" | ".join(key) if any(key) else "(blank)"
+                            for key in zip(*(values[~matched].tolist() for values in columns)))
+        return {
+            'source': source.name,
+            'primary_rows': population,
+            'sample_rows': trials,
+            'matched': hits,
+            'match_rate': rate * 100,
+            'match_rate_low': low * 100,
+            'match_rate_high': high * 100,
+            'estimated_matches': round(rate * population),
+            'reference_rows': len(ref_df),
+            'reference_keys': len(ref_index),
+            'mappings': mappings,
+            'unmatched_keys': [{'key': key, 'rows': count} for key, count in unmatched.most_common(top)],
+        }
+    
+    def match(self, primary_df, ref_df, match_pairs, normalizers=None, fuzzy=None, carry_cols=None):
+        """Merge reference columns into the primary frame; returns (result_df, matched_count)"""
+        source = ReferenceSource(None, match_pairs, normalizers, fuzzy, carry_cols, ref_df=ref_df)
+        return self.match_sources(primary_df, self.index_sources([source]))
+    
+    def match_incremental(self, primary_file, primary_df, ref_file, ref_df, match_pairs, normalizers=None,
+                          fuzzy=None, carry_cols=None):
+        """Like match(), but primary rows whose key values are unchanged since the last run of this
+        file pair reuse that run's reference positions; only new or changed rows are probed. Falls back
+        to a full match when there is no previous run or the reference content or mapping changed."""
+        normalizers = normalizers or [KeyNormalizer() for _ in match_pairs]
+        primary_cols = [pair[0] for pair in match_pairs]
+        total_rows = len(primary_df)
+        with self.phase("index", rows=len(ref_df)):
+            matcher, ref_additional_cols = self.build_matcher(ref_df, match_pairs, normalizers, fuzzy, carry_cols)
+        
+        with self.phase("fingerprint", rows=total_rows):
+            ref_digest = ref_df.attrs.get('cache_key') or self.content_key(ref_file)
+            signature = self.fingerprints.signature(ref_digest, match_pairs, normalizers, fuzzy,
+                                                    getattr(matcher, 'max_candidates', None))
+            hashes = self.fingerprints.row_hashes(primary_df, primary_cols)
+            previous = self.fingerprints.load(primary_file, ref_file, signature)
+        if previous is None:
+            self.log("No fingerprints for this reference and mapping (first run, or the reference "
+                     "changed): full re-merge", "info")
+        
+        with self.phase("match", rows=total_rows, profile=self.profile_match) as record:
+            positions = np.full(total_rows, -1, dtype=np.int64)
+            scores = np.full(total_rows, np.nan) if isinstance(matcher, FuzzyMatcher) else None
+            reused = np.zeros(total_rows, dtype=bool)
+            if previous is not None:
+                previous_hashes, previous_positions, previous_scores = previous
+                found = pd.Index(previous_hashes).get_indexer(hashes)
+                reused = found >= 0
+                positions[reused] = previous_positions[found[reused]]
+                if scores is not None:
+                    scores[reused] = previous_scores[found[reused]]
+            
+            changed = np.flatnonzero(~reused)
+            if len(changed):
+                subset = primary_df if len(changed) == total_rows else primary_df.iloc[changed]
+                changed_positions, changed_scores = self.probe_all(matcher, subset, primary_cols)
+                positions[changed] = changed_positions
+                if scores is not None and changed_scores is not None:
+                    scores[changed] = changed_scores
+            
+            record['reused_rows'] = total_rows - len(changed)
+            record['recomputed_rows'] = len(changed)
+            matched_count = int((positions >= 0).sum())
+            self.log(f"♻ Reused {record['reused_rows']} rows from the previous run, "
+                     f"recomputed {record['recomputed_rows']}", "info")
+            self.log(f"✓ Matching complete: {matched_count}/{total_rows} rows matched", "success")
+            result_df = matcher.gather(primary_df, positions, ref_additional_cols, scores)
+        
+        self.report_duplicates([(ReferenceSource(ref_file, match_pairs), matcher, ref_additional_cols)])
+        result_df.attrs['primary_rows'] = total_rows
+        result_df.attrs['checkpoints'] = [str(checkpoint.path) for checkpoint in self.probe_checkpoints]
+        self.fingerprints.save(primary_file, ref_file, signature, hashes, positions, scores)
+        return result_df, matched_count
+    
+    def index_sources(self, sources):
+        """Load and index every reference up front; returns [(source, matcher, carry-over columns)]"""
+        indexed = []
+        for source in sources:
+            ref_df = source.ref_df
+            if ref_df is None:
+                ref_df = self.load_reference(source.ref_file, source.match_pairs, source.carry_cols)
+            name = "index" if len(sources) == 1 else f"index {source.name}"
+            with self.phase(name, rows=len(ref_df)):
+                matcher, carry_cols = self.build_matcher(ref_df, source.match_pairs, source.normalizers,
+                                                         source.fuzzy, source.carry_cols)
+            indexed.append((source, matcher, carry_cols))
+        return indexed
+    
+    def prefix_collisions(self, indexed, primary_columns):
+        """With several sources, prefix carried columns (and score columns) whose names collide
+        with a primary column or with a column carried by another source"""
+        if len(indexed) < 2:
+            return
+        outputs = [list(carry_cols) + ([matcher.score_column] if isinstance(matcher, FuzzyMatcher) else [])
+                   + ([matcher.count_column] if matcher.policy == "aggregate" else [])
+                   for _, matcher, carry_cols in indexed]
+        counts = Counter(col for cols in outputs for col in cols)
+        primary_columns = set(primary_columns)
+        prefixes = []
+        for i, (source, _, _) in enumerate(indexed):
+            # The same file joined twice still needs distinct prefixes
+            prefixes.append(source.prefix if source.prefix not in prefixes else f"{source.prefix.rstrip('.')}#{i + 1}.")
+        for (source, matcher, carry_cols), cols, prefix in zip(indexed, outputs, prefixes):
+            renames = {col: f"{prefix}{col}" for col in cols if counts[col] > 1 or col in primary_columns}
+            if not renames:
+                continue
+            if matcher.score_column in renames:
+                matcher.score_column = renames.pop(matcher.score_column)
+            if matcher.count_column in renames:
+                matcher.count_column = renames.pop(matcher.count_column)
+            matcher.ref_df = matcher.ref_df.rename(columns=renames)
+            carry_cols[:] = [renames.get(col, col) for col in carry_cols]
+            self.log(f"{source.name}: prefixed {len(renames)} colliding column(s) with '{prefix}'", "info")
+    
+    def gather_sources(self, primary_df, indexed, probe):
+        """Probe every source with probe(matcher, df, cols) and gather them into one copy of primary_df.
+        Returns (result_df, primary rows matched by any source, matched primary rows per source).
+        The 'all' policy repeats rows, so later sources probe the expanded frame."""
+        result_df = primary_df.copy()
+        origin = np.arange(len(primary_df))
+        matched = np.zeros(len(primary_df), dtype=bool)
+        source_counts = []
+        for source, matcher, carry_cols in indexed:
+            positions, scores = probe(matcher, result_df, source.primary_cols)
+            source_matched = np.zeros(len(primary_df), dtype=bool)
+            source_matched[origin[positions >= 0]] = True
+            rows, positions, scores = matcher.resolve(positions, scores)
+            if rows is not None:
+                result_df, origin = result_df.iloc[rows], origin[rows]
+            matcher.gather_into(result_df, positions, carry_cols, scores)
+            matched |= source_matched
+            source_counts.append(int(source_matched.sum()))
+        return result_df, matched, source_counts
+    
+    def match_sources(self, primary_df, indexed):
+        """Merge every indexed reference into the primary frame; returns (result_df, matched_count).
+        A row counts as matched when at least one source matched it."""
+        total_rows = len(primary_df)
+        self.prefix_collisions(indexed, primary_df.columns)
+        with self.phase("match", rows=total_rows, profile=self.profile_match):
+            result_df, matched, source_counts = self.gather_sources(primary_df, indexed, self.probe_all)
+            matched_count = int(matched.sum())
+            if len(indexed) > 1:
+                for (source, _, _), count in zip(indexed, source_counts):
+                    self.log(f"  {source.name}: {count}/{total_rows} rows matched", "info")
+            self.log(f"✓ Matching complete: {matched_count}/{total_rows} rows matched", "success")
+        self.report_duplicates(indexed)
+        if len(result_df) != total_rows:
+            self.log(f"One row per duplicate match: {len(result_df)} output rows", "info")
+        result_df.attrs['primary_rows'] = total_rows
+        result_df.attrs['checkpoints'] = [str(checkpoint.path) for checkpoint in self.probe_checkpoints]
+        return result_df, matched_count
+    
+    def report_duplicates(self, indexed, top=10):
+        """Log the most ambiguous reference keys of each source and keep them for the run report"""
+        for source, matcher, _ in indexed:
+            entries = matcher.duplicate_report(top)
+            if not entries:
+                continue
+            self.log(f"Most ambiguous keys in {source.name} (policy: {matcher.policy}):", "warning")
+            for entry in entries:
+                self.log(f"  '{entry['key']}': {entry['reference_rows']} reference rows, "
+                         f"hit by {entry['primary_rows']} primary rows", "warning")
+                self.duplicate_keys.append({'reference': source.name, **entry})
+    
+    @staticmethod
+    def checkpoint_signature(matcher, *inputs):
+        """Checkpoint signature of probing matcher with the primary rows identified by inputs"""
+        ref_df = matcher.ref_df
+        reference = ref_df.attrs.get('cache_key') or CheckpointStore.digest(ref_df[matcher.ref_cols])
+        return CheckpointStore.signature(reference, len(ref_df), matcher.ref_cols,
+                                         [normalizer.rules() for normalizer in matcher.normalizers],
+                                         getattr(matcher, 'fuzzy', None), getattr(matcher, 'max_candidates', None),
+                                         *inputs)
+    
+    def open_checkpoint(self, matcher, *inputs):
+        """ProbeCheckpoint for probing matcher with the primary rows identified by inputs,
+        or None when checkpoints are off"""
+        if self.checkpoints is None:
+            return None
+        checkpoint = self.checkpoints.open(self.checkpoint_signature(matcher, *inputs))
+        self.probe_checkpoints.append(checkpoint)
+        if checkpoint.resumed:
+            self.log(f"Resuming from checkpoint: {checkpoint.resumed} rows already matched", "info")
+        return checkpoint
+    
+    def probe_all(self, matcher, primary_df, primary_cols):
+        """Probe every primary row, on a process pool when workers allow; returns (positions, scores).
+        Both paths share one checkpoint, so a rerun may resume with a different worker count."""
+        checkpoint = None
+        if self.checkpoints is not None:
+            checkpoint = self.open_checkpoint(matcher, "memory", CheckpointStore.digest(primary_df[primary_cols]))
+        workers = self.workers if self.workers > 0 else (os.cpu_count() or 1)
+        if workers > 1 and len(primary_df) > 2 * self.chunk_size and not isinstance(matcher, FuzzyMatcher):
+            return self.probe_parallel(matcher, primary_df, primary_cols, workers, checkpoint), None
+        return self.probe_serial(matcher, primary_df, primary_cols, checkpoint)
+    
+    def probe_serial(self, matcher, primary_df, primary_cols, checkpoint=None):
+        """Probe in chunks on this thread; returns (positions, scores)"""
+        total_rows = len(primary_df)
+        positions = np.empty(total_rows, dtype=np.int64)
+        scores = np.empty(total_rows, dtype=float)
+        scored = False
+        probe = checkpoint.probe if checkpoint is not None else type(matcher).probe_scored
+        
+        try:
+            for start in range(0, total_rows, self.chunk_size):
+                self.check_cancelled()
+                stop = min(start + self.chunk_size, total_rows)
+                positions[start:stop], chunk_scores = probe(matcher, primary_df.iloc[start:stop], primary_cols)
+                if chunk_scores is not None:
+                    scores[start:stop] = chunk_scores
+                    scored = True
+                self.progress(stop, total_rows, int((positions[:stop] >= 0).sum()))
+        finally:
+            # Completed or not (errors, cancel, Ctrl+C), keep what was probed until the output is written
+            if checkpoint is not None:
+                checkpoint.save()
+        
+        return positions, scores if scored else None
+    
+    def probe_parallel(self, matcher, primary_df, primary_cols, workers, checkpoint=None):
+        """Probe primary-row partitions on a process pool and reassemble them in row order.
+        Rows restored from checkpoint are not probed again; partitions that finish are recorded
+        in it once every partition before them has finished too."""
+        total_rows = len(primary_df)
+        positions = np.empty(total_rows, dtype=np.int64)
+        key_df = primary_df[primary_cols]
+        partition_size = max(self.chunk_size, -(-total_rows // (workers * 4)))
+        self.log(f"Matching in parallel: {workers} workers, {partition_size} rows per partition", "info")
+        
+        done = min(checkpoint.resumed, total_rows) if checkpoint is not None else 0
+        if done:
+            positions[:done] = checkpoint.positions[0][:done]
+        matched = int((positions[:done] >= 0).sum())
+        if done:
+            self.progress(done, total_rows, matched)
+        finished = {}  # partitions done out of order, by start row
+        recorded = done
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_probe_worker,
+                                 initargs=(matcher.index, matcher.ref_cols, matcher.normalizers)) as pool:
+            futures = [pool.submit(probe_partition, start, key_df.iloc[start:start + partition_size], primary_cols)
+                       for start in range(done, total_rows, partition_size)]
+            try:
+                for future in as_completed(futures):
+                    self.check_cancelled()
+                    start, partition_positions = future.result()
+                    positions[start:start + len(partition_positions)] = partition_positions
+                    done += len(partition_positions)
+                    matched += int((partition_positions >= 0).sum())
+                    self.progress(done, total_rows, matched)
+                    if checkpoint is not None:
+                        finished[start] = partition_positions
+                        while recorded in finished:
+                            partition_positions = finished.pop(recorded)
+                            checkpoint.record(partition_positions)
+                            recorded += len(partition_positions)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            finally:
+                # Completed or not (errors, cancel, Ctrl+C), keep what was probed until the output is written
+                if checkpoint is not None:
+                    checkpoint.save()
+        
+        return positions
+    
+    def save(self, result_df, output_file):
+        """Write the merged frame to disk in chunks, reporting row-level progress"""
+        total_rows = len(result_df)
+        with self.phase("write", rows=total_rows), open_output_writer(output_file) as writer:
+            for start in range(0, total_rows, self.chunk_size) if total_rows else [0]:
+                self.check_cancelled()
+                writer.write(result_df.iloc[start:start + self.chunk_size])
+                self.write_progress(min(start + self.chunk_size, total_rows), total_rows)
+        for path in result_df.attrs.get('checkpoints', ()):
+            Path(path).unlink(missing_ok=True)
+        self.log(f"✓ File saved: {Path(output_file).name}", "success")
+    
+    def stream_merge(self, primary_file, ref_df, match_pairs, output_file, normalizers=None, fuzzy=None,
+                     carry_cols=None):
+        """Merge chunk by chunk, writing rows straight to output_file; returns (total_rows, matched_count).
+        Peak memory depends on the reference frame and chunk_size, not on the primary file."""
+        source = ReferenceSource(None, match_pairs, normalizers, fuzzy, carry_cols, ref_df=ref_df)
+        return self.stream_sources(primary_file, self.index_sources([source]), output_file)
+    
+    def stream_sources(self, primary_file, indexed, output_file):
+        """Stream the primary file once through every indexed reference; returns (total_rows, matched_count)"""
+        chunks = self.iter_chunks(primary_file)
+        estimated_rows = next(chunks)
+        total_rows = 0
+        matched_count = 0
+        source_totals = [0] * len(indexed)
+        
+        # One checkpoint per source; with the 'all' policy a source probes the rows expanded by
+        # the sources before it, so each signature includes the previous one
+        checkpoints = {}
+        if self.checkpoints is not None:
+            previous = (self.content_key(primary_file), self.match_policy)
+            for source, matcher, _ in indexed:
+                checkpoint = self.open_checkpoint(matcher, "stream", previous, source.primary_cols)
+                checkpoints[matcher] = checkpoint
+                previous = checkpoint.path.stem
+        
+        def probe(matcher, chunk, primary_cols):
+            if matcher in checkpoints:
+                return checkpoints[matcher].probe(matcher, chunk, primary_cols)
+            return matcher.probe_scored(chunk, primary_cols)
+        
+        # Reading, matching and writing are interleaved, so they are timed as one phase
+        try:
+            with self.phase("stream", profile=self.profile_match) as record, \
+                    open_output_writer(output_file) as writer:
+                chunk_start = time.perf_counter()
+                for number, chunk in enumerate(chunks, 1):
+                    self.check_cancelled()
+                    if not total_rows:
+                        self.prefix_collisions(indexed, chunk.columns)
+                    result_df, matched, source_counts = self.gather_sources(chunk, indexed, probe)
+                    writer.write(result_df)
+                    
+                    total_rows += len(chunk)
+                    matched_count += int(matched.sum())
+                    now = time.perf_counter()
+                    self.log(f"Chunk {number}: {len(chunk)} rows, {int(matched.sum())} matched, "
+                             f"{len(result_df)} written in {now - chunk_start:.3f}s", "debug")
+                    chunk_start = now
+                    source_totals = [total + count for total, count in zip(source_totals, source_counts)]
+                    self.progress(total_rows, max(estimated_rows, total_rows), matched_count)
+                    self.write_progress(total_rows, max(estimated_rows, total_rows))
+                
+                self.progress(total_rows, total_rows, matched_count)
+                self.write_progress(total_rows, total_rows)
+                if len(indexed) > 1:
+                    for (source, _, _), count in zip(indexed, source_totals):
+                        self.log(f"  {source.name}: {count}/{total_rows} rows matched", "info")
+                self.log(f"✓ Matching complete: {matched_count}/{total_rows} rows matched", "success")
+                record['rows'] = total_rows
+        except BaseException:
+            # Errors (in writing the output too), cancel and Ctrl+C alike: a rerun resumes
+            # after the rows probed so far
+            for checkpoint in checkpoints.values():
+                checkpoint.save()
+            raise
+        for checkpoint in checkpoints.values():
+            checkpoint.discard()
+        self.report_duplicates(indexed)
+        self.log(f"✓ File saved: {Path(output_file).name}", "success")
+        return total_rows, matched_count
+    
+    def sqlite_merge(self, primary_file, ref_file, match_pairs, output_file, normalizers=None,
+                     carry_cols=None, fuzzy=None):
+        """Out-of-core merge: bulk-load the reference into a temporary SQLite store, then stream
+        primary chunks through it; returns (total_rows, matched_count). Memory stays flat."""
+        if fuzzy and any(fuzzy):
+            raise ValueError("Fuzzy matching is not available with the SQLite backend")
+        if self.match_policy != "first":
+            raise ValueError(f"The '{self.match_policy}' duplicate-key policy is not available with the SQLite backend")
+        normalizers = normalizers or [KeyNormalizer() for _ in match_pairs]
+        primary_cols = [pair[0] for pair in match_pairs]
+        ref_cols = [pair[1] for pair in match_pairs]
+        ref_columns = self.read_columns(ref_file)
+        if carry_cols is None:
+            carry_cols = ref_columns
+        else:
+            self.select_reference_columns(ref_columns, match_pairs, carry_cols)
+        carry_cols = [col for col in carry_cols if col not in ref_cols]
+        renames = {SOURCE_SHEET_COLUMN: REFERENCE_SHEET_COLUMN} if SOURCE_SHEET_COLUMN in carry_cols else {}
+        self.log(f"Additional columns to merge: {len(carry_cols)}", "info")
+        
+        with SqliteReferenceStore(ref_cols, normalizers, [renames.get(col, col) for col in carry_cols]) as store:
+            with self.phase("index") as record:
+                chunks = self.iter_chunks(ref_file)
+                next(chunks)
+                for chunk in chunks:
+                    self.check_cancelled()
+                    store.add(chunk[ref_cols + carry_cols].rename(columns=renames))
+                record['rows'] = store.rows_loaded
+            self.log(f"Reference stored on disk: {len(store)} unique keys from {store.rows_loaded} rows", "info")
+            
+            # Rowids are checkpointed like matcher positions, keyed by both files and the mapping
+            checkpoint = None
+            if self.checkpoints is not None:
+                checkpoint = self.checkpoints.open(CheckpointStore.signature(
+                    "sqlite", self.content_key(ref_file), ref_cols, [normalizer.rules() for normalizer in normalizers],
+                    self.content_key(primary_file), primary_cols))
+                if checkpoint.resumed:
+                    self.log(f"Resuming from checkpoint: {checkpoint.resumed} rows already matched", "info")
+            
+            chunks = self.iter_chunks(primary_file)
+            estimated_rows = next(chunks)
+            total_rows = 0
+            matched_count = 0
+            try:
+                with self.phase("stream", profile=self.profile_match) as record, \
+                        open_output_writer(output_file) as writer:
+                    chunk_start = time.perf_counter()
+                    for number, chunk in enumerate(chunks, 1):
+                        self.check_cancelled()
+                        positions = checkpoint.probe(store, chunk, primary_cols)[0] if checkpoint is not None else None
+                        result_df, matched = store.gather(chunk, primary_cols, positions)
+                        writer.write(result_df)
+                        
+                        total_rows += len(chunk)
+                        matched_count += int(matched.sum())
+                        now = time.perf_counter()
+                        self.log(f"Chunk {number}: {len(chunk)} rows, {int(matched.sum())} matched "
+                                 f"in {now - chunk_start:.3f}s", "debug")
+                        chunk_start = now
+                        self.progress(total_rows, max(estimated_rows, total_rows), matched_count)
+                        self.write_progress(total_rows, max(estimated_rows, total_rows))
+                    
+                    self.progress(total_rows, total_rows, matched_count)
+                    self.write_progress(total_rows, total_rows)
+                    self.log(f"✓ Matching complete: {matched_count}/{total_rows} rows matched", "success")
+                    record['rows'] = total_rows
+            except BaseException:
+                if checkpoint is not None:
+                    checkpoint.save()
+                raise
+        if checkpoint is not None:
+            checkpoint.discard()
+        self.log(f"✓ File saved: {Path(output_file).name}", "success")
+        return total_rows, matched_count
+    
+    def batch(self, primary_files, ref_file, match_pairs, output_dir, normalizers=None, fuzzy=None,
+              carry_cols=None, output_format=".xlsx", ref_df=None):
+        """Merge many primary files against one reference whose index is built once.
+        Writes one output per input and batch_summary.xlsx into output_dir; returns run statistics."""
+        primary_files = list(primary_files)
+        if not primary_files:
+            raise ValueError("No primary Excel files to process")
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        ref_df = self.load_reference(ref_file, match_pairs, carry_cols, ref_df=ref_df)
+        with self.phase("index", rows=len(ref_df)):
+            matcher, ref_additional_cols = self.build_matcher(ref_df, match_pairs, normalizers, fuzzy, carry_cols)
+        primary_cols = [pair[0] for pair in match_pairs]
+        
+        output_files = []
+        for primary_file in primary_files:
+            output_file = output_dir / f"{Path(primary_file).stem}_merged{output_format}"
+            suffix = 2
+            while output_file in output_files:
+                output_file = output_dir / f"{Path(primary_file).stem}_merged_{suffix}{output_format}"
+                suffix += 1
+            output_files.append(output_file)
+        
+        tasks = [(str(primary_file), str(output_file)) for primary_file, output_file in zip(primary_files, output_files)]
+        # A marker per finished file, keyed by its contents, its output and the merge settings,
+        # lets a rerun of an interrupted batch skip the files already merged
+        markers = {}
+        if self.checkpoints is not None:
+            for primary_file, output_file in tasks:
+                markers[primary_file] = self.checkpoint_signature(
+                    matcher, "batch", WorkbookCache.file_digest(primary_file), output_file, primary_cols,
+                    ref_additional_cols, self.sheets)
+        finished = {}
+        for primary_file, output_file in tasks:
+            result = self.checkpoints.finished(markers[primary_file]) if markers else None
+            if result is not None and Path(output_file).exists():
+                finished[primary_file] = result
+        pending = [task for task in tasks if task[0] not in finished]
+        
+        workers = self.workers if self.workers > 0 else (os.cpu_count() or 1)
+        workers = min(workers, len(pending)) or 1
+        # Files are already spread over the pool, so pool workers parse their sheets serially
+        initargs = (matcher, primary_cols, ref_additional_cols, self.cache, self.sheets,
+                    1 if workers > 1 else self.read_workers)
+        self.log(f"Batch: {len(tasks)} primary files on {workers} worker(s)", "info")
+        if finished:
+            self.log(f"Resuming batch: {len(finished)} of {len(tasks)} files already merged", "info")
+        
+        results = []
+        
+        def collect(result):
+            if markers and not result['error'] and result['file'] not in finished:
+                self.checkpoints.mark_finished(markers[result['file']], result)
+            results.append(result)
+            name = Path(result['file']).name
+            if result['error']:
+                self.log(f"✗ {name}: {result['error']}", "error")
+            else:
+                rate = result['matched'] / result['rows'] * 100 if result['rows'] else 0
+                self.log(f"✓ {name}: {result['matched']}/{result['rows']} rows matched ({rate:.1f}%)", "success")
+            self.progress(len(results), len(tasks), sum(r['matched'] for r in results))
+        
+        with self.phase("batch") as record:
+            for result in finished.values():
+                collect(result)
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers, initializer=init_batch_worker,
+                                         initargs=initargs) as pool:
+                    futures = [pool.submit(merge_batch_file, *task) for task in pending]
+                    try:
+                        for future in as_completed(futures):
+                            self.check_cancelled()
+                            collect(future.result())
+                    except MergeCancelled:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+            else:
+                init_batch_worker(*initargs)
+                for task in pending:
+                    self.check_cancelled()
+                    collect(merge_batch_file(*task))
+            record['rows'] = sum(result['rows'] for result in results)
+        
+        order = {task[0]: i for i, task in enumerate(tasks)}
+        results.sort(key=lambda result: order[result['file']])
+        summary_file = output_dir / "batch_summary.xlsx"
+        self.write_batch_summary(results, summary_file)
+        for signature in markers.values():
+            self.checkpoints.marker(signature).unlink(missing_ok=True)
+        
+        stats = self.summarize(sum(r['rows'] for r in results), sum(r['matched'] for r in results), summary_file)
+        stats['files'] = len(results)
+        stats['failed'] = sum(1 for result in results if result['error'])
+        if self.run_report:
+            self.write_report(stats)
+        return stats
+    
+    def write_batch_summary(self, results, summary_file):
+        """One row per input with its match rate, plus a total row"""
+        rows = [{
+            'File': Path(result['file']).name,
+            'Rows': result['rows'],
+            'Matched': result['matched'],
+            'Unmatched': result['rows'] - result['matched'],
+            'Match Rate (%)': round(result['matched'] / result['rows'] * 100, 1) if result['rows'] else 0.0,
+            'Seconds': round(result['seconds'], 2),
+            'Output': Path(result['output']).name if not result['error'] else "",
+            'Status': f"Error: {result['error']}" if result['error'] else "OK",
+        } for result in results]
+        total_rows = sum(row['Rows'] for row in rows)
+        total_matched = sum(row['Matched'] for row in rows)
+        rows.append({
+            'File': "TOTAL", 'Rows': total_rows, 'Matched': total_matched,
+            'Unmatched': total_rows - total_matched,
+            'Match Rate (%)': round(total_matched / total_rows * 100, 1) if total_rows else 0.0,
+            'Seconds': round(sum(row['Seconds'] for row in rows), 2), 'Output': "",
+            'Status': f"{sum(1 for row in rows if row['Status'] != 'OK')} failed",
+        })
+        with open_output_writer(summary_file) as writer:
+            writer.write(pd.DataFrame(rows))
+        self.log(f"✓ Batch summary saved: {Path(summary_file).name}", "success")
+    
+    def run(self, primary_file, ref_file, match_pairs, output_file, normalizers=None, fuzzy=None,
+            stream=False, carry_cols=None):
+        """Load both files, merge them and save the result; returns run statistics"""
+        backend = self.choose_backend(ref_file, primary_file, fuzzy)
+        if self.fingerprints is not None and (stream or backend == "sqlite"):
+            self.log("⚠ Incremental re-merge needs the in-memory join; running a full merge", "warning")
+        if backend == "sqlite":
+            self.log(f"Joining on disk (SQLite backend): {Path(ref_file).name}", "info")
+            total_rows, matched_count = self.sqlite_merge(primary_file, ref_file, match_pairs, output_file,
+                                                          normalizers, carry_cols, fuzzy)
+        elif stream:
+            ref_df = self.load_reference(ref_file, match_pairs, carry_cols)
+            self.log(f"Streaming Primary file: {Path(primary_file).name} ({self.chunk_size} rows per chunk)", "info")
+            total_rows, matched_count = self.stream_merge(primary_file, ref_df, match_pairs,
+                                                          output_file, normalizers, fuzzy, carry_cols)
+        else:
+            ref_df = self.load_reference(ref_file, match_pairs, carry_cols)
+            self.log(f"Loading Primary file: {Path(primary_file).name}", "info")
+            primary_df = self.load(primary_file)
+            if self.fingerprints is not None:
+                result_df, matched_count = self.match_incremental(primary_file, primary_df, ref_file, ref_df,
+                                                                  match_pairs, normalizers, fuzzy, carry_cols)
+            else:
+                result_df, matched_count = self.match(primary_df, ref_df, match_pairs, normalizers, fuzzy,
+                                                      carry_cols)
+            self.save(result_df, output_file)
+            total_rows = len(primary_df)
+        
+        stats = self.summarize(total_rows, matched_count, output_file)
+        for record in self.phases:
+            if 'reused_rows' in record:
+                stats['reused_rows'], stats['recomputed_rows'] = record['reused_rows'], record['recomputed_rows']
+        if self.run_report:
+            self.write_report(stats)
+        return stats
+    
+    def run_sources(self, primary_file, sources, output_file, stream=False):
+        """Merge several references into the primary file, which is read, matched and written once;
+        returns run statistics"""
+        indexed = self.index_sources(sources)
+        if stream:
+            self.log(f"Streaming Primary file: {Path(primary_file).name} ({self.chunk_size} rows per chunk)", "info")
+            total_rows, matched_count = self.stream_sources(primary_file, indexed, output_file)
+        else:
+            self.log(f"Loading Primary file: {Path(primary_file).name}", "info")
+            primary_df = self.load(primary_file)
+            result_df, matched_count = self.match_sources(primary_df, indexed)
+            self.save(result_df, output_file)
+            total_rows = len(primary_df)
+        
+        stats = self.summarize(total_rows, matched_count, output_file)
+        if self.run_report:
+            self.write_report(stats)
+        return stats
+    
+    def write_report(self, stats, phases=None):
+        """Write <output>.report.json (and <output>.match.prof when profiled) next to the output"""
+        output_file = Path(stats['output_file'])
+        phases = self.phases if phases is None else phases
+        records = []
+        for record in phases:
+            record = dict(record)
+            profiler = record.pop('profile', None)
+            if profiler is not None:
+                profile_path = output_file.with_name(f"{output_file.stem}.{record['phase']}.prof")
+                profiler.dump_stats(profile_path)
+                record['profile_file'] = profile_path.name
+                self.log(f"Profile saved: {profile_path.name} (view with: python -m pstats {profile_path.name})", "info")
+            records.append(record)
+        
+        report = {
+            'created': datetime.now().isoformat(timespec="seconds"),
+            'stats': {**stats, 'output_file': str(stats['output_file'])},
+            'settings': {'chunk_size': self.chunk_size, 'workers': self.workers, 'match_policy': self.match_policy},
+            'phases': records,
+            'total_wall_s': sum(record['wall_s'] for record in records),
+        }
+        if self.duplicate_keys:
+            report['duplicate_keys'] = self.duplicate_keys
+        report_path = output_file.with_name(f"{output_file.stem}.report.json")
+        report_path.write_text(json.dumps(report, indent=2, default=str), encoding="utf-8")
+        self.log(f"Run report saved: {report_path.name}", "info")
+        return report_path
+    
+    @staticmethod
+    def summarize(total_rows, matched_count, output_file):
+        """Run statistics shared by the CLI and the GUI"""
+        return {
+            'total_rows': total_rows,
+            'matched': matched_count,
+            'unmatched': total_rows - matched_count,
+            'match_rate': (matched_count / total_rows * 100) if total_rows > 0 else 0,
+            'output_file': str(output_file)
+        }
+
+def parse_job(spec):
+    """Validate a merge job posted to a MergeServer; returns its run settings.
+    
+    A job is a JSON object: {"primary", "reference", "output": absolute paths, "mappings":
+    [{"primary": column, "reference": column, "file": another reference (optional), "rules":
+    {"case_sensitive": bool, ...}, "fuzzy": {"metric", "threshold"}}], "carry": [main reference
+    columns to merge in], "policy": duplicate-key policy, "stream": bool, "sheets": {workbook:
+    [sheet names] or "all"}, "overwrite": bool}; everything from "carry" on is optional. An existing
+    output file is only replaced when "overwrite" is true.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("a job must be a JSON object")
+    for field in ("primary", "reference", "output"):
+        if not isinstance(spec.get(field), str) or not os.path.isabs(spec[field]):
+            raise ValueError(f"'{field}' must be an absolute file path")
+    if Path(spec['output']).suffix.lower() not in OUTPUT_WRITERS:
+        raise ValueError(f"'output' must end in one of {', '.join(OUTPUT_WRITERS)}")
+    mappings = spec.get("mappings")
+    if not isinstance(mappings, list) or not mappings:
+        raise ValueError("'mappings' must list at least one column mapping")
+    
+    groups = {spec['reference']: ([], [], [])}
+    for i, mapping in enumerate(mappings, 1):
+        if not isinstance(mapping, dict) or not all(isinstance(mapping.get(side), str) and mapping[side]
+                                                    for side in ("primary", "reference")):
+            raise ValueError(f"mapping #{i} needs 'primary' and 'reference' column names (strings)")
+        file = mapping.get("file") or spec['reference']
+        if not isinstance(file, str) or not os.path.isabs(file):
+            raise ValueError(f"mapping #{i}: 'file' must be an absolute file path")
+        rules = mapping.get("rules") or {}
+        if not isinstance(rules, dict):
+            raise ValueError(f"mapping #{i}: 'rules' must be an object of true/false normalization rules")
+        unknown = set(rules) - set(KeyNormalizer.rule_names)
+        if unknown:
+            raise ValueError(f"mapping #{i}: unknown rules {', '.join(sorted(unknown))}")
+        if not all(isinstance(value, bool) for value in rules.values()):
+            raise ValueError(f"mapping #{i}: rules must be true or false")
+        fuzzy = mapping.get("fuzzy")
+        if fuzzy and not isinstance(fuzzy, dict):
+            raise ValueError(f"mapping #{i}: 'fuzzy' must be an object with a metric and a threshold")
+        if fuzzy:
+            fuzzy = {'metric': fuzzy.get("metric", FUZZY_METRICS[0]), 'threshold': fuzzy.get("threshold", 0.85)}
+            # bool is an int subclass, but true/false is not a threshold
+            threshold = fuzzy['threshold']
+            if (not isinstance(fuzzy['metric'], str) or fuzzy['metric'] not in FUZZY_METRICS
+                    or isinstance(threshold, bool) or not isinstance(threshold, (int, float))
+                    or not 0 < threshold <= 1):
+                raise ValueError(f"mapping #{i}: fuzzy needs a metric in {', '.join(FUZZY_METRICS)} "
+                                 f"and a numeric threshold between 0 and 1")
+            fuzzy['threshold'] = float(threshold)
+        match_pairs, normalizers, fuzzies = groups.setdefault(file, ([], [], []))
+        match_pairs.append((mapping['primary'], mapping['reference']))
+        normalizers.append(KeyNormalizer(**rules))
+        fuzzies.append(fuzzy or None)
+    
+    carry_cols = spec.get("carry")
+    if carry_cols is not None and not (isinstance(carry_cols, list) and all(isinstance(col, str) for col in carry_cols)):
+        raise ValueError("'carry' must be a list of column names")
+    policy = spec.get("policy", MergeEngine.match_policy)
+    if not isinstance(policy, str) or policy not in MATCH_POLICIES:
+        raise ValueError(f"'policy' must be one of {', '.join(MATCH_POLICIES)}")
+    if not isinstance(spec.get("stream", False), bool):
+        raise ValueError("'stream' must be true or false")
+    if not isinstance(spec.get("overwrite", False), bool):
+        raise ValueError("'overwrite' must be true or false")
+    if not spec.get("overwrite") and os.path.exists(spec['output']):
+        raise ValueError(f"'output' already exists: {spec['output']}; set \"overwrite\": true to replace it")
+    sheets = spec.get("sheets") or {}
+    if not isinstance(sheets, dict) or not all(
+            value == "all" or isinstance(value, list) and all(isinstance(name, str) for name in value)
+            for value in sheets.values()):
+        raise ValueError("'sheets' must map workbooks to a list of sheet names or \"all\"")
+    
+    return {
+        'primary': spec['primary'],
+        'output': spec['output'],
+        'sources': [ReferenceSource(file, *group, carry_cols=carry_cols if file == spec['reference'] else None)
+                    for file, group in groups.items() if group[0]],
+        'stream': bool(spec.get("stream")),
+        'policy': policy,
+        'sheets': sheets,
+    }
+
+class MergeServer:
+    """Headless merge service: jobs posted to a local HTTP API run on a pool of worker threads.
+    Threads rather than processes, so all jobs share one HotIndexCache and a reference is parsed
+    and indexed once for every job that joins against it."""
+    keep_jobs = 500  # finished jobs remembered for polling
+    log_lines = 500  # log lines kept per job
+    
+    def __init__(self, workers=2, hot_references=4, cache=None, log=None, checkpoints=None, token=None):
+        self.workers = max(1, workers)
+        # Every request must present this (Authorization: Bearer <token>); see server_token_file
+        self.token = token or secrets.token_urlsafe(32)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="merge-job")
+        self.hot_indexes = HotIndexCache(hot_references)
+        self.cache = cache
+        self.checkpoints = checkpoints
+        self.log = log or (lambda message, level="info": None)
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.httpd = None
+        self.socket_path = None
+    
+    def listen(self, host="127.0.0.1", port=8765, socket_path=None):
+        """Bind the API to a TCP port or a Unix socket; returns the address clients should use"""
+        if socket_path:
+            if UnixHTTPServer.address_family is None:
+                raise OSError("Unix sockets are not available on this platform")
+            if Path(socket_path).is_socket():
+                os.unlink(socket_path)  # left behind by a server that did not shut down cleanly
+            self.httpd = UnixHTTPServer(socket_path, MergeRequestHandler)
+            os.chmod(socket_path, 0o600)
+            self.socket_path = socket_path
+            address = socket_path
+        else:
+            self.httpd = ThreadingHTTPServer((host, port), MergeRequestHandler)
+            address = f"{host}:{self.httpd.server_address[1]}"
+        self.httpd.merge_server = self
+        return address
+    
+    def serve_forever(self):
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.close()
+    
+    def close(self):
+        """Cancel queued and running jobs, wait for them and release the socket"""
+        with self.lock:
+            for job in self.jobs.values():
+                job['cancel'].set()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.httpd is not None:
+            self.httpd.server_close()
+        if self.socket_path:
+            Path(self.socket_path).unlink(missing_ok=True)
+    
+    def submit(self, spec):
+        """Validate and queue a job; raises ValueError for a malformed spec"""
+        settings = parse_job(spec)
+        job = {
+            'id': uuid.uuid4().hex[:12],
+            'status': 'queued',
+            'primary': settings['primary'],
+            'output': settings['output'],
+            'submitted': datetime.now().isoformat(timespec="seconds"),
+            'started': None,
+            'finished': None,
+            'progress': {},
+            'result': None,
+            'error': None,
+            'log': deque(maxlen=self.log_lines),
+            'log_seq': 0,
+            'cancel': threading.Event(),
+        }
+        with self.lock:
+            self.jobs[job['id']] = job
+            finished = [job_id for job_id, other in self.jobs.items() if other['finished']]
+            for job_id in finished[:max(0, len(self.jobs) - self.keep_jobs)]:
+                del self.jobs[job_id]
+        self.log(f"Job {job['id']} queued: {Path(job['primary']).name} -> {Path(job['output']).name}", "info")
+        self.pool.submit(self.run_job, job, settings)
+        return self.view(job)
+    
+    def run_job(self, job, settings):
+        with self.lock:
+            if job['status'] != 'queued':  # cancelled while waiting for a worker
+                return
+            job['status'] = 'running'
+            job['started'] = datetime.now().isoformat(timespec="seconds")
+        engine = MergeEngine(
+            log=lambda message, level="info": self.record(job, message, level),
+            progress=lambda done, total, matched: self.update(job, rows_done=done, rows_total=total, matched=matched),
+            write_progress=lambda written, total: self.update(job, rows_written=written, rows_total=total),
+            cancel_event=job['cancel'],
+            progress_interval=0.25,
+            cache=self.cache
+        )
+        engine.hot_indexes = self.hot_indexes
+        engine.checkpoints = self.checkpoints
+        engine.match_policy = settings['policy']
+        for path, sheets in settings['sheets'].items():
+            engine.select_sheets(path, sheets)
+        
+        outcome = {'status': 'done'}
+        try:
+            stats = engine.run_sources(settings['primary'], settings['sources'], settings['output'], settings['stream'])
+            phases = [{key: value for key, value in record.items() if key != 'profile'} for record in engine.phases]
+            outcome['result'] = {'stats': stats, 'phases': phases, 'duplicate_keys': engine.duplicate_keys}
+            self.record(job, f"✓ Saved {Path(stats['output_file']).name}: {stats['matched']} of "
+                             f"{stats['total_rows']} rows matched", "success")
+        except MergeCancelled:
+            outcome['status'] = 'cancelled'
+            self.record(job, "⚠ Job cancelled", "warning")
+        except Exception as e:
+            outcome.update(status='failed', error=str(e))
+            self.record(job, f"✗ Job failed: {str(e)}", "error")
+        with self.lock:
+            job.update(outcome, finished=datetime.now().isoformat(timespec="seconds"))
+    
+    def record(self, job, message, level="info"):
+        """Append to a job's log (and the server's)"""
+        with self.lock:
+            job['log_seq'] += 1
+            job['log'].append({'seq': job['log_seq'], 'level': level, 'message': message})
+        self.log(f"[{job['id']}] {message}", level)
+    
+    def update(self, job, **progress):
+        with self.lock:
+            job['progress'].update(progress)
+    
+    def view(self, job, since=None):
+        """JSON-ready copy of a job; with since, its log lines numbered after since"""
+        with self.lock:
+            view = {key: value for key, value in job.items() if key not in ('log', 'log_seq', 'cancel')}
+            view['progress'] = dict(job['progress'])
+            if since is not None:
+                view['log'] = [entry for entry in job['log'] if entry['seq'] > since]
+        return view
+    
+    def job(self, job_id, since=None):
+        with self.lock:
+            job = self.jobs.get(job_id)
+        return self.view(job, since) if job is not None else None
+    
+    def list_jobs(self):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [self.view(job) for job in jobs]
+    
+    def cancel(self, job_id):
+        """Stop a queued or running job; returns the job, or None if there is no such job"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job['cancel'].set()
+            if job['status'] == 'queued':
+                job.update(status='cancelled', finished=datetime.now().isoformat(timespec="seconds"))
+        self.log(f"Job {job_id}: cancel requested", "warning")
+        return self.view(job)
+    
+    def status(self):
+        with self.lock:
+            counts = Counter(job['status'] for job in self.jobs.values())
+        return {'workers': self.workers, 'jobs': dict(counts), 'hot_cache': self.hot_indexes.stats()}
+
+def server_token_file(cache_dir=None):
+    """Where `serve` writes its access token (readable by this user only) for local clients"""
+    return Path(cache_dir or os.environ.get("EXCELMERGER_CACHE_DIR")
+                or Path.home() / ".cache" / "excelmerger") / "server.token"
+
+def write_server_token(path, token):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    os.chmod(path, 0o600)  # an older file keeps its mode through O_TRUNC
+
+def read_server_token(path=None):
+    """The token a local server wrote, or None"""
+    try:
+        return Path(path or server_token_file()).read_text().strip() or None
+    except OSError:
+        return None
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """HTTP server on a Unix socket file, for the job API"""
+    address_family = getattr(socket, "AF_UNIX", None)
+    daemon_threads = True
+
+class MergeRequestHandler(BaseHTTPRequestHandler):
+    """JSON API of a MergeServer:
+    POST /jobs (a job, see parse_job) queues it; GET /jobs lists jobs; GET /jobs/<id>?since=N
+    returns one job with its log lines after N; DELETE /jobs/<id> cancels it; GET /status
+    reports the workers, job counts and hot reference cache.
+    Every request needs the server's token; requests from web pages (with an Origin header)
+    are refused, and jobs must be posted as application/json, which a page cannot send unasked."""
+    server_version = "ExcelMerger"
+    
+    def refused(self):
+        """Reply with an error and return True unless the request may use the API"""
+        if self.headers.get("Origin") is not None:
+            self.reply(403, {'error': "requests from web pages are not accepted"})
+            return True
+        expected = f"Bearer {self.server.merge_server.token}".encode("utf-8")
+        if not hmac.compare_digest(self.headers.get("Authorization", "").encode("utf-8"), expected):
+            self.reply(401, {'error': "missing or wrong access token (see the server's token file)"})
+            return True
+        return False
+    
+    def do_GET(self):
+        if self.refused():
+            return
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        merge_server = self.server.merge_server
+        if parts == ["status"]:
+            self.reply(200, merge_server.status())
+        elif parts == ["jobs"]:
+            self.reply(200, {'jobs': merge_server.list_jobs()})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            since = parse_qs(url.query).get("since", [None])[0]
+            job = merge_server.job(parts[1], int(since) if since and since.isdigit() else None)
+            self.reply(200, job) if job is not None else self.reply(404, {'error': f"no job {parts[1]}"})
+        else:
+            self.reply(404, {'error': f"unknown path {url.path}"})
+    
+    def do_POST(self):
+        if self.refused():
+            return
+        if urlsplit(self.path).path.strip("/") != "jobs":
+            self.reply(404, {'error': f"unknown path {self.path}"})
+            return
+        if self.headers.get_content_type() != "application/json":
+            self.reply(415, {'error': "jobs must be posted as application/json"})
+            return
+        try:
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            job = self.server.merge_server.submit(json.loads(body or b"null"))
+        except (ValueError, TypeError) as e:
+            self.reply(400, {'error': str(e)})
+            return
+        self.reply(202, job)
+    
+    def do_DELETE(self):
+        if self.refused():
+            return
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        job = self.server.merge_server.cancel(parts[1]) if len(parts) == 2 and parts[0] == "jobs" else None
+        self.reply(200, job) if job is not None else self.reply(404, {'error': f"no job at {self.path}"})
+    
+    def reply(self, status, payload):
+        body = json.dumps(payload, default=str).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def address_string(self):
+        # Unix socket peers have no address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "local"
+    
+    def log_message(self, format, *args):
+        self.server.merge_server.log(f"{self.address_string()} {format % args}", "debug")
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """http.client connection over a Unix socket"""
+    def __init__(self, path, timeout=10):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+    
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+class MergeClient:
+    """Client of a MergeServer; address is "host:port", a bare port on this machine,
+    or the path of the server's Unix socket. The access token defaults to EXCELMERGER_TOKEN,
+    then to the token file a server started by this user writes (server_token_file)."""
+    poll_interval = 0.5
+    
+    def __init__(self, address, timeout=10, token=None):
+        self.address = address.strip()
+        self.timeout = timeout
+        self.token = token or os.environ.get("EXCELMERGER_TOKEN") or read_server_token()
+    
+    def connection(self):
+        host, sep, port = self.address.rpartition(":")
+        if port.isdigit() and (sep or os.path.sep not in self.address):
+            return http.client.HTTPConnection(host or "127.0.0.1", int(port), timeout=self.timeout)
+        return UnixHTTPConnection(self.address, self.timeout)
+    
+    def request(self, method, path, payload=None):
+        connection = self.connection()
+        try:
+            body = json.dumps(payload).encode("utf-8") if payload is not None else None
+            headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+            if body is not None:
+                headers["Content-Type"] = "application/json"
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            data = json.loads(response.read() or b"null")
+        except OSError as e:
+            raise ConnectionError(f"Cannot reach the merge server at {self.address}: {str(e)}") from e
+        finally:
+            connection.close()
+        if response.status >= 400:
+            raise RuntimeError(f"Merge server: {data.get('error', response.reason)}")
+        return data
+    
+    def submit(self, spec):
+        return self.request("POST", "/jobs", spec)
+    
+    def job(self, job_id, since=None):
+        return self.request("GET", f"/jobs/{job_id}" + (f"?since={since}" if since is not None else ""))
+    
+    def cancel(self, job_id):
+        return self.request("DELETE", f"/jobs/{job_id}")
+    
+    def status(self):
+        return self.request("GET", "/status")
+    
+    def follow(self, job_id, engine):
+        """Poll a job until it finishes, replaying its log and progress through engine's callbacks
+        and cancelling it when engine is cancelled. Returns the finished job's statistics, with
+        its phases and duplicate-key report copied onto engine; raises if the job did not succeed."""
+        seen = 0
+        cancelling = False
+        while True:
+            job = self.job(job_id, since=seen)
+            for entry in job['log']:
+                engine.log(entry['message'], entry['level'])
+                seen = entry['seq']
+            progress = job['progress']
+            if 'rows_done' in progress:
+                engine.progress(progress['rows_done'], progress['rows_total'], progress['matched'])
+            if 'rows_written' in progress:
+                engine.write_progress(progress['rows_written'], progress['rows_total'])
+            if job['finished']:
+                break
+            if engine.cancel_event is not None and engine.cancel_event.is_set() and not cancelling:
+                self.cancel(job_id)
+                cancelling = True
+            time.sleep(self.poll_interval)
+        
+        if job['status'] == 'cancelled':
+            raise MergeCancelled()
+        if job['status'] != 'done':
+            raise RuntimeError(job['error'] or f"job {job_id} {job['status']}")
+        engine.phases.extend(job['result']['phases'])
+        engine.duplicate_keys.extend(job['result']['duplicate_keys'])
+        return job['result']['stats']
 
 class ExcelMatcherApp:
     def __init__(self, root):
@@ -87,9 +3151,48 @@ class ExcelMatcherApp:
         
         self.primary_file = None
         self.ref_file = None
+        self.primary_columns = None
+        self.ref_columns = None
         self.primary_df = None
         self.ref_df = None
+        self.progress_unit = "rows"
         self.column_mappings = []
+        # Workbook path -> sheets read as one table (see MergeEngine.sheets); others use their first sheet
+        self.sheet_selection = {}
+        # Additional reference files ({'file', 'columns'}); their data is read when processing
+        self.extra_refs = []
+        self.default_normalizer = KeyNormalizer()
+        
+        # Background worker state; the UI drains worker_queue every ui_refresh_ms
+        self.worker = None
+        self.worker_queue = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.ui_refresh_ms = 33
+        
+        # File loads run on their own threads; a load's events are applied only while its
+        # token is still current, so a newer pick or a cancel simply orphans the old load
+        self.loaders = {}
+        self.load_tokens = {'primary': 0, 'ref': 0}
+        self.loader_queue = queue.Queue()
+        self.loader_poll = None
+        self.load_widgets = {}
+        
+        # Phase timings of the current run (file loads + worker engines), for the run report
+        self.load_phases = {}
+        self.run_phases = []
+        self.run_duplicate_keys = []
+        
+        try:
+            self.workbook_cache = WorkbookCache()
+        except OSError:
+            self.workbook_cache = None
+        
+        # Activity Log: a bounded buffer drained into the widget every log_flush_ms; set
+        # EXCELMERGER_LOG_FILE to also keep a rotating log file with per-chunk diagnostics
+        self.log_lines = 2000
+        self.log_flush_ms = 100
+        self.activity_log = ActivityLog(capacity=self.log_lines, log_file=os.environ.get("EXCELMERGER_LOG_FILE"),
+                                        verbose=bool(os.environ.get("EXCELMERGER_LOG_VERBOSE")))
         
         # Modern Colors with section backgrounds
         self.colors = {
@@ -116,40 +3219,36 @@ class ExcelMatcherApp:
         }
         
         self.create_widgets()
+        self.flush_log()
     
     def log_message(self, message, level="info"):
-        """Add message to log with timestamp"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        
-        color_map = {
-            "info": self.colors['text_primary'],
-            "success": self.colors['success'],
-            "warning": self.colors['warning'],
-            "error": self.colors['danger']
-        }
-        
-        self.log_text.config(state="normal")
-        self.log_text.insert("end", f"[{timestamp}] ", "timestamp")
-        self.log_text.insert("end", f"{message}\n", level)
-        self.log_text.tag_config("timestamp", foreground=self.colors['secondary'], font=("Segoe UI", 10))
-        self.log_text.tag_config(level, foreground=color_map.get(level, self.colors['text_primary']))
-        self.log_text.see("end")
-        self.log_text.config(state="disabled")
-        self.root.update()
+        """Add message to log with timestamp (shown on the next flush_log tick; safe from any thread)"""
+        self.activity_log.write(message, level)
     
-    def normalize_value(self, val):
-        """Normalize values for comparison"""
-        if pd.isna(val) or val is None:
-            return ""
-        
-        if isinstance(val, (pd.Timestamp, datetime)):
-            return val.strftime('%Y-%m-%d').lower().strip()
-        
-        val_str = str(val).strip().lower()
-        val_str = re.sub(r'\s+', ' ', val_str)
-        val_str = re.sub(r'[,.\-_]', '', val_str)
-        
-        return val_str
+    def flush_log(self):
+        """Append the messages logged since the last tick in one insert, trim the widget to
+        log_lines and re-arm the timer"""
+        entries = self.activity_log.drain()
+        if entries:
+            chunks = []
+            for stamp, level, message in entries:
+                chunks += [f"[{stamp.strftime('%H:%M:%S')}] ", "timestamp", f"{message}\n", level]
+            self.log_text.config(state="normal")
+            self.log_text.insert("end", *chunks)
+            excess = int(self.log_text.index("end-1c").split(".")[0]) - 1 - self.log_lines
+            if excess > 0:
+                self.log_text.delete("1.0", f"{excess + 1}.0")
+            self.log_text.see("end")
+            self.log_text.config(state="disabled")
+        self.root.after(self.log_flush_ms, self.flush_log)
+    
+    def toggle_verbose_log(self):
+        """Show or hide per-chunk "debug" diagnostics in the Activity Log (the log file always has them)"""
+        self.activity_log.verbose = self.verbose_log_var.get()
+    
+    def normalize_value(self, val):
+        """Normalize values for comparison"""
+        return self.default_normalizer.normalize_value(val)
     
     def create_widgets(self):
         # Main container
@@ -206,6 +3305,8 @@ class ExcelMatcherApp:
                     gradient_colors=["#60a5fa", "#3b82f6"],
                     text_color="black", bg=self.colors['section_file']).pack(side="right")
         
+        self.create_load_status(file_frame, 'primary')
+        
         # Reference File
         ref_frame = tk.Frame(file_frame, bg=self.colors['section_file'])
         ref_frame.pack(fill="x", pady=12)
@@ -225,6 +3326,33 @@ class ExcelMatcherApp:
                     gradient_colors=["#60a5fa", "#3b82f6"],
                     text_color="black", bg=self.colors['section_file']).pack(side="right")
         
+        self.create_load_status(file_frame, 'ref')
+        
+        # Additional reference files, merged in the same pass over the primary rows
+        extra_frame = tk.Frame(file_frame, bg=self.colors['section_file'])
+        extra_frame.pack(fill="x", pady=12)
+        
+        tk.Label(extra_frame, text="More References:", font=("Segoe UI", 11, "bold"), 
+                bg=self.colors['section_file'], fg=self.colors['text_primary'], 
+                width=15, anchor="w").pack(side="left")
+        
+        self.extra_refs_label = tk.Label(extra_frame, text="None (optional)", 
+                                        fg=self.colors['text_secondary'], 
+                                        bg=self.colors['section_file'], anchor="w", 
+                                        font=("Segoe UI", 11))
+        self.extra_refs_label.pack(side="left", fill="x", expand=True, padx=12)
+        
+        tk.Button(extra_frame, text="✕", command=self.clear_extra_references,
+                 bg=self.colors['danger'], fg="white", font=("Segoe UI", 9, "bold"),
+                 width=3, cursor="hand2", relief="flat",
+                 activebackground=self.colors['danger_hover'],
+                 activeforeground="white", bd=0).pack(side="right", padx=(6, 0))
+        
+        ModernButton(extra_frame, "Add Reference", self.add_extra_reference,
+                    width=150, height=40,
+                    gradient_colors=["#93c5fd", "#60a5fa"],
+                    text_color="black", bg=self.colors['section_file']).pack(side="right")
+        
         # Column Mapping with light amber background
         self.mapping_frame = tk.LabelFrame(left_frame, 
                                           text="  🔗 Step 2: Configure Column Matching  ", 
@@ -248,6 +3376,11 @@ class ExcelMatcherApp:
                     gradient_colors=["#fca5a5", "#ef4444"],
                     text_color="black", bg=self.colors['section_mapping']).pack(side="left", padx=6)
         
+        ModernButton(mapping_controls, "🔍 Preview Matches", 
+                    self.preview_matches, width=180, height=42,
+                    gradient_colors=["#93c5fd", "#3b82f6"],
+                    text_color="black", bg=self.colors['section_mapping']).pack(side="left", padx=6)
+        
         # Scrollable mappings container
         mappings_scroll_frame = tk.Frame(self.mapping_frame, bg=self.colors['section_mapping'])
         mappings_scroll_frame.pack(fill="both", expand=True)
@@ -283,7 +3416,62 @@ class ExcelMatcherApp:
                                               self.process_files, width=280, height=50,
                                               gradient_colors=["#fbbf24", "#f59e0b"],
                                               text_color="black", bg=self.colors['bg_light'])
-        self.process_btn_widget.pack()
+        self.process_btn_widget.pack(side="left", expand=True, anchor="e", padx=6)
+        
+        self.batch_btn_widget = ModernButton(action_frame, "Batch Folder...", 
+                                            self.process_batch, width=170, height=50,
+                                            gradient_colors=["#fde68a", "#fbbf24"],
+                                            text_color="black", bg=self.colors['bg_light'])
+        self.batch_btn_widget.pack(side="left", padx=6)
+        
+        self.cancel_btn_widget = ModernButton(action_frame, "Cancel", 
+                                             self.cancel_processing, width=140, height=50,
+                                             gradient_colors=["#fca5a5", "#ef4444"],
+                                             text_color="black", bg=self.colors['bg_light'])
+        self.cancel_btn_widget.pack(side="left", expand=True, anchor="w", padx=6)
+        
+        run_options = tk.Frame(left_frame, bg=self.colors['bg_light'])
+        run_options.pack(pady=(0, 12))
+        
+        self.stream_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(run_options, text="Low-memory streaming (primary .xlsx read in chunks)",
+                      variable=self.stream_var, font=("Segoe UI", 9), bg=self.colors['bg_light'],
+                      fg=self.colors['text_secondary'], activebackground=self.colors['bg_light']).pack(side="left", padx=6)
+        
+        tk.Label(run_options, text="Worker processes:", font=("Segoe UI", 9),
+                bg=self.colors['bg_light'], fg=self.colors['text_secondary']).pack(side="left", padx=(12, 3))
+        self.workers_var = tk.IntVar(value=1)
+        tk.Spinbox(run_options, from_=1, to=os.cpu_count() or 1, textvariable=self.workers_var,
+                  width=4, font=("Segoe UI", 9)).pack(side="left")
+        
+        self.profile_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(run_options, text="Profile match phase",
+                      variable=self.profile_var, font=("Segoe UI", 9), bg=self.colors['bg_light'],
+                      fg=self.colors['text_secondary'], activebackground=self.colors['bg_light']).pack(side="left", padx=(12, 6))
+        
+        self.incremental_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(run_options, text="Incremental (reuse last run)",
+                      variable=self.incremental_var, font=("Segoe UI", 9), bg=self.colors['bg_light'],
+                      fg=self.colors['text_secondary'], activebackground=self.colors['bg_light']).pack(side="left", padx=6)
+        
+        tk.Label(run_options, text="Duplicate keys:", font=("Segoe UI", 9),
+                bg=self.colors['bg_light'], fg=self.colors['text_secondary']).pack(side="left", padx=(12, 3))
+        self.policy_combo = ttk.Combobox(run_options, values=list(MATCH_POLICIES), state="readonly",
+                                         width=9, font=("Segoe UI", 9))
+        self.policy_combo.set(MergeEngine.match_policy)
+        self.policy_combo.pack(side="left")
+        
+        self.verbose_log_var = tk.BooleanVar(value=self.activity_log.verbose)
+        tk.Checkbutton(run_options, text="Verbose log",
+                      variable=self.verbose_log_var, command=self.toggle_verbose_log,
+                      font=("Segoe UI", 9), bg=self.colors['bg_light'],
+                      fg=self.colors['text_secondary'], activebackground=self.colors['bg_light']).pack(side="left", padx=(12, 6))
+        
+        # host:port or socket path of a merge server (excelMerger.py serve); blank runs merges here
+        tk.Label(run_options, text="Job server:", font=("Segoe UI", 9),
+                bg=self.colors['bg_light'], fg=self.colors['text_secondary']).pack(side="left", padx=(12, 3))
+        self.server_var = tk.StringVar(value=os.environ.get("EXCELMERGER_SERVER", ""))
+        tk.Entry(run_options, textvariable=self.server_var, width=16, font=("Segoe UI", 9)).pack(side="left")
         
         # === RIGHT SIDE CONTENT ===
         
@@ -307,16 +3495,16 @@ class ExcelMatcherApp:
                                     relief="solid", bd=1, state="disabled")
         self.primary_cols_text.pack(fill="x", pady=(0, 12))
         
-        # Reference Columns
-        tk.Label(columns_frame, text="Reference File Columns:", 
+        # Reference Columns (selection = columns carried into the output)
+        tk.Label(columns_frame, text="Reference File Columns (selected are merged in):", 
                 font=("Segoe UI", 10, "bold"), bg=self.colors['section_info'], 
                 fg=self.colors['text_primary'], anchor="w").pack(fill="x", pady=(6, 3))
         
-        self.ref_cols_text = tk.Text(columns_frame, height=4, bg="#ffffff", 
-                                    fg=self.colors['text_primary'],
-                                    font=("Segoe UI", 10), wrap="word", 
-                                    relief="solid", bd=1, state="disabled")
-        self.ref_cols_text.pack(fill="x")
+        self.ref_cols_list = tk.Listbox(columns_frame, height=5, bg="#ffffff", 
+                                       fg=self.colors['text_primary'],
+                                       font=("Segoe UI", 10), selectmode="multiple",
+                                       exportselection=False, relief="solid", bd=1)
+        self.ref_cols_list.pack(fill="x")
         
         # Progress Frame with light green background
         progress_frame = tk.LabelFrame(right_frame, text="  📊 Progress & Statistics  ", 
@@ -377,79 +3565,324 @@ class ExcelMatcherApp:
                                yscrollcommand=log_scroll.set, state="disabled", bd=1)
         self.log_text.pack(fill="both", expand=True)
         log_scroll.config(command=self.log_text.yview)
+        self.log_text.tag_config("timestamp", foreground=self.colors['secondary'], font=("Segoe UI", 10))
+        for level, color in (("debug", 'text_secondary'), ("info", 'text_primary'), ("success", 'success'),
+                             ("warning", 'warning'), ("error", 'danger')):
+            self.log_text.tag_config(level, foreground=self.colors[color])
         
         self.log_message("Application started. Ready to process files.", "info")
         
         # Initial column display
         self.update_columns_display()
     
+    def create_load_status(self, parent, slot):
+        """Progress bar, status text and cancel button for one background file load"""
+        status_frame = tk.Frame(parent, bg=self.colors['section_file'])
+        status_frame.pack(fill="x", pady=(0, 6))
+        
+        progress = ttk.Progressbar(status_frame, mode='determinate', length=220)
+        progress.pack(side="left", padx=(0, 12))
+        
+        status = tk.Label(status_frame, text="", font=("Segoe UI", 9),
+                         bg=self.colors['section_file'], fg=self.colors['text_secondary'], anchor="w")
+        status.pack(side="left", fill="x", expand=True)
+        
+        tk.Button(status_frame, text="✕", command=lambda: self.cancel_load(slot),
+                 bg=self.colors['danger'], fg="white", font=("Segoe UI", 9, "bold"),
+                 width=3, cursor="hand2", relief="flat",
+                 activebackground=self.colors['danger_hover'],
+                 activeforeground="white", bd=0).pack(side="right")
+        
+        self.load_widgets[slot] = {'progress': progress, 'status': status}
+    
     def update_columns_display(self):
         """Update the columns display in the right panel"""
         # Primary Columns
         self.primary_cols_text.config(state="normal")
         self.primary_cols_text.delete(1.0, "end")
-        if self.primary_df is not None:
-            cols = ", ".join(self.primary_df.columns)
+        if self.primary_columns is not None:
+            cols = ", ".join(map(str, self.primary_columns))
             self.primary_cols_text.insert(1.0, cols)
         else:
             self.primary_cols_text.insert(1.0, "No file loaded")
         self.primary_cols_text.config(state="disabled")
         
-        # Reference Columns
-        self.ref_cols_text.config(state="normal")
-        self.ref_cols_text.delete(1.0, "end")
-        if self.ref_df is not None:
-            cols = ", ".join(self.ref_df.columns)
-            self.ref_cols_text.insert(1.0, cols)
-        else:
-            self.ref_cols_text.insert(1.0, "No file loaded")
-        self.ref_cols_text.config(state="disabled")
+        # Reference Columns, all selected for carry-over by default
+        self.ref_cols_list.delete(0, "end")
+        if self.ref_columns is not None:
+            for col in self.ref_columns:
+                self.ref_cols_list.insert("end", str(col))
+            self.ref_cols_list.selection_set(0, "end")
+    
+    def selected_carry_columns(self):
+        """Reference columns picked in the carry-over list"""
+        return [self.ref_columns[i] for i in self.ref_cols_list.curselection()]
     
     def select_primary_file(self):
         file = filedialog.askopenfilename(
             title="Select Primary Excel File",
             filetypes=[("Excel files", "*.xlsx *.xls")]
         )
-        if file:
-            try:
-                self.log_message(f"Loading Primary file: {Path(file).name}", "info")
-                self.primary_file = file
-                self.primary_df = pd.read_excel(file)
-                self.primary_label.config(text=Path(file).name, fg=self.colors['success'])
-                self.log_message(f"✓ Primary file loaded: {len(self.primary_df)} rows, {len(self.primary_df.columns)} columns", "success")
-                self.update_columns_display()
-                self.update_mapping_options()
-            except Exception as e:
-                self.log_message(f"✗ Error loading Primary file: {str(e)}", "error")
-                messagebox.showerror("Error", f"Error loading Primary file:\n{str(e)}")
+        if file and self.choose_sheets(file):
+            self.start_load('primary', file)
     
     def select_ref_file(self):
         file = filedialog.askopenfilename(
             title="Select Reference Excel File",
             filetypes=[("Excel files", "*.xlsx *.xls")]
         )
-        if file:
+        if file and self.choose_sheets(file):
+            self.start_load('ref', file)
+    
+    def choose_sheets(self, file):
+        """For a multi-sheet workbook, ask which sheets to read as one table and remember the
+        choice for every engine that reads file; returns False if the user cancelled"""
+        try:
+            sheets = list_sheets(file)
+        except Exception:
+            sheets = []  # the load itself reports unreadable files
+        chosen = self.ask_sheets(file, sheets) if len(sheets) > 1 else sheets[:1]
+        if chosen is None:
+            return False
+        key = os.path.abspath(file)
+        if chosen == sheets[:1]:
+            self.sheet_selection.pop(key, None)
+        else:
+            self.sheet_selection[key] = chosen
+            self.log_message(f"{Path(file).name}: reading {len(chosen)} of {len(sheets)} sheets as one table"
+                             + (f" (column '{SOURCE_SHEET_COLUMN}' names each row's sheet)" if len(chosen) > 1 else ""),
+                             "info")
+        return True
+    
+    def ask_sheets(self, file, sheets):
+        """Modal sheet picker; returns the selected sheet names in workbook order, or None"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("Select Sheets")
+        dialog.configure(bg=self.colors['bg_card'], padx=16, pady=12)
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        
+        tk.Label(dialog, text=f"{Path(file).name} has {len(sheets)} sheets.\n"
+                              "Select one or several (Ctrl/Shift-click) to read as one table:",
+                font=("Segoe UI", 10), bg=self.colors['bg_card'], fg=self.colors['text_primary'],
+                justify="left").pack(anchor="w", pady=(0, 8))
+        listbox = tk.Listbox(dialog, selectmode="extended", exportselection=False, font=("Segoe UI", 10),
+                             height=min(len(sheets), 12), width=40)
+        for sheet in sheets:
+            listbox.insert("end", sheet)
+        listbox.selection_set(0)
+        listbox.pack(fill="both", expand=True)
+        
+        chosen = []
+        
+        def accept(names=None):
+            chosen.extend(names if names is not None else [sheets[i] for i in listbox.curselection()])
+            dialog.destroy()
+        
+        buttons = tk.Frame(dialog, bg=self.colors['bg_card'])
+        buttons.pack(fill="x", pady=(10, 0))
+        for text, command in (("OK", accept), ("All Sheets", lambda: accept(sheets)), ("Cancel", dialog.destroy)):
+            tk.Button(buttons, text=text, command=command, font=("Segoe UI", 9),
+                      width=10).pack(side="left", padx=4)
+        listbox.bind("<Double-Button-1>", lambda e: accept())
+        dialog.bind("<Escape>", lambda e: dialog.destroy())
+        
+        dialog.grab_set()
+        dialog.wait_window()
+        return chosen or None
+    
+    def file_label(self, file):
+        """File name plus the sheets read from it, for the file panel"""
+        sheets = self.sheet_selection.get(os.path.abspath(file))
+        if not sheets:
+            return Path(file).name
+        return f"{Path(file).name} [{', '.join(sheets) if len(sheets) <= 3 else f'{len(sheets)} sheets'}]"
+    
+    def add_extra_reference(self):
+        file = filedialog.askopenfilename(
+            title="Select Additional Reference Excel File",
+            filetypes=[("Excel files", "*.xlsx *.xls")]
+        )
+        if not file:
+            return
+        try:
+            columns = MergeEngine().read_columns(file)
+        except Exception as e:
+            self.log_message(f"✗ Error reading Reference file: {str(e)}", "error")
+            messagebox.showerror("Error", f"Error reading Reference file:\n{str(e)}")
+            return
+        
+        self.extra_refs.append({'file': file, 'columns': columns})
+        self.log_message(f"✓ Additional reference added: {Path(file).name} ({len(columns)} columns); "
+                         f"pick it in a mapping's Reference box", "success")
+        self.update_extra_references()
+    
+    def clear_extra_references(self):
+        if not self.extra_refs:
+            return
+        self.extra_refs = []
+        self.log_message("Additional references removed; their mappings now use the main reference", "warning")
+        self.update_extra_references()
+    
+    def reference_names(self):
+        """Names offered by each mapping's Reference box; index 0 is the main reference"""
+        main = Path(self.ref_file).name if self.ref_file else "Reference"
+        return [main] + [Path(ref['file']).name for ref in self.extra_refs]
+    
+    def reference_columns(self, source):
+        return self.ref_columns if source <= 0 else self.extra_refs[source - 1]['columns']
+    
+    def update_extra_references(self):
+        names = [Path(ref['file']).name for ref in self.extra_refs]
+        self.extra_refs_label.config(text=", ".join(names) if names else "None (optional)",
+                                     fg=self.colors['success'] if names else self.colors['text_secondary'])
+        for mapping in self.column_mappings:
+            source = mapping['source_combo'].current()
+            mapping['source_combo']['values'] = self.reference_names()
+            if source > len(self.extra_refs):
+                mapping['source_combo'].current(0)
+                mapping['ref_combo']['values'] = list(self.ref_columns)
+                mapping['ref_combo'].set("")
+            else:
+                mapping['source_combo'].current(max(source, 0))
+    
+    def slot_name(self, slot):
+        return "Primary" if slot == 'primary' else "Reference"
+    
+    def start_load(self, slot, file):
+        """Read the header and then the data of file on a background thread.
+        The reference stops at its header; the worker reads just the columns a run needs."""
+        if slot in self.loaders:
+            self.loaders.pop(slot).set()
+        self.load_tokens[slot] += 1
+        token = self.load_tokens[slot]
+        cancel_event = threading.Event()
+        self.loaders[slot] = cancel_event
+        
+        widgets = self.load_widgets[slot]
+        widgets['progress']['value'] = 0
+        widgets['status'].config(text="Reading header...", fg=self.colors['warning'])
+        self.log_message(f"Loading {self.slot_name(slot)} file: {Path(file).name}", "info")
+        
+        post = self.loader_queue.put
+        engine = MergeEngine(
+            log=lambda message, level="info": post(('log', slot, token, message, level)),
+            read_progress=lambda done, total: post(('progress', slot, token, done, total)),
+            cancel_event=cancel_event,
+            progress_interval=self.ui_refresh_ms / 1000,
+            cache=self.workbook_cache
+        )
+        engine.sheets = dict(self.sheet_selection)
+        
+        def target():
             try:
-                self.log_message(f"Loading Reference file: {Path(file).name}", "info")
-                self.ref_file = file
-                self.ref_df = pd.read_excel(file)
-                self.ref_label.config(text=Path(file).name, fg=self.colors['success'])
-                self.log_message(f"✓ Reference file loaded: {len(self.ref_df)} rows, {len(self.ref_df.columns)} columns", "success")
-                self.update_columns_display()
-                self.update_mapping_options()
+                post(('header', slot, token, file, engine.read_columns(file)))
+                if slot == 'ref':
+                    # Only the key and carry-over columns are parsed, once Process knows which they are
+                    post(('deferred', slot, token))
+                    return
+                post(('loaded', slot, token, engine.load(file), engine.phases))
+            except MergeCancelled:
+                post(('cancelled', slot, token))
             except Exception as e:
-                self.log_message(f"✗ Error loading Reference file: {str(e)}", "error")
-                messagebox.showerror("Error", f"Error loading Reference file:\n{str(e)}")
+                post(('error', slot, token, e))
+        
+        threading.Thread(target=target, daemon=True).start()
+        if self.loader_poll is None:
+            self.loader_poll = self.root.after(self.ui_refresh_ms, self.drain_loader_queue)
+    
+    def cancel_load(self, slot):
+        if slot not in self.loaders:
+            self.log_message(f"No {self.slot_name(slot)} file is loading", "info")
+            return
+        self.loaders.pop(slot).set()
+        self.load_tokens[slot] += 1
+        columns, df = (self.primary_columns, self.primary_df) if slot == 'primary' else (self.ref_columns, self.ref_df)
+        deferred = columns is not None and df is None
+        self.load_widgets[slot]['status'].config(
+            text="Load cancelled" + ("; data will be read when processing" if deferred else ""),
+            fg=self.colors['text_secondary'])
+        self.log_message(f"⚠ {self.slot_name(slot)} file load cancelled", "warning")
+    
+    def drain_loader_queue(self):
+        """Apply events from the file loaders; stale events from superseded loads are dropped"""
+        self.loader_poll = None
+        latest_progress = {}
+        while True:
+            try:
+                event = self.loader_queue.get_nowait()
+            except queue.Empty:
+                break
+            kind, slot, token = event[:3]
+            if token != self.load_tokens[slot]:
+                continue
+            if kind == 'progress':
+                latest_progress[slot] = event[3:]
+            elif kind == 'log':
+                self.log_message(*event[3:])
+            else:
+                self.apply_load_event(kind, slot, event[3:])
+        
+        for slot, (done, total) in latest_progress.items():
+            if slot in self.loaders:
+                self.load_widgets[slot]['progress']['value'] = (done / total) * 100 if total else 100
+                self.load_widgets[slot]['status'].config(
+                    text=f"Parsed {done / 1048576:.1f} of {total / 1048576:.1f} MB", fg=self.colors['warning'])
+        
+        if self.loaders:
+            self.loader_poll = self.root.after(self.ui_refresh_ms, self.drain_loader_queue)
+    
+    def apply_load_event(self, kind, slot, payload):
+        widgets = self.load_widgets[slot]
+        name = self.slot_name(slot)
+        if kind == 'header':
+            file, columns = payload
+            if slot == 'primary':
+                self.primary_file, self.primary_columns, self.primary_df = file, columns, None
+                self.primary_label.config(text=self.file_label(file), fg=self.colors['success'])
+            else:
+                self.ref_file, self.ref_columns, self.ref_df = file, columns, None
+                self.ref_label.config(text=self.file_label(file), fg=self.colors['success'])
+            widgets['status'].config(text="Loading data...", fg=self.colors['warning'])
+            self.update_columns_display()
+            self.update_mapping_options()
+            self.update_extra_references()
+            return
+        
+        self.loaders.pop(slot, None)
+        if kind == 'loaded':
+            df, self.load_phases[slot] = payload
+            if slot == 'primary':
+                self.primary_df = df
+            else:
+                self.ref_df = df
+            widgets['progress']['value'] = 100
+            widgets['status'].config(text=f"{len(df)} rows, {len(df.columns)} columns", fg=self.colors['success'])
+            self.log_message(f"✓ {name} file loaded: {len(df)} rows, {len(df.columns)} columns", "success")
+        elif kind == 'deferred':
+            widgets['progress']['value'] = 100
+            widgets['status'].config(text=f"{len(self.ref_columns)} columns; data read when processing",
+                                     fg=self.colors['success'])
+            self.log_message(f"✓ {name} file columns read; only the mapped and merged columns "
+                             f"are loaded when processing", "success")
+        elif kind == 'cancelled':
+            widgets['status'].config(text="Load cancelled", fg=self.colors['text_secondary'])
+        else:
+            e = payload[0]
+            widgets['progress']['value'] = 0
+            widgets['status'].config(text="Load failed", fg=self.colors['danger'])
+            self.log_message(f"✗ Error loading {name} file: {str(e)}", "error")
+            messagebox.showerror("Error", f"Error loading {name} file:\n{str(e)}")
     
     def update_mapping_options(self):
-        if self.primary_df is not None and self.ref_df is not None:
+        if self.primary_columns is not None and self.ref_columns is not None:
             self.mapping_info.pack_forget()
             self.log_message("Both files loaded. Ready to configure column matching.", "success")
             if not self.column_mappings:
                 self.add_column_mapping()
     
     def add_column_mapping(self):
-        if self.primary_df is None or self.ref_df is None:
+        if self.primary_columns is None or self.ref_columns is None:
             self.log_message("⚠ Please load both Excel files first", "warning")
             messagebox.showwarning("Warning", "Please load both Excel files first!")
             return
@@ -465,21 +3898,32 @@ class ExcelMatcherApp:
                 bg="#ffffff", fg=self.colors['text_primary'], 
                 width=15, anchor="w").pack(side="left", padx=6)
         
-        primary_combo = ttk.Combobox(inner_frame, values=list(self.primary_df.columns), 
+        primary_combo = ttk.Combobox(inner_frame, values=list(self.primary_columns), 
                                  state="readonly", width=25, font=("Segoe UI", 10))
         primary_combo.pack(side="left", padx=6)
         
         tk.Label(inner_frame, text="⟷", font=("Segoe UI", 18, "bold"), 
                 bg="#ffffff", fg=self.colors['primary']).pack(side="left", padx=12)
         
-        tk.Label(inner_frame, text="Ref Column:", font=("Segoe UI", 10, "bold"), 
+        source_combo = ttk.Combobox(inner_frame, values=self.reference_names(), 
+                                   state="readonly", width=16, font=("Segoe UI", 10))
+        source_combo.current(0)
+        source_combo.pack(side="left", padx=6)
+        
+        tk.Label(inner_frame, text="Column:", font=("Segoe UI", 10, "bold"), 
                 bg="#ffffff", fg=self.colors['text_primary'], 
-                width=13, anchor="w").pack(side="left", padx=6)
+                width=8, anchor="w").pack(side="left", padx=6)
         
-        ref_combo = ttk.Combobox(inner_frame, values=list(self.ref_df.columns), 
+        ref_combo = ttk.Combobox(inner_frame, values=list(self.ref_columns), 
                                 state="readonly", width=25, font=("Segoe UI", 10))
         ref_combo.pack(side="left", padx=6)
         
+        def select_source(event):
+            ref_combo['values'] = list(self.reference_columns(source_combo.current()))
+            ref_combo.set("")
+        
+        source_combo.bind("<<ComboboxSelected>>", select_source)
+        
         remove_btn = tk.Button(inner_frame, text="✕", 
                               command=lambda: self.remove_mapping(mapping_row),
                               bg=self.colors['danger'], fg="white", 
@@ -489,10 +3933,45 @@ class ExcelMatcherApp:
                               activeforeground="white", bd=0)
         remove_btn.pack(side="right", padx=6)
         
+        # Normalization rules for this mapping
+        options_frame = tk.Frame(mapping_row, bg="#ffffff")
+        options_frame.pack(fill="x", padx=18, pady=(0, 12))
+        
+        rules = {}
+        for rule, label in [('case_sensitive', "Case sensitive"),
+                            ('keep_punctuation', "Keep punctuation"),
+                            ('strip_leading_zeros', "Strip leading zeros")]:
+            rules[rule] = tk.BooleanVar(value=False)
+            tk.Checkbutton(options_frame, text=label, variable=rules[rule],
+                          font=("Segoe UI", 9), bg="#ffffff", fg=self.colors['text_secondary'],
+                          activebackground="#ffffff").pack(side="left", padx=6)
+        
+        # Fuzzy matching for this mapping
+        fuzzy_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(options_frame, text="Fuzzy", variable=fuzzy_var,
+                      font=("Segoe UI", 9, "bold"), bg="#ffffff", fg=self.colors['text_secondary'],
+                      activebackground="#ffffff").pack(side="left", padx=(18, 3))
+        
+        metric_combo = ttk.Combobox(options_frame, values=list(FUZZY_METRICS), state="readonly",
+                                    width=8, font=("Segoe UI", 9))
+        metric_combo.set(FUZZY_METRICS[0])
+        metric_combo.pack(side="left", padx=3)
+        
+        threshold_var = tk.DoubleVar(value=0.85)
+        tk.Label(options_frame, text="≥", font=("Segoe UI", 9), bg="#ffffff",
+                fg=self.colors['text_secondary']).pack(side="left")
+        tk.Spinbox(options_frame, from_=0.5, to=1.0, increment=0.05, textvariable=threshold_var,
+                  width=5, font=("Segoe UI", 9)).pack(side="left", padx=3)
+        
         self.column_mappings.append({
             'frame': mapping_row,
             'primary_combo': primary_combo,
-            'ref_combo': ref_combo
+            'source_combo': source_combo,
+            'ref_combo': ref_combo,
+            'rules': rules,
+            'fuzzy': fuzzy_var,
+            'metric_combo': metric_combo,
+            'threshold': threshold_var
         })
         
         self.log_message(f"Column mapping slot #{len(self.column_mappings)} added", "info")
@@ -504,7 +3983,7 @@ class ExcelMatcherApp:
             frame.destroy()
             self.log_message(f"Column mapping removed. {len(self.column_mappings)} remaining.", "info")
         
-        if not self.column_mappings and self.primary_df is not None and self.ref_df is not None:
+        if not self.column_mappings and self.primary_columns is not None and self.ref_columns is not None:
             self.mapping_info.pack()
     
     def clear_mappings(self):
@@ -513,146 +3992,842 @@ class ExcelMatcherApp:
             mapping['frame'].destroy()
         self.column_mappings = []
         
-        if self.primary_df is not None and self.ref_df is not None:
+        if self.primary_columns is not None and self.ref_columns is not None:
             self.mapping_info.pack()
         
         self.log_message(f"All {count} column mappings cleared", "warning")
     
-    def process_files(self):
-        if self.primary_df is None or self.ref_df is None:
-            self.log_message("✗ Cannot process: Both files must be loaded", "error")
-            messagebox.showerror("Error", "Please load both Excel files first!")
+    def update_match_progress(self, done, total, matched):
+        self.match_progress['value'] = (done / total) * 100 if total else 100
+        self.match_status.config(
+            text=f"Processed {done}/{total} {self.progress_unit} | Matched: {matched}",
+            fg=self.colors['success']
+        )
+    
+    def update_read_progress(self, done, total):
+        self.match_progress['value'] = (done / total) * 100 if total else 100
+        self.match_status.config(text=f"Reading {done / 1048576:.1f} of {total / 1048576:.1f} MB",
+                                 fg=self.colors['warning'])
+    
+    def update_merge_progress(self, written, total):
+        self.merge_progress['value'] = (written / total) * 100 if total else 100
+        self.merge_status.config(text=f"Written {written}/{total} rows", fg=self.colors['warning'])
+    
+    def worker_engine(self):
+        """A MergeEngine set up from the window's options that reports to the worker queue"""
+        engine = MergeEngine(
+            log=lambda message, level="info": self.worker_queue.put(('log', message, level)),
+            progress=lambda done, total, matched: self.worker_queue.put(('progress', done, total, matched)),
+            write_progress=lambda written, total: self.worker_queue.put(('write_progress', written, total)),
+            read_progress=lambda done, total: self.worker_queue.put(('read_progress', done, total)),
+            cancel_event=self.cancel_event,
+            progress_interval=self.ui_refresh_ms / 1000,
+            cache=self.workbook_cache
+        )
+        try:
+            engine.workers = max(1, self.workers_var.get())
+        except tk.TclError:
+            engine.workers = 1
+        engine.profile_match = self.profile_var.get()
+        engine.match_policy = self.policy_combo.get()
+        engine.sheets = dict(self.sheet_selection)
+        if self.incremental_var.get():
+            engine.fingerprints = FingerprintStore(self.workbook_cache.cache_dir / "fingerprints"
+                                                   if self.workbook_cache else None)
+        engine.checkpoints = CheckpointStore(self.workbook_cache.cache_dir / "checkpoints"
+                                             if self.workbook_cache else None)
+        return engine
+    
+    def run_in_worker(self, task, on_done, engine=None):
+        """Run task(engine) on a background thread; on_done(result) runs on the Tk thread.
+        Pass an engine from worker_engine() when a decision must be made with its options first."""
+        self.cancel_event.clear()
+        if engine is None:
+            engine = self.worker_engine()
+        
+        def target():
+            try:
+                self.worker_queue.put(('done', on_done, task(engine), engine.phases, engine.duplicate_keys))
+            except MergeCancelled:
+                self.worker_queue.put(('cancelled',))
+            except Exception as e:
+                self.worker_queue.put(('error', e))
+        
+        self.worker = threading.Thread(target=target, daemon=True)
+        self.worker.start()
+        self.root.after(self.ui_refresh_ms, self.drain_worker_queue)
+    
+    def drain_worker_queue(self):
+        """Apply queued worker events; only the latest progress event per frame is rendered"""
+        latest_progress = None
+        latest_write_progress = None
+        latest_read_progress = None
+        finished = None
+        while finished is None:
+            try:
+                event = self.worker_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'progress':
+                latest_progress = event[1:]
+            elif event[0] == 'write_progress':
+                latest_write_progress = event[1:]
+            elif event[0] == 'read_progress':
+                latest_read_progress = event[1:]
+            elif event[0] == 'log':
+                self.log_message(event[1], event[2])
+            else:
+                finished = event
+        
+        if latest_read_progress is not None:
+            self.update_read_progress(*latest_read_progress)
+        if latest_progress is not None:
+            self.update_match_progress(*latest_progress)
+        if latest_write_progress is not None:
+            self.update_merge_progress(*latest_write_progress)
+        
+        if finished is None:
+            self.root.after(self.ui_refresh_ms, self.drain_worker_queue)
             return
         
+        self.worker = None
+        if finished[0] == 'done':
+            self.run_phases.extend(finished[3])
+            self.run_duplicate_keys.extend(finished[4])
+            finished[1](finished[2])
+        elif finished[0] == 'cancelled':
+            self.log_message("⚠ Processing cancelled by user", "warning")
+            self.match_status.config(text="Cancelled", fg=self.colors['text_secondary'])
+            self.merge_status.config(text="Cancelled", fg=self.colors['text_secondary'])
+        else:
+            e = finished[1]
+            self.log_message(f"✗ CRITICAL ERROR: {str(e)}", "error")
+            messagebox.showerror("Error", f"An error occurred:\n{str(e)}")
+            self.match_status.config(text="Error occurred", fg=self.colors['danger'])
+            self.merge_status.config(text="Process failed", fg=self.colors['danger'])
+    
+    def cancel_processing(self):
+        if self.worker is None:
+            self.log_message("Nothing to cancel", "info")
+            return
+        self.cancel_event.set()
+        self.log_message("Cancelling...", "warning")
+    
+    def collect_mappings(self):
+        """Validated (match_pairs, normalizers, fuzzy, extra_sources) from the mapping rows, or None after
+        reporting a problem. The first three describe the main reference; mappings against additional
+        references are grouped into one ReferenceSource per file."""
         if not self.column_mappings:
             self.log_message("✗ Cannot process: No column mappings configured", "error")
             messagebox.showerror("Error", "Please add at least one column mapping!")
-            return
+            return None
         
-        match_pairs = []
+        groups = [([], [], []) for _ in range(len(self.extra_refs) + 1)]
         for i, mapping in enumerate(self.column_mappings):
+            match_pairs, normalizers, fuzzy = groups[max(mapping['source_combo'].current(), 0)]
             primary_col = mapping['primary_combo'].get()
             ref_col = mapping['ref_combo'].get()
             
             if not primary_col or not ref_col:
                 self.log_message(f"✗ Mapping #{i+1} incomplete", "error")
                 messagebox.showerror("Error", "Please select columns for all mappings!")
-                return
+                return None
+            
+            if mapping['fuzzy'].get():
+                try:
+                    threshold = float(mapping['threshold'].get())
+                except (tk.TclError, ValueError):
+                    threshold = -1
+                if not 0 < threshold <= 1:
+                    self.log_message(f"✗ Mapping #{i+1}: fuzzy threshold must be between 0 and 1", "error")
+                    messagebox.showerror("Error", "Fuzzy thresholds must be between 0 and 1!")
+                    return None
+                fuzzy.append({'metric': mapping['metric_combo'].get(), 'threshold': threshold})
+            else:
+                fuzzy.append(None)
             
             match_pairs.append((primary_col, ref_col))
-            self.log_message(f"Match pair #{i+1}: '{primary_col}' ⟷ '{ref_col}'", "info")
+            normalizers.append(KeyNormalizer(**{rule: var.get() for rule, var in mapping['rules'].items()}))
+            mode = f", fuzzy {fuzzy[-1]['metric']} ≥ {fuzzy[-1]['threshold']:.2f}" if fuzzy[-1] else ""
+            source = f"{mapping['source_combo'].get()}: " if self.extra_refs else ""
+            self.log_message(f"Match pair #{i+1}: '{primary_col}' ⟷ {source}'{ref_col}' "
+                             f"(rules: {normalizers[-1].describe()}{mode})", "info")
         
-        try:
-            self.log_message("=" * 50, "info")
-            self.log_message("Starting matching process...", "info")
-            
-            # Reset progress
-            self.match_progress['value'] = 0
-            self.merge_progress['value'] = 0
-            self.match_status.config(text="Starting...", fg=self.colors['text_secondary'])
-            self.merge_status.config(text="Waiting...", fg=self.colors['text_secondary'])
-            
-            result_df = self.primary_df.copy()
-            matched_ref_cols = [pair[1] for pair in match_pairs]
-            ref_additional_cols = [col for col in self.ref_df.columns if col not in matched_ref_cols]
-            
-            for col in ref_additional_cols:
-                if col not in result_df.columns:
-                    result_df[col] = ""
+        extra_sources = [ReferenceSource(ref['file'], *group)
+                         for ref, group in zip(self.extra_refs, groups[1:]) if group[0]]
+        return (*groups[0], extra_sources)
+    
+    def process_files(self):
+        if self.worker is not None:
+            self.log_message("⚠ A merge is already running", "warning")
+            return
+        
+        if self.primary_columns is None or self.ref_columns is None:
+            self.log_message("✗ Cannot process: Both files must be loaded", "error")
+            messagebox.showerror("Error", "Please load both Excel files first!")
+            return
+        
+        if self.loaders:
+            self.log_message("⚠ Files are still loading; wait for them or cancel the load", "warning")
+            return
+        
+        mappings = self.collect_mappings()
+        if mappings is None:
+            return
+        match_pairs, normalizers, fuzzy, extra_sources = mappings
+        
+        carry_cols = self.selected_carry_columns()
+        if match_pairs and not [col for col in carry_cols if col not in {pair[1] for pair in match_pairs}]:
+            self.log_message("⚠ No reference columns selected to merge in", "warning")
+        
+        self.log_message("=" * 50, "info")
+        self.log_message("Starting matching process...", "info")
+        self.progress_unit = "rows"
+        
+        # Reset progress
+        self.match_progress['value'] = 0
+        self.merge_progress['value'] = 0
+        self.match_status.config(text="Starting...", fg=self.colors['text_secondary'])
+        self.merge_status.config(text="Waiting...", fg=self.colors['text_secondary'])
+        
+        # Snapshot the selection; frames not loaded yet (cancelled loads) are read by the worker
+        primary_file, ref_file, ref_columns = self.primary_file, self.ref_file, self.ref_columns
+        primary_df, loaded_ref_df = self.primary_df, self.ref_df
+        self.run_phases = [record for slot, df in (('ref', loaded_ref_df), ('primary', primary_df))
+                           if df is not None for record in self.load_phases.get(slot, [])]
+        self.run_duplicate_keys = []
+        
+        server = self.server_var.get().strip()
+        if server:
+            # The server reads the files itself and keeps the reference indexed for later jobs
+            output_file = self.ask_output_file()
+            if not output_file:
+                return
+            if self.incremental_var.get():
+                self.log_message("⚠ Incremental re-merge runs in-process only; the server runs a full merge", "warning")
+            spec = self.server_job(output_file, match_pairs, normalizers, fuzzy, extra_sources, carry_cols)
+            self.run_phases = []
+            self.merge_status.config(text="Running on the merge server...", fg=self.colors['warning'])
             
-            self.log_message(f"Additional columns to merge: {len(ref_additional_cols)}", "info")
+            def remote(engine):
+                client = MergeClient(server)
+                job = client.submit(spec)
+                engine.log(f"Job {job['id']} submitted to the merge server at {server}", "info")
+                return client.follow(job['id'], engine)
             
-            # Matching phase
-            matched_count = 0
-            total_rows = len(self.primary_df)
+            self.run_in_worker(remote, self.finish_streaming)
+            return
+        
+        # The backend depends on the run's options (the duplicate-key policy), so choose it on the run's engine
+        run_engine = self.worker_engine()
+        backend = run_engine.choose_backend(ref_file, primary_file, fuzzy)
+        if self.incremental_var.get() and (extra_sources or self.stream_var.get() or backend == "sqlite"):
+            self.log_message("⚠ Incremental re-merge needs a single in-memory reference join; "
+                             "running a full merge", "warning")
+        
+        if extra_sources:
+            # Several references: index them all, then read, match and write the primary rows once
+            sources = extra_sources
+            if match_pairs:
+                sources = [ReferenceSource(ref_file, match_pairs, normalizers, fuzzy, carry_cols,
+                                           ref_df=loaded_ref_df)] + sources
+            self.log_message(f"Merging {len(sources)} references in one pass", "info")
             
-            for idx, primary_row in self.primary_df.iterrows():
-                match_condition = pd.Series([True] * len(self.ref_df))
-                
-                for primary_col, ref_col in match_pairs:
-                    primary_val = self.normalize_value(primary_row[primary_col])
-                    ref_vals = self.ref_df[ref_col].apply(self.normalize_value)
-                    match_condition = match_condition & (ref_vals == primary_val)
-                
-                matching_indices = self.ref_df[match_condition].index
+            if self.stream_var.get():
+                output_file = self.ask_output_file()
+                if not output_file:
+                    return
                 
-                if len(matching_indices) > 0:
-                    matched_count += 1
-                    matched_row = self.ref_df.loc[matching_indices[0]]
-                    
-                    for col in ref_additional_cols:
-                        result_df.at[idx, col] = matched_row[col]
+                self.merge_status.config(text="Streaming rows to file...", fg=self.colors['warning'])
                 
-                # Update progress
-                progress = ((idx + 1) / total_rows) * 100
-                self.match_progress['value'] = progress
-                self.match_status.config(
-                    text=f"Processed {idx + 1}/{total_rows} rows | Matched: {matched_count}",
-                    fg=self.colors['success']
-                )
+                def stream_sources(engine):
+                    total_rows, matched_count = engine.stream_sources(primary_file, engine.index_sources(sources),
+                                                                      output_file)
+                    return engine.summarize(total_rows, matched_count, output_file)
                 
-                if (idx + 1) % 10 == 0 or idx == total_rows - 1:
-                    self.root.update()
+                self.run_in_worker(stream_sources, self.finish_streaming, run_engine)
+                return
             
-            self.log_message(f"✓ Matching complete: {matched_count}/{total_rows} rows matched", "success")
+            def match_sources(engine):
+                indexed = engine.index_sources(sources)
+                if primary_df is None:
+                    engine.log(f"Loading Primary file: {Path(primary_file).name}", "info")
+                    return engine.match_sources(engine.load(primary_file), indexed)
+                return engine.match_sources(primary_df, indexed)
             
-            if matched_count == 0:
-                self.log_message("⚠ WARNING: No rows matched! Check your column mappings.", "warning")
-                messagebox.showwarning("No Matches Found", 
-                    "No rows were matched between the files.\n\n"
-                    "Please verify:\n"
-                    "• Column mappings are correct\n"
-                    "• Data formats match between files\n"
-                    "• There are actually matching records")
+            self.run_in_worker(match_sources, self.finish_matching, run_engine)
+            return
+        
+        if backend == "sqlite":
+            output_file = self.ask_output_file()
+            if not output_file:
+                return
             
-            # Save file
-            self.merge_status.config(text="Preparing to save file...", fg=self.colors['warning'])
-            self.root.update()
+            self.merge_status.config(text="Joining on disk...", fg=self.colors['warning'])
             
-            output_file = filedialog.asksaveasfilename(
-                defaultextension=".xlsx",
-                filetypes=[("Excel files", "*.xlsx")],
-                title="Save Merged File As",
-                initialfile="merged_output.xlsx"
-            )
+            def out_of_core(engine):
+                engine.log(f"Joining on disk (SQLite backend): {Path(ref_file).name}", "info")
+                total_rows, matched_count = engine.sqlite_merge(primary_file, ref_file, match_pairs, output_file,
+                                                                normalizers, carry_cols)
+                return engine.summarize(total_rows, matched_count, output_file)
             
-            if output_file:
-                self.merge_status.config(text="Saving file...", fg=self.colors['warning'])
-                self.merge_progress['value'] = 50
-                self.root.update()
-                
-                result_df.to_excel(output_file, index=False)
-                
-                self.merge_progress['value'] = 100
-                self.merge_status.config(text=f"File saved successfully!", fg=self.colors['success'])
-                
-                self.log_message(f"✓ File saved: {Path(output_file).name}", "success")
-                self.log_message(f"Total rows: {total_rows}", "info")
-                self.log_message(f"Matched rows: {matched_count}", "success")
-                self.log_message(f"Unmatched rows: {total_rows - matched_count}", "warning")
-                self.log_message("=" * 50, "info")
-                
-                match_rate = (matched_count/total_rows*100) if total_rows > 0 else 0
-                success_msg = (f"✅ Files merged successfully!\n\n"
-                              f"📊 Statistics:\n"
-                              f"   • Total rows: {total_rows}\n"
-                              f"   • Matched: {matched_count}\n"
-                              f"   • Unmatched: {total_rows - matched_count}\n"
-                              f"   • Match rate: {match_rate:.1f}%\n\n"
-                              f"💾 Saved to:\n{output_file}")
-                
-                messagebox.showinfo("Success", success_msg)
-            else:
-                self.log_message("⚠ Save cancelled by user", "warning")
-                self.merge_status.config(text="Save cancelled", fg=self.colors['text_secondary'])
+            self.run_in_worker(out_of_core, self.finish_streaming, run_engine)
+            return
         
-        except Exception as e:
-            self.log_message(f"✗ CRITICAL ERROR: {str(e)}", "error")
-            messagebox.showerror("Error", f"An error occurred:\n{str(e)}")
-            self.match_status.config(text="Error occurred", fg=self.colors['danger'])
-            self.merge_status.config(text="Process failed", fg=self.colors['danger'])
+        if self.stream_var.get():
+            output_file = self.ask_output_file()
+            if not output_file:
+                return
+            
+            self.merge_status.config(text="Streaming rows to file...", fg=self.colors['warning'])
+            
+            def stream(engine):
+                ref_df = engine.load_reference(ref_file, match_pairs, carry_cols, ref_columns, loaded_ref_df)
+                total_rows, matched_count = engine.stream_merge(primary_file, ref_df, match_pairs,
+                                                                output_file, normalizers, fuzzy, carry_cols)
+                return engine.summarize(total_rows, matched_count, output_file)
+            
+            self.run_in_worker(stream, self.finish_streaming, run_engine)
+            return
+        
+        def match(engine):
+            ref_df = engine.load_reference(ref_file, match_pairs, carry_cols, ref_columns, loaded_ref_df)
+            df = primary_df
+            if df is None:
+                engine.log(f"Loading Primary file: {Path(primary_file).name}", "info")
+                df = engine.load(primary_file)
+            if engine.fingerprints is not None:
+                return engine.match_incremental(primary_file, df, ref_file, ref_df, match_pairs, normalizers,
+                                                fuzzy, carry_cols)
+            return engine.match(df, ref_df, match_pairs, normalizers, fuzzy, carry_cols)
+        
+        self.run_in_worker(match, self.finish_matching, run_engine)
+    
+    def server_job(self, output_file, match_pairs, normalizers, fuzzy, extra_sources, carry_cols):
+        """Job for a MergeServer (see parse_job) describing the current files, mappings and options"""
+        groups = [(self.ref_file, match_pairs, normalizers, fuzzy)]
+        groups += [(source.ref_file, source.match_pairs, source.normalizers, source.fuzzy) for source in extra_sources]
+        mappings = [{'primary': primary_col, 'reference': ref_col, 'file': os.path.abspath(ref_file),
+                     'rules': {rule: getattr(normalizer, rule) for rule in normalizer.rule_names}, 'fuzzy': spec}
+                    for ref_file, pairs, rule_sets, specs in groups
+                    for (primary_col, ref_col), normalizer, spec in zip(pairs, rule_sets, specs)]
+        return {
+            'primary': os.path.abspath(self.primary_file),
+            'reference': os.path.abspath(self.ref_file),
+            'output': os.path.abspath(output_file),
+            'mappings': mappings,
+            'carry': carry_cols,
+            'policy': self.policy_combo.get(),
+            'stream': self.stream_var.get(),
+            'sheets': dict(self.sheet_selection),
+            'overwrite': True,  # the save dialog has already asked
+        }
+    
+    def preview_matches(self):
+        """Estimate the match rate of the current mappings from a sample of primary rows,
+        so a wrong mapping shows up before the full run"""
+        if self.worker is not None:
+            self.log_message("⚠ A merge is already running", "warning")
+            return
+        
+        if self.primary_columns is None or self.ref_columns is None:
+            self.log_message("✗ Cannot preview: Both files must be loaded", "error")
+            messagebox.showerror("Error", "Please load both Excel files first!")
+            return
+        
+        if self.loaders:
+            self.log_message("⚠ Files are still loading; wait for them or cancel the load", "warning")
+            return
+        
+        mappings = self.collect_mappings()
+        if mappings is None:
+            return
+        match_pairs, normalizers, fuzzy, extra_sources = mappings
+        sources = list(extra_sources)
+        if match_pairs:
+            sources.insert(0, ReferenceSource(self.ref_file, match_pairs, normalizers, fuzzy, ref_df=self.ref_df))
+        
+        self.log_message("=" * 50, "info")
+        self.log_message("Previewing matches on a sample of primary rows...", "info")
+        self.match_status.config(text="Previewing...", fg=self.colors['warning'])
+        self.run_phases = []
+        self.run_duplicate_keys = []
+        
+        primary_file, primary_df = self.primary_file, self.primary_df
+        key_cols = {col for source in sources for col in source.primary_cols}
+        primary_cols = [col for col in self.primary_columns if col in key_cols]
+        
+        def preview(engine):
+            df = primary_df
+            if df is None:
+                engine.log(f"Loading Primary file key columns: {Path(primary_file).name}", "info")
+                df = engine.load(primary_file, primary_cols)
+            return engine.preview(df, sources)
+        
+        self.run_in_worker(preview, self.finish_preview)
+    
+    def finish_preview(self, estimates):
+        worst = min(estimates, key=lambda estimate: estimate['match_rate'])
+        color = self.colors['success'] if worst['matched'] else self.colors['danger']
+        self.match_status.config(text=f"Preview: ~{worst['match_rate']:.1f}% of rows match", fg=color)
+        for estimate in estimates:
+            for line in format_preview(estimate):
+                self.log_message(line, "info")
+        summary = "\n\n".join("\n".join(format_preview(estimate)) for estimate in estimates)
+        if worst['matched'] == 0:
+            self.log_message("⚠ Preview found no matches in the sample; check the mappings "
+                             "with 0% of values found", "warning")
+            messagebox.showwarning("Preview: No Matches", summary)
+        else:
+            messagebox.showinfo("Match Preview", summary)
+    
+    def process_batch(self):
+        """Merge a whole folder of primary files shaped like the loaded one against the reference"""
+        if self.worker is not None:
+            self.log_message("⚠ A merge is already running", "warning")
+            return
+        
+        if self.primary_columns is None or self.ref_columns is None:
+            self.log_message("✗ Cannot batch: load a sample Primary file and the Reference file first", "error")
+            messagebox.showerror("Error", "Please load a sample Primary file and the Reference file first!\n\n"
+                                 "The column mappings apply to every file in the batch.")
+            return
+        
+        if self.loaders:
+            self.log_message("⚠ Files are still loading; wait for them or cancel the load", "warning")
+            return
+        
+        mappings = self.collect_mappings()
+        if mappings is None:
+            return
+        match_pairs, normalizers, fuzzy, extra_sources = mappings
+        if extra_sources or not match_pairs:
+            self.log_message("✗ Batch mode merges the main reference only; map its columns and "
+                             "remove mappings to additional references", "error")
+            messagebox.showerror("Error", "Batch mode supports a single reference file!")
+            return
+        
+        input_dir = filedialog.askdirectory(title="Select Folder of Primary Excel Files")
+        if not input_dir:
+            return
+        primary_files = resolve_batch_inputs(input_dir, exclude=[self.ref_file])
+        if not primary_files:
+            self.log_message(f"✗ No Excel files found in {input_dir}", "error")
+            messagebox.showerror("Error", "The selected folder contains no .xlsx or .xls files!")
+            return
+        
+        output_dir = filedialog.askdirectory(title="Select Output Folder")
+        if not output_dir:
+            self.log_message("⚠ Batch cancelled by user", "warning")
+            return
+        
+        self.log_message("=" * 50, "info")
+        self.log_message(f"Starting batch of {len(primary_files)} files from {input_dir}", "info")
+        self.match_progress['value'] = 0
+        self.merge_progress['value'] = 0
+        self.match_status.config(text="Starting batch...", fg=self.colors['text_secondary'])
+        self.merge_status.config(text="Writing one output per file...", fg=self.colors['warning'])
+        
+        carry_cols = self.selected_carry_columns()
+        ref_file, loaded_ref_df = self.ref_file, self.ref_df
+        self.progress_unit = "files"
+        self.run_phases = list(self.load_phases.get('ref', [])) if loaded_ref_df is not None else []
+        self.run_duplicate_keys = []
+        
+        def batch(engine):
+            engine.run_report = False
+            return engine.batch(primary_files, ref_file, match_pairs, output_dir, normalizers, fuzzy,
+                                carry_cols, ref_df=loaded_ref_df)
+        
+        self.run_in_worker(batch, self.finish_batch)
+    
+    def finish_batch(self, stats):
+        if stats['failed']:
+            self.log_message(f"⚠ {stats['failed']} of {stats['files']} files failed; see the batch summary",
+                             "warning")
+        self.finish_streaming(stats)
+    
+    def warn_if_no_matches(self, matched_count):
+        if matched_count == 0:
+            self.log_message("⚠ WARNING: No rows matched! Check your column mappings.", "warning")
+            messagebox.showwarning("No Matches Found", 
+                "No rows were matched between the files.\n\n"
+                "Please verify:\n"
+                "• Column mappings are correct\n"
+                "• Data formats match between files\n"
+                "• There are actually matching records")
+    
+    def ask_output_file(self):
+        """Ask where to save the merged file; returns None if the user cancels"""
+        self.merge_status.config(text="Preparing to save file...", fg=self.colors['warning'])
+        
+        output_file = filedialog.asksaveasfilename(
+            defaultextension=".xlsx",
+            filetypes=[(writer.description, f"*{extension}") for extension, writer in OUTPUT_WRITERS.items()],
+            title="Save Merged File As",
+            initialfile="merged_output.xlsx"
+        )
+        
+        if not output_file:
+            self.log_message("⚠ Save cancelled by user", "warning")
+            self.merge_status.config(text="Save cancelled", fg=self.colors['text_secondary'])
+            return None
+        return output_file
+    
+    def finish_matching(self, result):
+        result_df, matched_count = result
+        total_rows = result_df.attrs.get('primary_rows', len(result_df))
+        
+        self.warn_if_no_matches(matched_count)
+        
+        # Save file
+        output_file = self.ask_output_file()
+        if not output_file:
+            return
+        
+        self.merge_status.config(text="Saving file...", fg=self.colors['warning'])
+        
+        def save(engine):
+            engine.save(result_df, output_file)
+            return engine.summarize(total_rows, matched_count, output_file)
+        
+        self.run_in_worker(save, self.finish_saving)
+    
+    def finish_streaming(self, stats):
+        self.warn_if_no_matches(stats['matched'])
+        self.finish_saving(stats)
+    
+    def finish_saving(self, stats):
+        self.merge_progress['value'] = 100
+        self.merge_status.config(text=f"File saved successfully!", fg=self.colors['success'])
+        
+        self.log_message(f"Total rows: {stats['total_rows']}", "info")
+        self.log_message(f"Matched rows: {stats['matched']}", "success")
+        self.log_message(f"Unmatched rows: {stats['unmatched']}", "warning")
+        
+        # Phase timing summary and run report
+        timings = "".join(f"   • {record['phase']}: {record['wall_s']:.2f}s\n" for record in self.run_phases)
+        total_wall = sum(record['wall_s'] for record in self.run_phases)
+        if self.run_phases:
+            slowest = max(self.run_phases, key=lambda record: record['wall_s'])
+            self.log_message(f"⏱ Total {total_wall:.2f}s over {len(self.run_phases)} phases; "
+                             f"slowest: {format_phase(slowest)}", "info")
+        report_engine = MergeEngine(log=self.log_message)
+        try:
+            report_engine.workers = max(1, self.workers_var.get())
+        except tk.TclError:
+            pass
+        try:
+            report_engine.duplicate_keys = self.run_duplicate_keys
+            report_engine.match_policy = self.policy_combo.get()
+            report_engine.write_report(stats, self.run_phases)
+        except OSError as e:
+            self.log_message(f"⚠ Could not write run report: {str(e)}", "warning")
+        self.log_message("=" * 50, "info")
+        
+        files = f"   • Files: {stats['files']} ({stats['failed']} failed)\n" if 'files' in stats else ""
+        success_msg = (f"✅ Files merged successfully!\n\n"
+                      f"📊 Statistics:\n{files}"
+                      f"   • Total rows: {stats['total_rows']}\n"
+                      f"   • Matched: {stats['matched']}\n"
+                      f"   • Unmatched: {stats['unmatched']}\n"
+                      f"   • Match rate: {stats['match_rate']:.1f}%\n\n"
+                      f"⏱ Timings ({total_wall:.2f}s):\n{timings}\n"
+                      f"💾 Saved to:\n{stats['output_file']}")
+        
+        messagebox.showinfo("Success", success_msg)
 
-if __name__ == "__main__":
+def parse_match_pair(text):
+    """Parse a `primary_col=ref_col` command-line mapping"""
+    primary_col, sep, ref_col = text.partition("=")
+    if not sep or not primary_col or not ref_col:
+        raise argparse.ArgumentTypeError(f"expected primary_col=ref_col, got '{text}'")
+    return primary_col, ref_col
+
+def parse_join(text):
+    """Parse a `FILE:primary_col=ref_col` mapping against an additional reference file"""
+    left, sep, ref_col = text.partition("=")
+    ref_file, colon, primary_col = left.rpartition(":")
+    if not sep or not colon or not ref_file or not primary_col or not ref_col:
+        raise argparse.ArgumentTypeError(f"expected FILE:primary_col=ref_col, got '{text}'")
+    return ref_file, (primary_col, ref_col)
+
+def parse_sheets(text):
+    """Parse a comma-separated list of sheet names, or 'all'"""
+    if text == "all":
+        return text
+    sheets = [name.strip() for name in text.split(",") if name.strip()]
+    if not sheets:
+        raise argparse.ArgumentTypeError("expected comma-separated sheet names or 'all'")
+    return sheets
+
+def main(argv=None):
+    """Command-line entry point for unattended merges"""
+    parser = argparse.ArgumentParser(description="Match and merge two Excel files without the GUI.")
+    parser.add_argument("primary", help="primary Excel file (with --batch: a folder or glob of them)")
+    parser.add_argument("reference", help="reference Excel file")
+    parser.add_argument("--on", dest="match_pairs", action="append", type=parse_match_pair, default=[],
+                        metavar="PRIMARY_COL=REF_COL", help="column pair to match on exactly (repeatable)")
+    parser.add_argument("--fuzzy-on", dest="fuzzy_pairs", action="append", type=parse_match_pair, default=[],
+                        metavar="PRIMARY_COL=REF_COL", help="column pair to match on approximately (repeatable)")
+    parser.add_argument("--metric", choices=FUZZY_METRICS, default=FUZZY_METRICS[0],
+                        help="similarity metric for --fuzzy-on pairs (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=0.85,
+                        help="minimum similarity for --fuzzy-on pairs (default: %(default)s)")
+    parser.add_argument("--max-candidates", type=int, default=MergeEngine.max_candidates,
+                        help="fuzzy candidates rescored per key with the ratio metric or several fuzzy "
+                             "columns; 0 rescores all of them (default: %(default)s)")
+    parser.add_argument("-o", "--output",
+                        help=f"output file ({', '.join(OUTPUT_WRITERS)}); with --batch, the output folder")
+    parser.add_argument("--preview", action="store_true",
+                        help="only estimate the match rate from a sample of primary rows; nothing is written")
+    parser.add_argument("--sample-size", type=int, default=MergeEngine.preview_rows,
+                        help="primary rows sampled by --preview (default: %(default)s)")
+    parser.add_argument("--batch", action="store_true",
+                        help="merge every primary file against the reference, building its index once")
+    parser.add_argument("--format", dest="output_format", choices=[ext.lstrip(".") for ext in OUTPUT_WRITERS],
+                        default="xlsx", help="output format for --batch (default: %(default)s)")
+    parser.add_argument("--join", dest="joins", action="append", type=parse_join, default=[],
+                        metavar="FILE:PRIMARY_COL=REF_COL",
+                        help="exact column pair against an additional reference file, merged in the same pass "
+                             "(repeatable; pairs naming the same file form one composite key)")
+    parser.add_argument("--sheets", type=parse_sheets, metavar="NAMES|all",
+                        help="primary sheets to read as one table, with a 'Source Sheet' column: comma-separated "
+                             "names or 'all' (default: the first sheet; with --batch, applies to every file)")
+    parser.add_argument("--ref-sheets", type=parse_sheets, metavar="NAMES|all",
+                        help="reference sheets to read as one table (default: the first sheet)")
+    parser.add_argument("--case-sensitive", action="store_true", help="compare keys case-sensitively")
+    parser.add_argument("--keep-punctuation", action="store_true", help="do not strip punctuation from keys")
+    parser.add_argument("--strip-leading-zeros", action="store_true", help="ignore leading zeros in keys")
+    parser.add_argument("--carry", dest="carry_cols", action="append", metavar="REF_COL",
+                        help="reference column to merge in (repeatable; default: every non-key column)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream the primary file in chunks to keep memory bounded (.xlsx only)")
+    parser.add_argument("--chunk-size", type=int, default=MergeEngine.chunk_size,
+                        help="rows per chunk (default: %(default)s)")
+    parser.add_argument("--workers", type=int, default=MergeEngine.workers,
+                        help="worker processes for matching; 0 uses every core, 1 runs serially (default: %(default)s)")
+    parser.add_argument("--backend", choices=("auto", "memory", "sqlite"), default=MergeEngine.backend,
+                        help="join engine; auto switches to an on-disk SQLite join for large references "
+                             "(default: %(default)s)")
+    parser.add_argument("--sqlite-threshold-mb", type=float, default=MergeEngine.sqlite_threshold_mb,
+                        help="reference file size from which auto uses SQLite (default: %(default)s)")
+    parser.add_argument("--policy", choices=MATCH_POLICIES, default=MergeEngine.match_policy,
+                        help="what a key found on several reference rows yields: the first or last row, all "
+                             "rows (one output row each), an aggregate, or an error (default: %(default)s)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="reuse the previous run's matches for primary rows whose keys are unchanged; "
+                             "a changed reference file triggers a full re-merge")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="do not checkpoint matching, so an interrupted run starts over instead of resuming")
+    parser.add_argument("--checkpoint-interval", type=float, default=CheckpointStore.interval,
+                        help="seconds between checkpoints of a running match (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk workbook cache")
+    parser.add_argument("--cache-dir", help="workbook cache directory (default: ~/.cache/excelmerger)")
+    parser.add_argument("--cache-size-mb", type=int, default=1024,
+                        help="evict least recently used cache entries past this size (default: %(default)s)")
+    parser.add_argument("--no-report", action="store_true",
+                        help="do not write the <output>.report.json run report")
+    parser.add_argument("--profile-match", action="store_true",
+                        help="capture a cProfile of the match phase into <output>.match.prof")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the final statistics")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also print per-chunk diagnostics")
+    parser.add_argument("--log-file", help="append every log line, per-chunk diagnostics included, to this "
+                                           "file; it is rotated past --log-size-mb, keeping 3 old files")
+    parser.add_argument("--log-size-mb", type=float, default=5, help="log file rotation size (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if not args.match_pairs and not args.fuzzy_pairs:
+        parser.error("at least one --on or --fuzzy-on pair is required")
+    if not args.output and not args.preview:
+        parser.error("the following arguments are required: -o/--output")
+    if args.preview and args.batch:
+        parser.error("--preview cannot be combined with --batch")
+    if not 0 < args.threshold <= 1:
+        parser.error("--threshold must be between 0 and 1")
+    if args.max_candidates < 0:
+        parser.error("--max-candidates must be 0 or more")
+    if args.joins and (args.batch or args.backend == "sqlite"):
+        parser.error("--join cannot be combined with --batch or --backend sqlite")
+    match_pairs = args.match_pairs + args.fuzzy_pairs
+    fuzzy = [None] * len(args.match_pairs) + [{'metric': args.metric, 'threshold': args.threshold}] * len(args.fuzzy_pairs)
+    
+    activity_log = ActivityLog(capacity=0, log_file=args.log_file, max_bytes=int(args.log_size_mb * 1024 ** 2))
+    
+    def log(message, level="info"):
+        activity_log.write(message, level)
+        if level == "error" or not args.quiet and (level != "debug" or args.verbose):
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", file=sys.stderr)
+    
+    def normalizer():
+        return KeyNormalizer(case_sensitive=args.case_sensitive, keep_punctuation=args.keep_punctuation,
+                             strip_leading_zeros=args.strip_leading_zeros)
+    
+    normalizers = [normalizer() for _ in match_pairs]
+    
+    joins = {}
+    for ref_file, pair in args.joins:
+        joins.setdefault(ref_file, []).append(pair)
+    
+    cache = None if args.no_cache else WorkbookCache(args.cache_dir, args.cache_size_mb * 1024 ** 2)
+    engine = MergeEngine(log=log, cache=cache)
+    engine.chunk_size = args.chunk_size
+    engine.workers = args.workers
+    engine.run_report = not args.no_report
+    engine.backend = args.backend
+    engine.sqlite_threshold_mb = args.sqlite_threshold_mb
+    engine.profile_match = args.profile_match
+    engine.match_policy = args.policy
+    engine.max_candidates = args.max_candidates
+    if args.ref_sheets:
+        engine.select_sheets(args.reference, args.ref_sheets)
+    if args.sheets and not args.batch:
+        if os.path.abspath(args.primary) == os.path.abspath(args.reference) and args.ref_sheets:
+            parser.error("a workbook used as both primary and reference is read with one sheet selection")
+        engine.select_sheets(args.primary, args.sheets)
+    if args.incremental:
+        engine.fingerprints = FingerprintStore(Path(args.cache_dir) / "fingerprints" if args.cache_dir else None)
+    if not args.no_checkpoint:
+        engine.checkpoints = CheckpointStore(Path(args.cache_dir) / "checkpoints" if args.cache_dir else None)
+        engine.checkpoints.interval = args.checkpoint_interval
+    try:
+        if args.preview:
+            sources = [ReferenceSource(args.reference, match_pairs, normalizers, fuzzy)]
+            sources += [ReferenceSource(ref_file, pairs, [normalizer() for _ in pairs])
+                        for ref_file, pairs in joins.items()]
+            key_cols = {col for source in sources for col in source.primary_cols}
+            primary_df = engine.load(args.primary, [col for col in engine.read_columns(args.primary)
+                                                    if col in key_cols])
+            estimates = engine.preview(primary_df, sources, args.sample_size)
+            for estimate in estimates:
+                print("\n".join(format_preview(estimate)))
+            return 1 if any(estimate['matched'] == 0 for estimate in estimates) else 0
+        if args.batch:
+            primary_files = resolve_batch_inputs(args.primary, exclude=[args.reference])
+            for primary_file in primary_files if args.sheets else ():
+                engine.select_sheets(primary_file, args.sheets)
+            stats = engine.batch(primary_files, args.reference, match_pairs, args.output, normalizers, fuzzy,
+                                 args.carry_cols, f".{args.output_format}")
+        elif joins:
+            sources = [ReferenceSource(args.reference, match_pairs, normalizers, fuzzy, args.carry_cols)]
+            sources += [ReferenceSource(ref_file, pairs, [normalizer() for _ in pairs])
+                        for ref_file, pairs in joins.items()]
+            stats = engine.run_sources(args.primary, sources, args.output, stream=args.stream)
+        else:
+            stats = engine.run(args.primary, args.reference, match_pairs, args.output,
+                               normalizers, fuzzy, stream=args.stream, carry_cols=args.carry_cols)
+    except Exception as e:
+        log(f"✗ CRITICAL ERROR: {str(e)}", "error")
+        return 1
+    finally:
+        activity_log.close()
+    
+    files = f"Files: {stats['files']} ({stats['failed']} failed) | " if args.batch else ""
+    reuse = (f" | Reused: {stats['reused_rows']} | Recomputed: {stats['recomputed_rows']}"
+             if 'reused_rows' in stats else "")
+    print(f"{files}Total rows: {stats['total_rows']} | Matched: {stats['matched']} | "
+          f"Unmatched: {stats['unmatched']} | Match rate: {stats['match_rate']:.1f}%{reuse}")
+    return 1 if stats.get('failed') else 0
+
+def serve(argv=None):
+    """Entry point of `excelMerger.py serve`: run merge jobs posted to a local HTTP API"""
+    parser = argparse.ArgumentParser(prog="excelMerger.py serve",
+                                     description="Run a headless merge server that accepts jobs over a local "
+                                                 "HTTP API and keeps reference indexes in memory between jobs.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port; 0 picks a free one (default: %(default)s)")
+    parser.add_argument("--socket", help="listen on this Unix socket file instead of a TCP port")
+    parser.add_argument("--workers", type=int, default=2, help="jobs run at the same time (default: %(default)s)")
+    parser.add_argument("--hot-references", type=int, default=4,
+                        help="reference workbooks kept in memory with their indexes; the least recently "
+                             "used is dropped past this (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="do not use the on-disk workbook cache")
+    parser.add_argument("--cache-dir", help="workbook cache directory (default: ~/.cache/excelmerger)")
+    parser.add_argument("--cache-size-mb", type=int, default=1024,
+                        help="evict least recently used cache entries past this size (default: %(default)s)")
+    parser.add_argument("--no-checkpoint", action="store_true",
+                        help="do not checkpoint jobs, so a job rerun after a crash starts over")
+    parser.add_argument("--token", default=os.environ.get("EXCELMERGER_TOKEN"),
+                        help="access token clients must send (default: $EXCELMERGER_TOKEN, else a new random one)")
+    parser.add_argument("--token-file",
+                        help="write the token here, readable by this user only, for local clients "
+                             "(default: server.token in the cache directory)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print errors")
+    parser.add_argument("-v", "--verbose", action="store_true", help="also print requests and per-chunk diagnostics")
+    parser.add_argument("--log-file", help="append every log line to this file, rotated past --log-size-mb")
+    parser.add_argument("--log-size-mb", type=float, default=5, help="log file rotation size (default: %(default)s)")
+    args = parser.parse_args(argv)
+    if args.host not in ("127.0.0.1", "localhost", "::1"):
+        print(f"Warning: jobs read and write files as this user; {args.host} exposes them beyond this machine",
+              file=sys.stderr)
+    
+    activity_log = ActivityLog(capacity=0, log_file=args.log_file, max_bytes=int(args.log_size_mb * 1024 ** 2))
+    
+    def log(message, level="info"):
+        activity_log.write(message, level)
+        if level == "error" or not args.quiet and (level != "debug" or args.verbose):
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {message}", file=sys.stderr)
+    
+    cache = None if args.no_cache else WorkbookCache(args.cache_dir, args.cache_size_mb * 1024 ** 2)
+    checkpoints = None if args.no_checkpoint else CheckpointStore(Path(args.cache_dir) / "checkpoints"
+                                                                  if args.cache_dir else None)
+    server = MergeServer(args.workers, args.hot_references, cache, log, checkpoints, args.token)
+    token_file = Path(args.token_file) if args.token_file else server_token_file(args.cache_dir)
+    try:
+        address = server.listen(args.host, args.port, args.socket)
+        write_server_token(token_file, server.token)
+    except OSError as e:
+        server.close()
+        log(f"✗ Cannot listen: {str(e)}", "error")
+        return 1
+    log(f"Merge server listening on {address} ({server.workers} workers, "
+        f"{server.hot_indexes.capacity} hot references); Ctrl+C stops it", "success")
+    log(f"Access token written to {token_file}", "info")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log("Merge server stopped", "info")
+    finally:
+        token_file.unlink(missing_ok=True)
+        activity_log.close()
+    return 0
+
+def run_gui(startup_timing=False):
+    """Start the GUI. The heavy modules are imported on a background thread once the first
+    frame is up; with startup_timing, each startup stage is reported (seconds since launch)."""
+    marks = [("module import", time.perf_counter())]
+    define_widgets()
     root = tk.Tk()
     app = ExcelMatcherApp(root)
+    marks.append(("window built", time.perf_counter()))
+    
+    def preload():
+        preload_modules()
+        marks.append(("heavy modules ready", time.perf_counter()))
+    
+    def wait_for_modules(loader):
+        if loader.is_alive():
+            root.after(50, wait_for_modules, loader)
+            return
+        summary = ", ".join(f"{name} {stamp - STARTUP_CLOCK:.3f}s" for name, stamp in marks)
+        print(f"Startup: {summary}", file=sys.stderr)
+        app.log_message(f"Startup timing: {summary}", "info")
+    
+    def first_frame():
+        marks.append(("first frame", time.perf_counter()))
+        loader = threading.Thread(target=preload, daemon=True)
+        loader.start()
+        if startup_timing:
+            root.after(50, wait_for_modules, loader)
+    
+    root.after_idle(first_frame)
     root.mainloop()
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--startup-timing"]:
+        run_gui(startup_timing=True)
+    elif sys.argv[1:2] == ["serve"]:
+        sys.exit(serve(sys.argv[2:]))
+    elif len(sys.argv) > 1:
+        sys.exit(main())
+    else:
+        run_gui()
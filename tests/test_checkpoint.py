@@ -0,0 +1,82 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from excelMerger import CheckpointStore, MergeCancelled, MergeEngine
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    primary = tmp_path / "primary.xlsx"
+    reference = tmp_path / "reference.xlsx"
+    pd.DataFrame({'Code': [f"K{i % 15}" for i in range(40)], 'Row': range(40)}).to_excel(primary, index=False)
+    pd.DataFrame({'SKU': [f"k{i}" for i in range(10)], 'Desc': [f"item {i}" for i in range(10)]}).to_excel(
+        reference, index=False)
+    return primary, reference
+
+
+def make_engine(tmp_path, crash=False, workers=1):
+    """Engine checkpointing on every chunk; with crash, it is cancelled after its first progress report"""
+    cancel = threading.Event()
+    logged = []
+    engine = MergeEngine(log=lambda message, level="info": logged.append(message), cancel_event=cancel,
+                         progress=(lambda *_: cancel.set()) if crash else None, progress_interval=0)
+    engine.chunk_size = 4
+    engine.workers = workers
+    engine.backend = "memory"
+    engine.run_report = False
+    engine.checkpoints = CheckpointStore(tmp_path / "checkpoints")
+    engine.checkpoints.interval = 0
+    return engine, logged
+
+
+def checkpoint_files(tmp_path):
+    return sorted(path.suffix for path in (tmp_path / "checkpoints").iterdir())
+
+
+@pytest.mark.parametrize("workers", [1, 2], ids=["serial", "parallel"])
+def test_merge_resumes_after_a_crash(workbooks, tmp_path, workers):
+    primary, reference = workbooks
+    expected = tmp_path / "expected.xlsx"
+    MergeEngine().run(primary, reference, [("Code", "SKU")], expected)
+    
+    output = tmp_path / "merged.xlsx"
+    engine, _ = make_engine(tmp_path, crash=True)
+    with pytest.raises(MergeCancelled):
+        engine.run(primary, reference, [("Code", "SKU")], output)
+    assert not output.exists()
+    assert checkpoint_files(tmp_path) == [".npz"]
+    
+    # Serial and parallel probes share the checkpoint, so the rerun may use more workers
+    engine, logged = make_engine(tmp_path, workers=workers)
+    stats = engine.run(primary, reference, [("Code", "SKU")], output)
+    assert any(message.startswith("Resuming from checkpoint: 4 rows") for message in logged)
+    assert stats['matched'] == 30
+    pd.testing.assert_frame_equal(pd.read_excel(output), pd.read_excel(expected))
+    assert checkpoint_files(tmp_path) == []
+
+
+def test_batch_skips_files_merged_before_a_crash(workbooks, tmp_path):
+    primary, reference = workbooks
+    primaries = []
+    for name in ("a", "b", "c"):
+        primaries.append(tmp_path / f"{name}.xlsx")
+        primaries[-1].write_bytes(primary.read_bytes())
+    output_dir = tmp_path / "out"
+    
+    engine, _ = make_engine(tmp_path, crash=True)
+    with pytest.raises(MergeCancelled):
+        engine.batch(primaries, reference, [("Code", "SKU")], output_dir)
+    assert sorted(path.name for path in output_dir.iterdir()) == ["a_merged.xlsx"]
+    assert checkpoint_files(tmp_path) == [".json"]
+    first_output = (output_dir / "a_merged.xlsx").stat().st_mtime_ns
+    
+    engine, logged = make_engine(tmp_path)
+    stats = engine.batch(primaries, reference, [("Code", "SKU")], output_dir)
+    assert "Resuming batch: 1 of 3 files already merged" in logged
+    assert (stats['files'], stats['failed'], stats['matched']) == (3, 0, 90)
+    assert (output_dir / "a_merged.xlsx").stat().st_mtime_ns == first_output
+    summary = pd.read_excel(output_dir / "batch_summary.xlsx")
+    assert summary['Matched'].tolist() == [30, 30, 30, 90]
+    assert checkpoint_files(tmp_path) == []
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from excelMerger import KeyNormalizer
+
+NORMALIZERS = [
+    KeyNormalizer(),
+    KeyNormalizer(case_sensitive=True),
+    KeyNormalizer(keep_punctuation=True),
+    KeyNormalizer(strip_leading_zeros=True),
+]
+
+COLUMNS = {
+    'mixed bool and numbers': [True, 1, 1.0, False, 0, 0.0, 2, True, 1],
+    'numbers before bools': [1, 0, True, False, 1.5, np.True_],
+    'text and numbers': ["  SKU-001 ", "sku001", "00123", 123, 123.0, "1e3", "abc", None, np.nan],
+    'whitespace and case': ["A  b", "a b", "A\tB", "", "  ", "Ä-1"],
+    'dates': [datetime(2024, 1, 2), pd.Timestamp("2024-01-02 10:30"), "2024-01-02", None],
+}
+
+
+@pytest.mark.parametrize("normalizer", NORMALIZERS, ids=lambda n: n.describe())
+@pytest.mark.parametrize("values", COLUMNS.values(), ids=COLUMNS.keys())
+def test_normalize_series_matches_normalize_value(normalizer, values):
+    series = pd.Series(values, dtype=object)
+    expected = [normalizer.normalize_value(value) for value in values]
+    assert normalizer.normalize_series(series).tolist() == expected
+    # A second pass is served from the memo cache and must agree too
+    assert normalizer.normalize_series(series).tolist() == expected
+
+
+def test_booleans_and_numbers_stay_distinct():
+    normalizer = KeyNormalizer()
+    assert normalizer.normalize_series(pd.Series([True, 1], dtype=object)).tolist() == ["true", "1"]
+    assert normalizer.normalize_series(pd.Series([1, True], dtype=object)).tolist() == ["1", "true"]
+
+
+@pytest.mark.parametrize("series", [
+    pd.Series([1, 2, 3, 2]),
+    pd.Series([1.5, np.nan, 2.0]),
+    pd.Series([True, False, True]),
+    pd.Series(pd.to_datetime(["2024-01-02", None])),
+    pd.Series(["a", "B", None], dtype="string[pyarrow]"),
+    pd.Series(["x", "y", "x"], dtype="category"),
+], ids=["int", "float", "bool", "datetime", "arrow", "category"])
+def test_typed_columns(series):
+    normalizer = KeyNormalizer()
+    expected = [normalizer.normalize_value(value) for value in series.astype(object)]
+    assert normalizer.normalize_series(series).tolist() == expected
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+import excelMerger
+from excelMerger import open_output_writer
+
+
+def read_output(path):
+    if path.suffix == ".xlsx":
+        return pd.read_excel(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path, encoding="utf-8-sig")
+    return pd.read_parquet(path)
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    primary = tmp_path / "primary.xlsx"
+    reference = tmp_path / "reference.xlsx"
+    pd.DataFrame({
+        'Order': [1, 2, 3, 4, 5],
+        'Code': ["A-1", "b1", "C1", "zz", " a1 "],
+    }).to_excel(primary, index=False)
+    pd.DataFrame({
+        'SKU': ["a1", "B1", "c1"],
+        'Desc': ["apple", "banana", "cherry"],
+        'Price': [1.5, 2.0, 3.25],
+    }).to_excel(reference, index=False)
+    return primary, reference
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["memory", "stream"])
+@pytest.mark.parametrize("extension", [".xlsx", ".csv", ".parquet"])
+def test_cli_merge_writes_each_format(workbooks, tmp_path, extension, stream):
+    primary, reference = workbooks
+    output = tmp_path / f"merged{extension}"
+    argv = [str(primary), str(reference), "--on", "Code=SKU", "-o", str(output),
+            "--cache-dir", str(tmp_path / "cache"), "--no-report", "--quiet"]
+    assert excelMerger.main(argv + (["--stream"] if stream else [])) == 0
+    
+    merged = read_output(output)
+    assert list(merged.columns) == ['Order', 'Code', 'Desc', 'Price']
+    assert merged['Desc'].tolist()[:3] == ["apple", "banana", "cherry"]
+    assert merged['Desc'].isna().tolist() == [False, False, False, True, False]
+    assert merged['Price'].tolist()[4] == 1.5
+
+
+def test_parquet_widens_columns_whose_type_changes_between_chunks(tmp_path):
+    path = tmp_path / "out.parquet"
+    with open_output_writer(path) as writer:
+        writer.write(pd.DataFrame({'a': [1, 2], 'b': [1, 2], 'c': [True, False]}))
+        writer.write(pd.DataFrame({'a': ["x", "y"], 'b': [1.5, None], 'c': [1, 0]}))
+        writer.write(pd.DataFrame({'a': [3, None], 'b': [7, 8], 'c': [True, None]}))
+    
+    df = pd.read_parquet(path)
+    assert df['a'].tolist()[:5] == ["1", "2", "x", "y", "3"]
+    assert df['b'].tolist()[:3] == [1.0, 2.0, 1.5]
+    assert df['c'].tolist()[:4] == ["true", "false", "1", "0"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out.parquet"]
+
+
+def test_failed_write_removes_the_partial_output(tmp_path):
+    path = tmp_path / "out.csv"
+    with pytest.raises(RuntimeError):
+        with open_output_writer(path) as writer:
+            writer.write(pd.DataFrame({'a': [1]}))
+            raise RuntimeError("interrupted")
+    assert not path.exists()
@@ -0,0 +1,93 @@
+import math
+
+import pandas as pd
+import pytest
+
+from excelMerger import HashJoinMatcher, KeyNormalizer
+
+CARRY = ['Desc', 'Price']
+
+
+@pytest.fixture
+def frames():
+    # Keys repeat with different spellings; some prices are missing, one key's entirely
+    ref_df = pd.DataFrame({
+        'SKU': [f"{'k' if i % 2 else 'K'}{i % 7}" for i in range(24)],
+        'Desc': [f"item {i % 5}" for i in range(24)],
+        'Price': [None if i % 7 == 3 or i % 4 == 1 else float(i) for i in range(24)],
+    })
+    primary_df = pd.DataFrame({'Code': [f"k{i % 9}" for i in range(20)], 'Row': range(20)})
+    return primary_df, ref_df
+
+
+def reference_rows(primary_df, ref_df):
+    """Primary row -> every matching reference row, via a plain dict of normalized keys"""
+    normalizer = KeyNormalizer()
+    rows = {}
+    for position, key in enumerate(ref_df['SKU']):
+        rows.setdefault(normalizer.normalize_value(key), []).append(position)
+    return [rows.get(normalizer.normalize_value(code), []) for code in primary_df['Code']]
+
+
+def missing(value):
+    return value is None or (isinstance(value, float) and math.isnan(value)) or value is pd.NA
+
+
+def records(df):
+    return [tuple(None if missing(value) else value for value in row)
+            for row in df.astype(object).itertuples(index=False)]
+
+
+def merge(primary_df, ref_df, policy):
+    matcher = HashJoinMatcher(ref_df, ['SKU'], [KeyNormalizer()])
+    matcher.policy = policy
+    positions, scores = matcher.probe_scored(primary_df, ['Code'])
+    return matcher.gather(primary_df, positions, CARRY, scores)
+
+
+def carried(ref_df, position):
+    return tuple(None if missing(value) else value for value in ref_df.loc[position, CARRY])
+
+
+@pytest.mark.parametrize("policy", ["first", "last"])
+def test_first_and_last_pick_one_row_per_key(frames, policy):
+    primary_df, ref_df = frames
+    expected = []
+    for row, matches in zip(records(primary_df), reference_rows(primary_df, ref_df)):
+        pick = (matches[0] if policy == "first" else matches[-1]) if matches else None
+        expected.append(row + (carried(ref_df, pick) if pick is not None else (None, None)))
+    assert records(merge(primary_df, ref_df, policy)) == expected
+
+
+def test_all_repeats_primary_rows_per_reference_row(frames):
+    primary_df, ref_df = frames
+    expected = []
+    for row, matches in zip(records(primary_df), reference_rows(primary_df, ref_df)):
+        expected += [row + carried(ref_df, pick) for pick in matches] or [row + (None, None)]
+    assert records(merge(primary_df, ref_df, "all")) == expected
+
+
+def test_aggregate_sums_numbers_and_joins_text(frames):
+    primary_df, ref_df = frames
+    expected = []
+    for row, matches in zip(records(primary_df), reference_rows(primary_df, ref_df)):
+        if not matches:
+            expected.append(row + (None, None, 0))
+            continue
+        descs = dict.fromkeys(ref_df.loc[pick, 'Desc'] for pick in matches)
+        prices = [ref_df.loc[pick, 'Price'] for pick in matches if not missing(ref_df.loc[pick, 'Price'])]
+        expected.append(row + ("; ".join(descs), sum(prices) if prices else None, len(matches)))
+    
+    result = merge(primary_df, ref_df, "aggregate")
+    assert list(result.columns) == ['Code', 'Row', *CARRY, HashJoinMatcher.count_column]
+    assert records(result) == expected
+
+
+def test_error_refuses_duplicate_keys(frames):
+    primary_df, ref_df = frames
+    with pytest.raises(ValueError, match="occur more than once"):
+        merge(primary_df, ref_df, "error")
+    
+    # Without duplicates every policy yields the first-match result
+    unique_df = ref_df.drop_duplicates('SKU').iloc[:3]
+    assert records(merge(primary_df, unique_df, "error")) == records(merge(primary_df, unique_df, "first"))
@@ -0,0 +1,132 @@
+import http.client
+import json
+import threading
+
+import pandas as pd
+import pytest
+
+from excelMerger import MergeClient, MergeEngine, MergeServer, parse_job
+
+
+@pytest.fixture
+def job(tmp_path):
+    primary = tmp_path / "primary.xlsx"
+    reference = tmp_path / "reference.xlsx"
+    pd.DataFrame({'Code': ["a1", "b2", "c3"]}).to_excel(primary, index=False)
+    pd.DataFrame({'SKU': ["A1", "B2"], 'Desc': ["apple", "banana"]}).to_excel(reference, index=False)
+    return {
+        'primary': str(primary),
+        'reference': str(reference),
+        'output': str(tmp_path / "merged.csv"),
+        'mappings': [{'primary': "Code", 'reference': "SKU", 'rules': {'case_sensitive': False}}],
+    }
+
+
+def test_parse_job_returns_run_settings(job):
+    extra = str(job['reference']).replace("reference", "other")
+    job['mappings'].append({'primary': "Code", 'reference': "Key", 'file': extra,
+                            'fuzzy': {'metric': "ratio", 'threshold': 1}})
+    settings = parse_job(dict(job, carry=["Desc"], policy="last", stream=True, sheets={job['primary']: "all"}))
+    
+    assert (settings['primary'], settings['output']) == (job['primary'], job['output'])
+    assert (settings['stream'], settings['policy']) == (True, "last")
+    assert settings['sheets'] == {job['primary']: "all"}
+    main, other = settings['sources']
+    assert (main.match_pairs, main.carry_cols) == ([("Code", "SKU")], ["Desc"])
+    assert (other.match_pairs, other.fuzzy, other.carry_cols) == (
+        [("Code", "Key")], [{'metric': "ratio", 'threshold': 1.0}], None)
+
+
+@pytest.mark.parametrize("change, error", [
+    (lambda job: job.update(primary=None), "'primary' must be an absolute file path"),
+    (lambda job: job.update(reference="relative.xlsx"), "'reference' must be an absolute file path"),
+    (lambda job: job.update(output=job['output'] + ".txt"), "'output' must end in one of"),
+    (lambda job: job.update(mappings=[]), "'mappings' must list"),
+    (lambda job: job['mappings'][0].update(primary=3), "mapping #1 needs"),
+    (lambda job: job['mappings'][0].update(reference=""), "mapping #1 needs"),
+    (lambda job: job['mappings'][0].update(file="other.xlsx"), "'file' must be an absolute file path"),
+    (lambda job: job['mappings'][0].update(file=7), "'file' must be an absolute file path"),
+    (lambda job: job['mappings'][0].update(rules=["case_sensitive"]), "'rules' must be an object"),
+    (lambda job: job['mappings'][0].update(rules={'upper': True}), "unknown rules upper"),
+    (lambda job: job['mappings'][0].update(rules={'case_sensitive': "yes"}), "rules must be true or false"),
+    (lambda job: job['mappings'][0].update(fuzzy="trigram"), "'fuzzy' must be an object"),
+    (lambda job: job['mappings'][0].update(fuzzy={'metric': "soundex"}), "fuzzy needs a metric"),
+    (lambda job: job['mappings'][0].update(fuzzy={'threshold': "0.9"}), "fuzzy needs a metric"),
+    (lambda job: job['mappings'][0].update(fuzzy={'threshold': True}), "fuzzy needs a metric"),
+    (lambda job: job['mappings'][0].update(fuzzy={'threshold': 1.5}), "fuzzy needs a metric"),
+    (lambda job: job['mappings'][0].update(fuzzy={'threshold': 0}), "fuzzy needs a metric"),
+    (lambda job: job.update(carry="Desc"), "'carry' must be a list"),
+    (lambda job: job.update(carry=["Desc", 2]), "'carry' must be a list"),
+    (lambda job: job.update(policy="random"), "'policy' must be one of"),
+    (lambda job: job.update(policy=["first"]), "'policy' must be one of"),
+    (lambda job: job.update(stream="yes"), "'stream' must be true or false"),
+    (lambda job: job.update(overwrite=1), "'overwrite' must be true or false"),
+    (lambda job: job.update(sheets=["Sheet1"]), "'sheets' must map"),
+    (lambda job: job.update(sheets={job['primary']: "Sheet1"}), "'sheets' must map"),
+    (lambda job: job.update(sheets={job['primary']: ["Sheet1", 2]}), "'sheets' must map"),
+])
+def test_parse_job_rejects_malformed_jobs(job, change, error):
+    change(job)
+    with pytest.raises(ValueError, match=error):
+        parse_job(job)
+
+
+def test_parse_job_needs_an_object():
+    with pytest.raises(ValueError, match="JSON object"):
+        parse_job(["primary.xlsx"])
+
+
+def test_parse_job_keeps_an_existing_output_unless_told_to_overwrite(job, tmp_path):
+    (tmp_path / "merged.csv").write_text("earlier result")
+    with pytest.raises(ValueError, match="already exists"):
+        parse_job(job)
+    assert parse_job(dict(job, overwrite=True))['output'] == job['output']
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = MergeServer(workers=1, token="secret")
+    address = server.listen(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, address
+    server.httpd.shutdown()
+    thread.join()
+
+
+def request(address, method, path, body=None, headers=()):
+    host, port = address.rsplit(":", 1)
+    connection = http.client.HTTPConnection(host, int(port), timeout=10)
+    try:
+        connection.request(method, path, body=body, headers=dict(headers))
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("headers, status", [
+    ({}, 401),
+    ({'Authorization': "Bearer wrong"}, 401),
+    ({'Authorization': "Bearer secret", 'Origin': "https://example.com"}, 403),
+    ({'Authorization': "Bearer secret"}, 200),
+])
+def test_server_requires_the_token_and_refuses_web_pages(server, headers, status):
+    _, address = server
+    assert request(address, "GET", "/status", headers=headers)[0] == status
+
+
+def test_server_runs_jobs_posted_as_json(server, job):
+    _, address = server
+    body = json.dumps(job)
+    status, reply = request(address, "POST", "/jobs", body,
+                            {'Authorization': "Bearer secret", 'Content-Type': "text/plain"})
+    assert status == 415
+    
+    client = MergeClient(address, token="secret")
+    client.poll_interval = 0.05
+    stats = client.follow(client.submit(job)['id'], MergeEngine())
+    assert (stats['total_rows'], stats['matched']) == (3, 2)
+    assert pd.read_csv(job['output'])['Desc'].tolist()[:2] == ["apple", "banana"]
+    with pytest.raises(RuntimeError, match="already exists"):
+        client.submit(job)
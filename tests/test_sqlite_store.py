@@ -0,0 +1,23 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from excelMerger import KeyNormalizer, SqliteReferenceStore
+
+
+def test_carried_types_survive_chunks_that_disagree(tmp_path):
+    # The first chunk has no dates or booleans, later ones do
+    chunks = [
+        pd.DataFrame({'SKU': ["a", "b"], 'When': [None, "n/a"], 'Flag': [None, 0]}),
+        pd.DataFrame({'SKU': ["c", "d"], 'When': [datetime(2024, 5, 1), None], 'Flag': [True, False]}),
+    ]
+    with SqliteReferenceStore(['SKU'], [KeyNormalizer()], ['When', 'Flag'], tmp_path) as store:
+        for chunk in chunks:
+            store.add(chunk)
+        positions, _ = store.probe_scored(pd.DataFrame({'Code': ["d", "c", "b", "x"]}), ['Code'])
+        when, flag = store.carried(np.asarray(positions))
+    
+    assert when.tolist() == [None, datetime(2024, 5, 1), "n/a", None]
+    assert flag.tolist() == [False, True, 0, None]
+    assert type(flag[0]) is bool and type(flag[2]) is not bool